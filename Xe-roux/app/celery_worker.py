@@ -17,7 +17,7 @@ setup introduced in Story 1.03.
 from __future__ import annotations
 
 import os
-import asyncio
+import importlib.util
 import uuid
 from pathlib import Path
 from typing import Any, Dict
@@ -49,59 +49,163 @@ DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
 # ---------------------------------------------------------------------------
 # Helper functions
 # ---------------------------------------------------------------------------
-async def _run_ytdlp(url: str, format_id: str, filepath: Path) -> None:
+async def _run_ytdlp(url: str, format_id: str, filepath: Path, progress_callback=None) -> None:
     """Run yt-dlp asynchronously to download the requested video.
 
     We use the existing helper in :pymod:`app.services.ytdlp` so the logic is
     shared with the in-process downloader that was part of Story 1.02.
+    When the yt-dlp library is importable the download runs inside this
+    (already warm) worker process, otherwise through the CLI; either way
+    *progress_callback* receives coalesced
+    :class:`~app.services.progress.ProgressEvent` objects.
     """
     from app.services import ytdlp  # local import to avoid celery serialization issues
+    from app.services.progress import ProgressCoalescer, ProgressEvent
 
-    cmd = [
-        "yt-dlp",
-        "-f",
-        format_id,
-        "-o",
-        str(filepath),
-        url,
-    ]
-    await ytdlp._run_cmd(cmd)
+    # Start from the info dict kept by a recent preview (shared via Redis) so
+    # the page is not extracted a second time.
+    info = await ytdlp.get_cached_info(url)
+
+    if importlib.util.find_spec("yt_dlp") is not None:
+        await ytdlp.download_with_progress(url, format_id, str(filepath), progress_callback, info=info)
+        return
+
+    coalescer = ProgressCoalescer(progress_callback) if progress_callback else None
+    # Same tuning profile and throughput metrics as the library path
+    with ytdlp._download_metrics(info) as tracker, ytdlp._info_json_file(info) as info_path:
+
+        def _on_event(event: ProgressEvent | None) -> None:
+            if event is not None and event.phase == "downloaded":
+                tracker["bytes"] += event.total_bytes or event.downloaded_bytes or 0
+            if coalescer is not None:
+                coalescer.push(event)
+
+        # Resolved like the library path, so the artifact matches its result_cache key
+        cmd = [*ytdlp.ytdlp_command(url), "-f", ytdlp.resolve_format(format_id)]
+        if format_id.lower() == "mp3":
+            cmd += ["-x", "--audio-format", "mp3"]
+        cmd += [
+            *tracker["profile"].cli_args(),
+            "--no-mtime",
+            "-o",
+            str(filepath),
+        ]
+        cmd += ["--load-info-json", info_path] if info_path else [url]
+        await ytdlp._run_cmd_with_progress(cmd, _on_event)
+    if coalescer is not None:
+        coalescer.flush()
+
+
+_artifact_index = None
+_redis_client = None
+
+
+def _redis():
+    """Return a synchronous Redis client for task bookkeeping (created lazily)."""
+    global _redis_client
+    if _redis_client is None:
+        import redis
+
+        _redis_client = redis.Redis.from_url(REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+    return _redis_client
+
+
+def _register_artifact(path: Path) -> None:
+    """Add *path* to the shared Redis expiry index used by the API's cleanup."""
+    global _artifact_index
+    from app import cleanup
+
+    try:
+        if _artifact_index is None:
+            _artifact_index = cleanup.RedisArtifactIndex(REDIS_URL)
+        st = path.stat()
+        _artifact_index.register(str(path), st.st_mtime + cleanup.TTL_MINUTES * 60, st.st_size)
+    except Exception:  # noqa: BLE001 - cleanup bookkeeping must never fail the task
+        pass
 
 
 # ---------------------------------------------------------------------------
 # Tasks
 # ---------------------------------------------------------------------------
 @celery_app.task(bind=True, name="download_video", track_started=True)
-def download_video_task(self, url: str, format_id: str, filename: str | None = None) -> Dict[str, Any]:
+def download_video_task(
+    self,
+    url: str,
+    format_id: str,
+    filename: str | None = None,
+    artifact_name: str | None = None,
+    dns_pins: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
     """Celery task that downloads a video using yt-dlp.
 
     Progress updates are pushed to the task meta via ``self.update_state`` so
-    they can be queried through the status endpoint.
+    they can be queried through the status endpoint. When *artifact_name* (the
+    content address from :mod:`app.services.result_cache`) is given, the file
+    is stored under it and an existing non-expired artifact is reused.
+    *dns_pins* are the addresses the API validated for the URL's host
+    (see :func:`utils.validators.pins_for`).
     """
+    from app.services import events, result_cache
+    from app.services.cache import run_in_new_loop
+    from app.services.progress import ProgressEvent, ProgressThrottle
+    from utils import validators
+
+    validators.install_dns_pinning()
+    validators.load_pins(dns_pins or {})
+
     # Generate deterministic filename if not provided
     download_id = self.request.id or str(uuid.uuid4())
-    target_name = filename or f"{download_id}.%(ext)s"
+    stem = artifact_name or download_id
+    target_name = filename or f"{stem}.%(ext)s"
     target_path = DOWNLOAD_DIR / target_name
 
+    def _publish(state: str, info: Dict[str, Any]) -> None:
+        events.publish_remote(download_id, {"downloadId": download_id, "state": state, "info": info})
+
+    throttle = ProgressThrottle()
+    last_phase: list[str | None] = [None]
+
+    def _on_progress(event: ProgressEvent) -> None:
+        # Throttled so long downloads do not flood the result backend
+        phase_changed = event.phase != last_phase[0]
+        last_phase[0] = event.phase
+        if not throttle.should_emit(event.percent or 0.0) and not phase_changed:
+            return
+        meta = event.to_meta()
+        try:
+            self.update_state(state="PROGRESS", meta=meta)
+        except Exception:  # noqa: BLE001 - progress must never abort the download
+            pass
+        _publish("PROGRESS", meta)
+
+    _publish(states.STARTED, {"status": "in_progress"})
     try:
-        # Run the yt-dlp command inside an event loop – Celery tasks are sync so we
-        # manually drive the async function.
-        asyncio.run(_run_ytdlp(url, format_id, target_path))
+        existing = None if filename else result_cache.find_local_artifact(DOWNLOAD_DIR, stem)
+        if existing is None:
+            # Run the yt-dlp command inside an event loop – Celery tasks are sync so we
+            # manually drive the async function. The heartbeat tells API requests
+            # that this task is still alive and may be attached to.
+            with result_cache.heartbeat(_redis(), download_id):
+                run_in_new_loop(_run_ytdlp(url, format_id, target_path, progress_callback=_on_progress))
+            existing = target_path if filename else result_cache.find_local_artifact(DOWNLOAD_DIR, stem)
+            _register_artifact(existing or target_path)
 
         result = {
             "status": "finished",
-            "filePath": str(target_path),
+            "filePath": str(existing or target_path),
+            "progress": 100.0,
+            "progressPercent": 100.0,
         }
+        _publish(states.SUCCESS, result)
         return result
     except Exception as exc:  # noqa: BLE001
         # Mark task as failed and include the error message in meta for clients.
-        self.update_state(
-            state=states.FAILURE,
-            meta={
-                "status": "error",
-                "message": str(exc),
-            },
-        )
+        meta = {
+            "status": "error",
+            "message": str(exc),
+        }
+        self.update_state(state=states.FAILURE, meta=meta)
+        _publish(states.FAILURE, meta)
         # Re-raise so Celery records the traceback
         raise
 
@@ -1,35 +1,378 @@
-"""Background task to periodically clean up old files in /tmp.
+"""Background cleanup of downloaded artifacts.
 
-Uses asyncio.sleep loop. Can be used in FastAPI lifespan or Celery beat.
+Finished downloads are registered in an expiry index (:func:`register`), so a
+cleanup pass only touches entries whose TTL has passed instead of scanning the
+download directory. The index also remembers when each file was last served
+(:func:`touch`); when the indexed files exceed ``DOWNLOAD_DIR_MAX_MB`` (or,
+if ``DOWNLOAD_DISK_HIGH_WATER`` is set, the volume holding the downloads
+fills past it) the least-recently-served files are evicted early until usage
+drops below the low-water mark. Files registered or served within
+``EVICTION_GRACE_SECONDS`` are never evicted, and nothing is evicted when the
+evictable files could not bring the volume below ``DOWNLOAD_DISK_LOW_WATER``
+anyway (e.g. a shared ``/tmp`` filled by other data).
+
+Partial files of failed downloads (``.part``/``.ytdl`` next to an artifact
+name, unmerged ``.f<format>`` and ``.temp`` files) are not indexed; a bounded directory sweep removes them once they have
+not changed for ``PARTIAL_FILE_TTL_MINUTES``.
+
+The in-process downloader uses a heap-backed in-memory index. With Celery the
+index lives in Redis sorted sets so workers register artifacts and the API
+process cleans them up. Can be used in FastAPI lifespan or Celery beat.
 """
 
 from __future__ import annotations
 
 import asyncio
+import heapq
+import logging
 import os
-from datetime import datetime, timedelta, timezone
+import re
+import shutil
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Final
+from typing import Dict, Final, Iterable, List, Set, Tuple
+
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
 
 DOWNLOAD_DIR = Path(os.getenv("DOWNLOAD_DIR", "/tmp"))
 TTL_MINUTES: Final[int] = int(os.getenv("TEMP_FILE_TTL_MINUTES", "10"))
-CHECK_INTERVAL_SECONDS: Final[int] = 300  # every 5 min
+CHECK_INTERVAL_SECONDS: Final[int] = int(os.getenv("CLEANUP_INTERVAL_SECONDS", "60"))
+# Fraction of the volume in use that triggers LRU eviction (0 = off), and the target after it.
+# Only for volumes dedicated to downloads: other data on the volume cannot be evicted.
+DISK_HIGH_WATER: Final[float] = float(os.getenv("DOWNLOAD_DISK_HIGH_WATER", "0"))
+DISK_LOW_WATER: Final[float] = float(os.getenv("DOWNLOAD_DISK_LOW_WATER", "0.80"))
+# Optional cap on the total size of indexed artifacts (0 = no cap)
+MAX_ARTIFACT_BYTES: Final[int] = int(os.getenv("DOWNLOAD_DIR_MAX_MB", "0")) * 1024 * 1024
+# Eviction under the cap stops at this fraction of it
+_CAP_LOW_WATER: Final[float] = 0.9
+# Artifacts registered or served this recently are never evicted
+EVICTION_GRACE_SECONDS: Final[int] = int(os.getenv("EVICTION_GRACE_SECONDS", "600"))
+# Partial files unchanged for this long belong to failed downloads
+PARTIAL_FILE_TTL_MINUTES: Final[int] = int(os.getenv("PARTIAL_FILE_TTL_MINUTES", "60"))
+_PARTIAL_SWEEP_INTERVAL: Final[int] = 900  # seconds between partial-file sweeps
+_PARTIAL_SWEEP_MAX_ENTRIES: Final[int] = 10000  # directory entries looked at per sweep and directory
+
+# Names this service gives artifacts: content addresses and Celery task ids
+_ARTIFACT_STEM = r"([0-9a-f]{32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})"
+_ARTIFACT_NAME_RE = re.compile(rf"^{_ARTIFACT_STEM}\.\w+$")
+# yt-dlp's leftovers for them, e.g. "<key>.f137.mp4.part", "<key>.mp4.part-Frag3", "<key>.mp4.ytdl",
+# and unmerged formats / post-processing temp files ("<key>.f137.mp4", "<key>.temp.mp4")
+_PARTIAL_NAME_RE = re.compile(
+    rf"^{_ARTIFACT_STEM}\.(([\w.-]+\.)?(part(-Frag\d+)?|ytdl)|(f[\w-]+|temp)\.\w+)$"
+)
+
+
+def is_artifact_name(name: str) -> bool:
+    """Return True for the name of a finished artifact (``<key>.<ext>``), not a leftover."""
+    return bool(_ARTIFACT_NAME_RE.match(name)) and not _PARTIAL_NAME_RE.match(name)
+
+
+@dataclass(slots=True)
+class _Entry:
+    expires_at: float
+    size: int
+    last_served: float
+
+
+class LocalArtifactIndex:
+    """In-memory expiry index: a min-heap on expiry plus last-served times."""
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, _Entry] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def register(self, path: str, expires_at: float, size: int) -> None:
+        with self._lock:
+            old = self._entries.get(path)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[path] = _Entry(expires_at, size, time.time())
+            self._bytes += size
+            heapq.heappush(self._heap, (expires_at, path))
+
+    def touch(self, path: str) -> None:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                entry.last_served = time.time()
+
+    def remove(self, path: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(path, None)
+            if entry is not None:
+                self._bytes -= entry.size
+
+    def pop_expired(self, now: float) -> List[str]:
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expires_at, path = heapq.heappop(self._heap)
+                entry = self._entries.get(path)
+                # Skip stale heap items left by re-registration or removal
+                if entry is not None and entry.expires_at == expires_at:
+                    del self._entries[path]
+                    self._bytes -= entry.size
+                    expired.append(path)
+        return expired
+
+    def least_recently_served(self, limit: int, served_before: float) -> List[str]:
+        with self._lock:
+            candidates = (p for p, e in self._entries.items() if e.last_served < served_before)
+            return heapq.nsmallest(limit, candidates, key=lambda p: self._entries[p].last_served)
+
+    def evictable_bytes(self, served_before: float) -> int:
+        with self._lock:
+            return sum(e.size for e in self._entries.values() if e.last_served < served_before)
+
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisArtifactIndex:
+    """Expiry index shared through Redis (Celery workers and API processes)."""
+
+    _EXPIRY = "clipx:artifacts:expiry"
+    _SERVED = "clipx:artifacts:served"
+    _SIZE = "clipx:artifacts:size"
+
+    def __init__(self, redis_url: str) -> None:
+        import redis
+
+        self._redis = redis.from_url(redis_url, socket_connect_timeout=1, socket_timeout=2)
+
+    def register(self, path: str, expires_at: float, size: int) -> None:
+        pipe = self._redis.pipeline()
+        pipe.zadd(self._EXPIRY, {path: expires_at})
+        pipe.zadd(self._SERVED, {path: time.time()})
+        pipe.hset(self._SIZE, path, size)
+        pipe.execute()
+
+    def touch(self, path: str) -> None:
+        # XX: only update files that are still indexed
+        self._redis.zadd(self._SERVED, {path: time.time()}, xx=True)
+
+    def remove(self, path: str) -> None:
+        self._remove_many([path])
+
+    def _remove_many(self, paths: List[str]) -> None:
+        if not paths:
+            return
+        pipe = self._redis.pipeline()
+        pipe.zrem(self._EXPIRY, *paths)
+        pipe.zrem(self._SERVED, *paths)
+        pipe.hdel(self._SIZE, *paths)
+        pipe.execute()
+
+    def pop_expired(self, now: float) -> List[str]:
+        paths = [p.decode() for p in self._redis.zrangebyscore(self._EXPIRY, "-inf", now)]
+        self._remove_many(paths)
+        return paths
+
+    def least_recently_served(self, limit: int, served_before: float) -> List[str]:
+        return [
+            p.decode()
+            for p in self._redis.zrangebyscore(self._SERVED, "-inf", f"({served_before}", start=0, num=limit)
+        ]
+
+    def evictable_bytes(self, served_before: float) -> int:
+        paths = self._redis.zrangebyscore(self._SERVED, "-inf", f"({served_before}")
+        return sum(int(v) for v in self._redis.hmget(self._SIZE, paths) if v) if paths else 0
+
+    def total_bytes(self) -> int:
+        return sum(int(v) for v in self._redis.hvals(self._SIZE))
 
+    def __len__(self) -> int:
+        return self._redis.zcard(self._EXPIRY)
 
-async def _remove_old_files() -> None:  # pragma: no cover
-    cutoff = datetime.now(tz=timezone.utc) - timedelta(minutes=TTL_MINUTES)
-    for file in DOWNLOAD_DIR.glob("*"):
-        if not file.is_file():
+
+index: LocalArtifactIndex | RedisArtifactIndex = LocalArtifactIndex()
+_watched_dirs: Set[Path] = set()
+
+
+def use_redis_index(redis_url: str) -> None:
+    """Switch this process to the Redis-backed index (Celery deployments)."""
+    global index
+    index = RedisArtifactIndex(redis_url)
+
+
+def use_local_index() -> None:
+    """Switch back to the in-memory index (in-process downloads, see :func:`bootstrap`)."""
+    global index
+    if not isinstance(index, LocalArtifactIndex):
+        index = LocalArtifactIndex()
+
+
+def register(path: str | Path, ttl_seconds: float | None = None) -> None:
+    """Add a finished artifact to the expiry index."""
+    path = Path(path)
+    try:
+        st = path.stat()
+    except OSError:
+        return
+    ttl = TTL_MINUTES * 60 if ttl_seconds is None else ttl_seconds
+    _watched_dirs.add(path.parent)
+    index.register(str(path), st.st_mtime + ttl, st.st_size)
+    if _bytes_to_free():
+        _evict_lru()
+
+
+def touch(path: str | Path) -> None:
+    """Mark *path* as just served so LRU eviction keeps it longer."""
+    try:
+        index.touch(str(path))
+    except Exception as exc:  # noqa: BLE001
+        logger.debug("Could not update last-served time of %s: %s", path, exc)
+
+
+def bootstrap(directory: Path) -> int:
+    """Index artifacts left in *directory* by a previous run; returns the count.
+
+    Only files named like this service's artifacts are considered, so other
+    files in a shared directory (e.g. ``/tmp``) are never deleted.
+    """
+    count = 0
+    _watched_dirs.add(directory)
+    try:
+        candidates: Iterable[Path] = list(directory.iterdir())
+    except OSError:
+        return 0
+    for path in candidates:
+        if is_artifact_name(path.name) and path.is_file():
+            register(path)
+            count += 1
+    return count
+
+
+def _volume_excess() -> int:
+    """Bytes to free so every watched volume is below the low-water mark (0 unless over the high one)."""
+    if not DISK_HIGH_WATER:
+        return 0
+    excess = 0
+    for directory in _watched_dirs:
+        try:
+            usage = shutil.disk_usage(directory)
+        except OSError:
+            continue
+        if usage.total and usage.used / usage.total > DISK_HIGH_WATER:
+            excess = max(excess, int(usage.used - DISK_LOW_WATER * usage.total))
+    return excess
+
+
+def _bytes_to_free() -> int:
+    """Bytes eviction should reclaim now, 0 when within budget."""
+    needed = 0
+    if MAX_ARTIFACT_BYTES:
+        total = index.total_bytes()
+        if total > MAX_ARTIFACT_BYTES:
+            needed = int(total - MAX_ARTIFACT_BYTES * _CAP_LOW_WATER)
+    return max(needed, _volume_excess())
+
+
+def _unlink(paths: Iterable[str]) -> Tuple[int, int]:
+    removed = reclaimed = 0
+    for path in paths:
+        try:
+            size = os.stat(path).st_size
+            os.unlink(path)
+        except FileNotFoundError:
+            continue
+        except OSError as exc:
+            logger.warning("Could not remove %s: %s", path, exc)
+            continue
+        removed += 1
+        reclaimed += size
+    return removed, reclaimed
+
+
+def _evict_lru(batch: int = 16) -> Tuple[int, int]:
+    """Evict least-recently-served artifacts until usage is below the low-water mark."""
+    needed = _bytes_to_free()
+    if not needed:
+        return 0, 0
+    served_before = time.time() - EVICTION_GRACE_SECONDS
+    if index.evictable_bytes(served_before) < needed:
+        # The rest of the volume is used by files we do not own (or by recent artifacts)
+        logger.warning("Disk budget exceeded by %d bytes but evictable artifacts cannot free it; skipping", needed)
+        return 0, 0
+    removed = reclaimed = 0
+    while reclaimed < needed:
+        victims = index.least_recently_served(batch, served_before)
+        if not victims:
+            break
+        for path in victims:
+            index.remove(path)
+            files, size = _unlink([path])
+            removed += files
+            reclaimed += size
+            if reclaimed >= needed:
+                break
+    if removed:
+        logger.info("Evicted %d artifacts (%d bytes) to stay within the disk budget", removed, reclaimed)
+        metrics.observe_cleanup(removed, reclaimed)
+    return removed, reclaimed
+
+
+_last_partial_sweep = 0.0
+
+
+def _sweep_partials(now: float) -> Tuple[int, int]:
+    """Remove stale partial files of failed downloads from the watched directories.
+
+    Runs at most every ``_PARTIAL_SWEEP_INTERVAL`` seconds and looks at no more
+    than ``_PARTIAL_SWEEP_MAX_ENTRIES`` entries per directory.
+    """
+    global _last_partial_sweep
+    if now - _last_partial_sweep < _PARTIAL_SWEEP_INTERVAL:
+        return 0, 0
+    _last_partial_sweep = now
+    cutoff = now - PARTIAL_FILE_TTL_MINUTES * 60
+    stale = []
+    for directory in list(_watched_dirs):
+        try:
+            with os.scandir(directory) as entries:
+                for seen, entry in enumerate(entries):
+                    if seen >= _PARTIAL_SWEEP_MAX_ENTRIES:
+                        break
+                    if _PARTIAL_NAME_RE.match(entry.name) and entry.is_file() and entry.stat().st_mtime < cutoff:
+                        stale.append(entry.path)
+        except OSError:
             continue
-        mtime = datetime.fromtimestamp(file.stat().st_mtime, tz=timezone.utc)
-        if mtime < cutoff:
-            try:
-                file.unlink(missing_ok=True)
-            except Exception:  # noqa: BLE001
-                pass
+    return _unlink(stale)
+
+
+def cleanup_pass() -> Tuple[int, int]:
+    """Remove expired artifacts and stale partial files, then enforce the disk budget; returns (files, bytes)."""
+    now = time.time()
+    removed, reclaimed = _unlink(index.pop_expired(now))
+    files, size = _sweep_partials(now)
+    removed += files
+    reclaimed += size
+    metrics.observe_cleanup(removed, reclaimed)
+    if _bytes_to_free():
+        files, size = _evict_lru()
+        removed += files
+        reclaimed += size
+    return removed, reclaimed
+
+
+async def run_cleanup() -> None:  # pragma: no cover
+    """Run one cleanup pass in a worker thread (APScheduler job)."""
+    try:
+        await asyncio.to_thread(cleanup_pass)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("Cleanup pass failed: %s", exc)
 
 
 async def periodic_cleanup() -> None:  # pragma: no cover
     while True:
-        await _remove_old_files()
-        await asyncio.sleep(CHECK_INTERVAL_SECONDS)
\ No newline at end of file
+        await run_cleanup()
+        await asyncio.sleep(CHECK_INTERVAL_SECONDS)
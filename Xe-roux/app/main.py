@@ -7,93 +7,40 @@ import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.exception_handlers import http_exception_handler as default_http_exception_handler
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-# Import FastAPILimiter with fallback
-try:
-    from fastapi_limiter import FastAPILimiter
-    from redis import asyncio as aioredis
-except ImportError:
-    # Create dummy FastAPILimiter for fallback
-    class FastAPILimiter:
-        _disabled = True
-        @classmethod
-        def init(cls, *args, **kwargs):
-            pass
 # Simplified imports for Windows compatibility
 try:
     from apscheduler.schedulers.asyncio import AsyncIOScheduler
-    from app.cleanup import periodic_cleanup
     SCHEDULER_AVAILABLE = True
 except ImportError:
     SCHEDULER_AVAILABLE = False
-from app.routers import download, healthz, preview
+from app import cleanup
+from app.routers import download, healthz, metrics as metrics_router, preview
+from app.services import backends, downloader, extractor_pool, health, metrics, rate_limit, ytdlp
+from utils import validators
 
 # Configuration via environment variables
-RATE_LIMIT_REQUESTS = int(os.getenv("RATE_LIMIT_REQUESTS", "10"))
-RATE_LIMIT_PERIOD = int(os.getenv("RATE_LIMIT_PERIOD", "60"))  # seconds
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
 # Global scheduler instance (shared across app lifespan)
 scheduler = AsyncIOScheduler() if SCHEDULER_AVAILABLE else None
+# Persisted in-process downloads are re-queued once, when that backend is first selected
+_pending_restored = False
 
 
-async def _init_rate_limiter() -> None:  # pragma: no cover
-    """Initialize FastAPI-Limiter using Redis backend.
-
-    If Redis is not reachable, the application will still start but the
-    rate-limiting dependencies will degrade to no-op stubs so that routes
-    depending on ``RateLimiter`` continue to work without raising 500 errors.
-    """
-    # Check if fastapi_limiter is available
-    if not hasattr(FastAPILimiter, '_disabled'):
-        try:
-            redis = await aioredis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
-            # Proactively check connectivity – if Redis is down this will raise
-            await redis.ping()
-            await FastAPILimiter.init(redis)
-        except Exception as exc:  # noqa: BLE001
-            # Redis unavailable – fallback to dummy limiter so that the app can start
-            import logging
-            from fastapi import Depends  # local import to avoid circular
-            
-            try:
-                import fastapi_limiter.depends as _depends
-                
-                logging.warning("Rate limiter disabled – Redis unreachable: %s", exc)
-
-                async def _dummy_dep():  # pragma: no cover
-                    return  # just allow the request to proceed
-
-                # Replace RateLimiter dependency factory with a no-op variant
-                old_rl = _depends.RateLimiter
-                _depends.RateLimiter = lambda *a, **kw: Depends(_dummy_dep)
-
-                # Also patch existing RateLimiter instances to become no-ops
-                async def _no_op_rate_limiter(self, request, response=None):  # type: ignore[unused-argument]
-                    return  # simply allow
-                # Monkeypatch __call__ on original class so already-created instances work
-                old_rl.__call__ = _no_op_rate_limiter  # type: ignore[assignment]
-
-                # Propagate the patched RateLimiter to any modules that already imported it
-                import sys, inspect
-                for module in list(sys.modules.values()):
-                    if module is None:
-                        continue
-                    rl_attr = getattr(module, "RateLimiter", None)
-                    if rl_attr is old_rl:
-                        setattr(module, "RateLimiter", _depends.RateLimiter)
-
-                # Also mark limiter as disabled for other checks
-                setattr(FastAPILimiter, "_disabled", True)
-            except ImportError:
-                # fastapi_limiter not available at all
-                logging.warning("Rate limiter disabled – fastapi_limiter not available: %s", exc)
-                setattr(FastAPILimiter, "_disabled", True)
-    else:
-        # fastapi_limiter not available at all
-        import logging
-        logging.warning("Rate limiter disabled – fastapi_limiter not available")
+async def _on_backend_change(celery: bool) -> None:
+    """Point artifact cleanup at the backend now taking new downloads."""
+    global _pending_restored
+    if celery:
+        cleanup.use_redis_index(REDIS_URL)
+        return
+    cleanup.use_local_index()
+    await asyncio.to_thread(cleanup.bootstrap, downloader.DOWNLOAD_DIR)
+    if not _pending_restored:
+        _pending_restored = True
+        downloader.restore_pending()
 
 
 def create_app() -> FastAPI:
@@ -109,26 +56,41 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(metrics.MetricsMiddleware)
 
     # Startup tasks
     @app.on_event("startup")
     async def on_startup() -> None:  # noqa: D401
-        await _init_rate_limiter()
+        # yt-dlp running in this process connects to the addresses validate_url_async checked
+        validators.install_dns_pinning()
+        app.state.rate_limit_task = asyncio.create_task(rate_limit.limiter.run())
+        app.state.health_task = asyncio.create_task(health.run_prober())
+        if ytdlp._pool_engine_enabled():
+            app.state.extractor_warmup = asyncio.create_task(extractor_pool.warm_up())
+        # Redis/Celery availability is checked in the background and re-checked
+        # periodically, so startup never waits on the broker
+        backends.on_change(_on_backend_change)
+        app.state.backend_task = asyncio.create_task(backends.run_checker())
         if scheduler:
             scheduler.start()
-            scheduler.add_job(periodic_cleanup, "interval", minutes=30)
-        # Fallback cleanup loop for environments where APScheduler is disabled
-        if SCHEDULER_AVAILABLE:
-            app.state.cleanup_task = asyncio.create_task(periodic_cleanup())
+            scheduler.add_job(cleanup.run_cleanup, "interval", seconds=cleanup.CHECK_INTERVAL_SECONDS)
+        else:
+            # Fallback cleanup loop for environments where APScheduler is not installed
+            app.state.cleanup_task = asyncio.create_task(cleanup.periodic_cleanup())
 
     # Shutdown tasks
     @app.on_event("shutdown")
     async def on_shutdown() -> None:  # noqa: D401
         if scheduler:
             scheduler.shutdown(wait=False)
-        cleanup_task: asyncio.Task | None = getattr(app.state, "cleanup_task", None)
-        if cleanup_task:
-            cleanup_task.cancel()
+        extractor_pool.shutdown()
+        # Drain (or persist) queued in-process downloads without blocking the loop;
+        # they may still be running after Celery was selected again
+        await asyncio.to_thread(downloader.shutdown)
+        for name in ("backend_task", "cleanup_task", "health_task", "rate_limit_task"):
+            task: asyncio.Task | None = getattr(app.state, name, None)
+            if task:
+                task.cancel()
 
     # Custom handler for 429 Too Many Requests
     @app.exception_handler(HTTPException)
@@ -139,10 +101,11 @@ def create_app() -> FastAPI:
                 content={"detail": exc.detail or "Rate limit exceeded. Try again later."},
                 headers={"Retry-After": exc.headers.get("Retry-After", "60")} if exc.headers else {},
             )
-        raise exc
+        return await default_http_exception_handler(request, exc)
 
     # Routers
     app.include_router(healthz.router)
+    app.include_router(metrics_router.router)
     app.include_router(preview.router, prefix="/preview", tags=["preview"])
     app.include_router(download.router, prefix="/download", tags=["download"])
 
@@ -1,46 +1,23 @@
-from fastapi import APIRouter, status, HTTPException
-from pydantic import BaseModel
-import os
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, status, HTTPException, Request, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field
+import asyncio
+import json
+import time
+import uuid
+from fastapi.responses import StreamingResponse
 from pathlib import Path
+from typing import AsyncIterator, List
 
-# Try to import Celery, fallback to local processing if Redis unavailable
-try:
-    import os
-    import redis
-    # Test Redis connection first before importing Celery
-    REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-    redis_client = redis.from_url(REDIS_URL, socket_connect_timeout=1)
-    redis_client.ping()
-    # If Redis is reachable, import Celery
-    from app.celery_worker import celery_app
-    CELERY_AVAILABLE = True
-except Exception:
-    CELERY_AVAILABLE = False
-    # Import the in-process downloader for fallback
-    from app.services.downloader import queue_download, get_status
-
-# Import RateLimiter with fallback
-try:
-    from fastapi_limiter.depends import RateLimiter
-    from fastapi import Depends
-    RATE_LIMITER_AVAILABLE = True
-except ImportError:
-    # Create dummy RateLimiter for fallback
-    RATE_LIMITER_AVAILABLE = False
-    def RateLimiter(times=None, seconds=None):  # noqa: N802
-        class DummyRateLimiter:
-            def __init__(self, times=None, seconds=None):
-                self.times = times
-                self.seconds = seconds
-            
-            async def __call__(self):
-                pass
-        return DummyRateLimiter(times, seconds)
-
-from utils.validators import validate_url
-
-router = APIRouter()
+from app.services import backends, downloader
+from app.services.downloader import queue_download, get_status
+from app.services.sqlite_jobs import SQLITE_POLL_INTERVAL
+from app import cleanup
+from app.services import events, job_groups, playlist, rate_limit, result_cache, ytdlp
+from app.services.file_delivery import file_response, media_type_for, zip_response
+from utils import validators
+
+# Celery vs in-process is re-checked periodically; wait for the first check
+router = APIRouter(dependencies=[Depends(backends.ensure_checked)])
 
 
 class DownloadRequest(BaseModel):
@@ -50,67 +27,398 @@ class DownloadRequest(BaseModel):
     filename: str | None = None
 
 
-rate_limiter_dep = RateLimiter(times=3, seconds=1800) if RATE_LIMITER_AVAILABLE else None
+# Enqueueing work draws on the strict "download" bucket, polling on the shared "api" one
+download_limit = Depends(rate_limit.limit(bucket="download"))
+poll_limit = Depends(rate_limit.limit(rate_limit.RATE_LIMIT_COST_POLL))
+# Claim rounds for a result key held by dead tasks before queueing an unshared task
+_CLAIM_ATTEMPTS = 3
 
-@router.post("/", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(rate_limiter_dep)] if rate_limiter_dep else [])
+@router.post("/", status_code=status.HTTP_202_ACCEPTED, dependencies=[download_limit])
 async def download_video(payload: DownloadRequest):
     """Enqueue a download task and return the task ID."""
-    url = validate_url(payload.url)
+    url = await validators.validate_url_async(payload.url)
     
-    if not CELERY_AVAILABLE:
+    format_id = payload.format or "best"
+
+    if not backends.celery_available():
         # Fallback: Use in-process downloader
         try:
-            download_id = await queue_download(url, payload.format or "best", payload.filename)
-            return {"downloadId": download_id, "status": "queued", "note": "Using in-process downloader"}
+            download_id = await queue_download(url, format_id, payload.filename)
+            download_status = get_status(download_id).get("status", "queued")
+            return {"downloadId": download_id, "status": download_status, "note": "Using in-process downloader"}
         except Exception as exc:  # noqa: BLE001
             raise HTTPException(status_code=400, detail=f"Download failed: {str(exc)}") from exc
     
     try:
-        task = celery_app.send_task(
-            "download_video",
-            args=[url, payload.format, payload.filename],
-        )
-        return {"downloadId": task.id, "status": "queued"}
+        return await asyncio.to_thread(_queue_celery, url, format_id, payload.filename)
     except Exception as exc:  # noqa: BLE001
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
-@router.get("/status/{download_id}", status_code=status.HTTP_200_OK, dependencies=[Depends(RateLimiter())] if RATE_LIMITER_AVAILABLE else [])
+def _queue_celery(url: str, format_id: str, filename: str | None = None) -> dict:
+    """Send a Celery download task, attaching to an identical one if possible.
+
+    Blocking (Redis and broker round trips): call it off the event loop.
+    """
+    redis_client, celery_app = backends.redis_client(), backends.celery_app()
+    # Attach to an identical in-flight or finished task instead of duplicating it
+    key = result_cache.result_key(url, format_id, filename=filename)
+    task_id = str(uuid.uuid4())
+    # Another request may claim the key between releasing a dead task and
+    # claiming it again; attach to that winner instead of running a duplicate
+    for _ in range(_CLAIM_ATTEMPTS):
+        existing = result_cache.claim_remote(redis_client, key, task_id)
+        if existing is None:
+            break
+        state = celery_app.AsyncResult(existing).state
+        if _celery_result_shareable(existing, state):
+            return {"downloadId": existing, "status": "finished" if state == "SUCCESS" else "queued"}
+        result_cache.release_remote(redis_client, key, existing)
+
+    result_cache.mark_alive(redis_client, task_id, result_cache.TASK_QUEUED_TTL)
+    task = celery_app.send_task(
+        "download_video",
+        args=[url, format_id, filename],
+        kwargs={"artifact_name": key, "dns_pins": validators.pins_for(url)},
+        task_id=task_id,
+    )
+    return {"downloadId": task.id, "status": "queued"}
+
+
+class PlaylistDownloadRequest(BaseModel):
+    url: str
+    format: str | None = "best"
+    # Entry URLs picked from ``POST /preview/playlist``; omit to download every entry
+    entries: List[str] | None = Field(None, min_length=1, max_length=playlist.PLAYLIST_DOWNLOAD_MAX_ENTRIES)
+
+
+@router.post("/playlist", status_code=status.HTTP_202_ACCEPTED)
+async def download_playlist(payload: PlaylistDownloadRequest, request: Request):
+    """Enqueue all (or the selected) entries of a playlist as one job group.
+
+    Only the flat listing is read here; each entry's formats are resolved by
+    its own download job. "Download all" takes the first
+    ``PLAYLIST_DOWNLOAD_MAX_ENTRIES`` entries and is charged like a playlist
+    listing. Every enqueued entry costs one unit of the "download" bucket;
+    groups larger than the whole allowance are rejected with 413.
+    """
+    url = await validators.validate_url_async(payload.url)
+    format_id = payload.format or "best"
+    title = None
+    if payload.entries is None:
+        rate_limit.charge(request, rate_limit.RATE_LIMIT_COST_PREVIEW)
+        try:
+            listed = [
+                entry["url"]
+                async for entry in playlist.iter_entries(url, playlist.PLAYLIST_DOWNLOAD_MAX_ENTRIES)
+                if entry["url"]
+            ]
+        except RuntimeError as exc:
+            raise HTTPException(status_code=502, detail=str(exc)) from exc
+        # The listing comes from the remote page, so its entries are checked too
+        checked = await asyncio.gather(*(validators.validate_url_async(u) for u in listed), return_exceptions=True)
+        entry_urls = [u for u in checked if isinstance(u, str)]
+        # Same page size as iter_entries, so this is served from the page cache
+        title = (await playlist.fetch_page(url, None, playlist.PLAYLIST_MAX_PAGE_SIZE)).get("title")
+    else:
+        entry_urls = await validators.validate_urls_async(payload.entries)
+    if not entry_urls:
+        raise HTTPException(status_code=400, detail="Playlist has no downloadable entries")
+    if rate_limit.RATE_LIMIT_ENABLED and len(entry_urls) > rate_limit.BUCKETS["download"].capacity:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Playlist exceeds the download rate limit; select at most {rate_limit.BUCKETS['download'].capacity} entries.",
+        )
+    rate_limit.charge(request, len(entry_urls), bucket="download")
+
+    try:
+        if not backends.celery_available():
+            group = await downloader.queue_group(entry_urls, format_id, source_url=url, title=title)
+        else:
+
+            def _queue_all() -> job_groups.JobGroup:
+                download_ids = [_queue_celery(entry, format_id)["downloadId"] for entry in entry_urls]
+                group = job_groups.new_group(download_ids, source_url=url, title=title)
+                job_groups.save_remote(backends.redis_client(), group)
+                return group
+
+            group = await asyncio.to_thread(_queue_all)
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(status_code=400, detail=f"Download failed: {str(exc)}") from exc
+    return {**group.to_dict(), "status": "queued"}
+
+
+async def _load_group(group_id: str):
+    """Return ``(group, in_process)``, looking in the backend that created the group."""
+    group = downloader.get_group(group_id)
+    if group is not None:
+        return group, True
+    if backends.celery_available():
+        group = await asyncio.to_thread(job_groups.load_remote, backends.redis_client(), group_id)
+    if group is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+    return group, False
+
+
+async def _group_members(group, in_process: bool) -> list:
+    """Return the status payload of each member of *group*."""
+    if in_process:
+        return [
+            _in_process_payload(d) or {"downloadId": d, "state": "REVOKED", "info": {"status": "error"}}
+            for d in group.download_ids
+        ]
+    return await asyncio.to_thread(lambda: [_celery_payload(d) for d in group.download_ids])
+
+
+@router.get("/group/{group_id}", status_code=status.HTTP_200_OK, dependencies=[poll_limit])
+async def group_status(group_id: str):
+    """Return a job group's byte-weighted progress and each member's status."""
+    group, in_process = await _load_group(group_id)
+    members = await _group_members(group, in_process)
+    return {
+        **group.to_dict(),
+        **job_groups.aggregate_progress(member.get("info") for member in members),
+        "downloads": members,
+    }
+
+
+@router.get("/group/{group_id}/archive", dependencies=[poll_limit])
+async def group_archive(group_id: str):
+    """Stream the group's finished files as one ZIP (stored, built on the fly).
+
+    Members that are not finished, or whose file is no longer on disk, are
+    left out; ``X-Archive-Skipped`` tells how many.
+    """
+    group, in_process = await _load_group(group_id)
+    files = []
+    for position, member in enumerate(await _group_members(group, in_process), start=1):
+        info = member.get("info")
+        file_path = info.get("filePath") if member.get("state") == "SUCCESS" and isinstance(info, dict) else None
+        if file_path and Path(file_path).exists():
+            # Numbered so names stay unique and keep the group's order
+            files.append((f"{position:03d}-{Path(file_path).name}", Path(file_path)))
+    if not files:
+        raise HTTPException(status_code=400, detail="No finished downloads in group")
+
+    if not backends.celery_available():
+        for _, path in files:
+            cleanup.touch(str(path))
+    else:
+        await asyncio.to_thread(lambda: [cleanup.touch(str(path)) for _, path in files])  # Redis round trips
+
+    response = zip_response(files, f"{group.title or group.group_id}.zip")
+    response.headers["X-Archive-Skipped"] = str(len(group.download_ids) - len(files))
+    return response
+
+
+@router.get("/stream", dependencies=[download_limit])
+async def stream_video(url: str, format: str = "best"):
+    """Pipe the media straight from yt-dlp to the client without touching disk.
+
+    Only formats that need no merge/conversion step can be streamed; use the
+    queue-based ``POST /download/`` flow for the others.
+    """
+    url = await validators.validate_url_async(url)
+    if ytdlp.stream_format(format) is None:
+        raise HTTPException(status_code=400, detail="Format needs merging or conversion; use POST /download/ instead")
+
+    info = await ytdlp.get_cached_info(url)
+    chunks = ytdlp.stream_download(url, format, info)
+    try:
+        # Pull the first chunk so extraction errors still map to a 400
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = b""
+    except RuntimeError as exc:
+        raise HTTPException(status_code=400, detail=f"Download failed: {exc}") from exc
+
+    async def body():
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    ext = ytdlp.stream_extension(format, info)
+    title = (info or {}).get("id") or "download"
+    filename = f"{title}.{ext}" if ext else title
+    return StreamingResponse(
+        body(),
+        media_type=media_type_for(Path(filename)),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _celery_result_path(result) -> str | None:
+    """Return the file path stored in a finished Celery task result."""
+    if not isinstance(result, dict):
+        return None
+    return result.get("filePath") or result.get("file_path")
+
+
+def _celery_result_shareable(task_id: str, state: str) -> bool:
+    """Return True if a request may attach to Celery task *task_id*."""
+    if state in {"FAILURE", "REVOKED"}:
+        return False
+    if state == "SUCCESS":
+        file_path = _celery_result_path(backends.celery_app().AsyncResult(task_id).result)
+        return bool(file_path and Path(file_path).exists())
+    # PENDING is also reported for unknown/lost ids, STARTED for tasks of a dead worker
+    return result_cache.is_alive(backends.redis_client(), task_id)
+
+
+def _is_in_process(download_id: str) -> bool:
+    """Return True if *download_id* is looked up in the in-process downloader.
+
+    Jobs stay with the backend that created them, so an in-process job is
+    still found after Celery becomes available again (and vice versa).
+    """
+    return not backends.celery_available() or get_status(download_id).get("status") != "not_found"
+
+
+# Map in-process status to Celery-like states
+_STATE_MAPPING = {
+    "queued": "PENDING",
+    "in_progress": "STARTED",
+    "finished": "SUCCESS",
+    "error": "FAILURE"
+}
+
+
+def _in_process_payload(download_id: str) -> dict | None:
+    """Return the status payload of an in-process download, or None if unknown."""
+    status_info = get_status(download_id)
+    if status_info.get("status") == "not_found":
+        return None
+    return {
+        "downloadId": download_id,
+        "state": _STATE_MAPPING.get(status_info.get("status", "queued"), "PENDING"),
+        "info": status_info
+    }
+
+
+def _celery_payload(download_id: str) -> dict:
+    async_result = backends.celery_app().AsyncResult(download_id)
+    info = async_result.info
+    if isinstance(info, BaseException):
+        info = {"status": "error", "message": str(info)}
+    return {
+        "downloadId": download_id,
+        "state": async_result.state,
+        "info": info,
+    }
+
+
+def _with_file_url(payload: dict) -> dict:
+    """Add the final file URL to finished payloads pushed to clients."""
+    if payload.get("state") == "SUCCESS" and isinstance(payload.get("info"), dict):
+        info = payload["info"]
+        if not info.get("fileUrl"):
+            payload = {**payload, "info": {**info, "fileUrl": f"/download/file/{payload['downloadId']}"}}
+    return payload
+
+
+@router.get("/status/{download_id}", status_code=status.HTTP_200_OK, dependencies=[poll_limit])
 async def download_status(download_id: str):
     """Return download task status and meta info."""
-    if not CELERY_AVAILABLE:
+    if _is_in_process(download_id):
         # Fallback: Use in-process downloader status
-        status_info = get_status(download_id)
-        if status_info.get("status") == "not_found":
+        payload = _in_process_payload(download_id)
+        if payload is None:
             raise HTTPException(status_code=404, detail="Download not found")
-        
-        # Map status to Celery-like format
-        state_mapping = {
-            "queued": "PENDING",
-            "in_progress": "STARTED",
-            "finished": "SUCCESS",
-            "error": "FAILURE"
-        }
-        
-        return {
-            "downloadId": download_id,
-            "state": state_mapping.get(status_info.get("status", "queued"), "PENDING"),
-            "info": status_info
-        }
+        return payload
     
-    async_result = celery_app.AsyncResult(download_id)
-    response = {
-        "downloadId": download_id,
-        "state": async_result.state,
-        "info": async_result.info,
-    }
-    return response
+    return await asyncio.to_thread(_celery_payload, download_id)
+
+
+async def _progress_updates(download_id: str) -> AsyncIterator[dict | None]:
+    """Yield coalesced status payloads for *download_id* (``None`` = keep-alive).
+
+    In-process downloads are observed through the local event broker, Celery
+    tasks through their Redis pub/sub channel.
+    """
+    if _is_in_process(download_id):
+        with events.subscribe(download_id) as sub:
+            async def snapshot() -> dict:
+                payload = _in_process_payload(download_id) or {"downloadId": download_id, "state": "REVOKED"}
+                return _with_file_url(payload)
+
+            # Jobs in the shared SQLite store may run in another worker process
+            poll = SQLITE_POLL_INTERVAL if downloader.SHARED_JOB_STORE else None
+            async for payload in events.coalesce(sub, snapshot, poll_interval=poll):
+                yield payload
+        return
+
+    async with events.subscribe_remote(download_id) as sub:
+        initial = await asyncio.to_thread(_celery_payload, download_id)
+        checked_at = time.monotonic()
+
+        async def snapshot() -> dict:
+            nonlocal checked_at
+            payload = sub.latest or initial
+            # The terminal pub/sub message may have been lost: re-read the result
+            # backend once per keep-alive interval until the task is final
+            if (
+                payload.get("state") not in events.TERMINAL_STATES
+                and time.monotonic() - checked_at >= events.EVENTS_HEARTBEAT_SECONDS
+            ):
+                checked_at = time.monotonic()
+                stored = await asyncio.to_thread(_celery_payload, download_id)
+                if stored["state"] in events.TERMINAL_STATES:
+                    payload = stored
+            return _with_file_url(payload)
+
+        async for payload in events.coalesce(sub, snapshot):
+            yield payload
+
 
+def _ensure_known(download_id: str) -> None:
+    if not backends.celery_available() and _in_process_payload(download_id) is None:
+        raise HTTPException(status_code=404, detail="Download not found")
 
-@router.get("/file/{download_id}", status_code=status.HTTP_200_OK, dependencies=[Depends(RateLimiter())] if RATE_LIMITER_AVAILABLE else [])
-async def download_file(download_id: str):
-    """Serve the downloaded file directly to the user's device."""
-    if not CELERY_AVAILABLE:
+
+@router.get("/events/{download_id}", dependencies=[poll_limit])
+async def download_events(download_id: str, request: Request):
+    """Stream status changes of a download as Server-Sent Events."""
+    _ensure_known(download_id)
+
+    async def event_stream():
+        async for payload in _progress_updates(download_id):
+            if await request.is_disconnected():
+                break
+            if payload is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: status\ndata: {json.dumps(payload, default=str)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws/{download_id}")
+async def download_events_ws(websocket: WebSocket, download_id: str):
+    """WebSocket variant of :func:`download_events` sending JSON messages."""
+    await websocket.accept()
+    try:
+        _ensure_known(download_id)
+        async for payload in _progress_updates(download_id):
+            if payload is not None:
+                await websocket.send_text(json.dumps(payload, default=str))
+    except HTTPException as exc:
+        await websocket.send_text(json.dumps({"downloadId": download_id, "error": exc.detail}))
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
+
+
+@router.api_route("/file/{download_id}", methods=["GET", "HEAD"], status_code=status.HTTP_200_OK, dependencies=[poll_limit])
+async def download_file(download_id: str, request: Request):
+    """Serve the downloaded file directly to the user's device.
+
+    Supports byte ranges (resume / seeking) and conditional requests.
+    """
+    if _is_in_process(download_id):
         # Fallback: Use in-process downloader status
         status_info = get_status(download_id)
         if status_info.get("status") == "not_found":
@@ -123,29 +431,20 @@ async def download_file(download_id: str):
         if not file_path or not Path(file_path).exists():
             raise HTTPException(status_code=404, detail="File not found")
         
-        # Get the actual filename from the path
-        file_name = Path(file_path).name
-        
-        return FileResponse(
-            path=file_path,
-            filename=file_name,
-            media_type="application/octet-stream"
-        )
+        cleanup.touch(file_path)
+        return file_response(request, Path(file_path))
     
     # For Celery-based downloads, we would need to check the task result
     # This is a placeholder for the Celery implementation
-    async_result = celery_app.AsyncResult(download_id)
-    if async_result.state != "SUCCESS":
+    async_result = backends.celery_app().AsyncResult(download_id)
+    state, result = await asyncio.to_thread(lambda: (async_result.state, async_result.result))
+    if state != "SUCCESS":
         raise HTTPException(status_code=400, detail="Download not yet complete")
     
     # Extract file path from task result
-    file_path = async_result.result.get("file_path") if async_result.result else None
+    file_path = _celery_result_path(result)
     if not file_path or not Path(file_path).exists():
         raise HTTPException(status_code=404, detail="File not found")
     
-    file_name = Path(file_path).name
-    return FileResponse(
-        path=file_path,
-        filename=file_name,
-        media_type="application/octet-stream"
-    )
\ No newline at end of file
+    await asyncio.to_thread(cleanup.touch, file_path)  # Redis round trip
+    return file_response(request, Path(file_path))
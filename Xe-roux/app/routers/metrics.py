@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Response, status
+
+from app.services import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics() -> Response:
+    """Prometheus scrape endpoint (aggregated across processes in multiprocess mode)."""
+    return Response(
+        content=metrics.render(),
+        media_type=metrics.CONTENT_TYPE_LATEST,
+        status_code=status.HTTP_200_OK if metrics.PROMETHEUS_AVAILABLE else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
@@ -1,36 +1,148 @@
-from fastapi import APIRouter, status, HTTPException
-from pydantic import BaseModel
-from app.services import ytdlp
-from utils.validators import validate_url
-from fastapi import Depends
+import asyncio
+import json
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-# Import RateLimiter with fallback
-try:
-    from fastapi_limiter.depends import RateLimiter
-    RATE_LIMITER_AVAILABLE = True
-except ImportError:
-    RATE_LIMITER_AVAILABLE = False
-    def RateLimiter(times=None, seconds=None):  # noqa: N802
-        class DummyRateLimiter:
-            def __init__(self, times=None, seconds=None):
-                self.times = times
-                self.seconds = seconds
-            
-            async def __call__(self):
-                pass
-        return DummyRateLimiter(times, seconds)
+from fastapi import APIRouter, Request, status, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from app.services import playlist, rate_limit, ytdlp
+from utils.validators import validate_url_async
+from fastapi import Depends
 
 router = APIRouter()
 
+# Batch previews: URLs per request and extractions running at once per request
+PREVIEW_BATCH_MAX_URLS = int(os.getenv("PREVIEW_BATCH_MAX_URLS", "200"))
+PREVIEW_BATCH_CONCURRENCY = int(os.getenv("PREVIEW_BATCH_CONCURRENCY", "8"))
+
 
 class PreviewRequest(BaseModel):
     url: str
 
 
-@router.post("/", status_code=status.HTTP_200_OK, dependencies=[Depends(RateLimiter())] if RATE_LIMITER_AVAILABLE else [])
+class BatchPreviewRequest(BaseModel):
+    urls: List[str] = Field(..., min_length=1, max_length=PREVIEW_BATCH_MAX_URLS)
+
+
+class PlaylistRequest(BaseModel):
+    url: str
+    cursor: Optional[str] = None
+    limit: Optional[int] = Field(None, ge=1, le=playlist.PLAYLIST_MAX_PAGE_SIZE)
+
+
+@router.post("/", status_code=status.HTTP_200_OK, dependencies=[Depends(rate_limit.limit(rate_limit.RATE_LIMIT_COST_PREVIEW))])
 async def preview_video(payload: PreviewRequest):
-    url = validate_url(payload.url)
+    url = await validate_url_async(payload.url)
     try:
         return await ytdlp.fetch_preview(url)
     except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@router.get("/cache", status_code=status.HTTP_200_OK)
+async def preview_cache_stats():
+    """Return preview cache hit/miss/coalesce counters for sizing."""
+    return ytdlp.preview_cache.stats()
+
+
+async def _preview_one(index: int, url: str) -> Dict[str, Any]:
+    """Return one NDJSON result line for *url*; errors are reported inline."""
+    try:
+        valid_url = await validate_url_async(url)
+        return {"index": index, "url": url, "ok": True, "preview": await ytdlp.fetch_preview(valid_url)}
+    except HTTPException as exc:
+        return {"index": index, "url": url, "ok": False, "status": exc.status_code, "error": exc.detail}
+    except ValueError as exc:
+        return {"index": index, "url": url, "ok": False, "status": 400, "error": str(exc)}
+    except Exception as exc:  # noqa: BLE001 - one bad URL must not end the batch
+        return {"index": index, "url": url, "ok": False, "status": 502, "error": str(exc) or type(exc).__name__}
+
+
+async def _batch_results(urls: List[str]) -> AsyncIterator[Dict[str, Any]]:
+    """Yield preview results in completion order using a bounded set of workers."""
+    pending: asyncio.Queue = asyncio.Queue()
+    for item in enumerate(urls):
+        pending.put_nowait(item)
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def _worker() -> None:
+        while not pending.empty():
+            index, url = pending.get_nowait()
+            await results.put(await _preview_one(index, url))
+
+    workers = [asyncio.create_task(_worker()) for _ in range(max(1, min(PREVIEW_BATCH_CONCURRENCY, len(urls))))]
+    try:
+        for _ in urls:
+            yield await results.get()
+    finally:
+        # Client went away (or we are done): stop remaining extractions
+        for worker in workers:
+            worker.cancel()
+
+
+@router.post("/batch", status_code=status.HTTP_200_OK)
+async def preview_batch(payload: BatchPreviewRequest, request: Request):
+    """Preview many URLs at once, streaming one NDJSON line per URL as it completes.
+
+    Each line carries the URL's ``index`` in the request, and either
+    ``preview`` or ``error`` (with an HTTP-like ``status``). The rate limit is
+    charged ``RATE_LIMIT_COST_PREVIEW_BATCH_URL`` per URL; batches costing more
+    than the whole allowance are rejected with 413.
+    """
+    cost = rate_limit.RATE_LIMIT_COST_PREVIEW_BATCH_URL * len(payload.urls)
+    if rate_limit.RATE_LIMIT_ENABLED and cost > rate_limit.BUCKETS["api"].capacity:
+        max_urls = rate_limit.BUCKETS["api"].capacity // max(1, rate_limit.RATE_LIMIT_COST_PREVIEW_BATCH_URL)
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds the rate limit; send at most {max_urls} URLs per request.",
+        )
+    rate_limit.charge(request, cost)
+
+    async def _lines() -> AsyncIterator[str]:
+        async for result in _batch_results(payload.urls):
+            yield json.dumps(result, default=str) + "\n"
+
+    return StreamingResponse(
+        _lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/playlist", status_code=status.HTTP_200_OK, dependencies=[Depends(rate_limit.limit(rate_limit.RATE_LIMIT_COST_PREVIEW))])
+async def preview_playlist(payload: PlaylistRequest):
+    """Return one page of a playlist/channel's entries (flat, no format lists).
+
+    Pass the returned ``nextCursor`` as ``cursor`` to get the next page; it is
+    ``null`` on the last page.
+    """
+    url = await validate_url_async(payload.url)
+    try:
+        return await playlist.fetch_page(url, payload.cursor, payload.limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except RuntimeError as exc:
+        raise HTTPException(status_code=502, detail=str(exc))
+
+
+@router.post("/playlist/stream", status_code=status.HTTP_200_OK, dependencies=[Depends(rate_limit.limit(rate_limit.RATE_LIMIT_COST_PREVIEW))])
+async def preview_playlist_stream(payload: PlaylistRequest):
+    """Stream every entry of a playlist as NDJSON, fetching pages as they are consumed.
+
+    Listing stops after ``PLAYLIST_MAX_ENTRIES`` entries. An extraction error
+    ends the stream with an ``{"ok": false, "error": ...}`` line.
+    """
+    url = await validate_url_async(payload.url)
+
+    async def _lines() -> AsyncIterator[str]:
+        try:
+            async for entry in playlist.iter_entries(url):
+                yield json.dumps({"ok": True, "entry": entry}, default=str) + "\n"
+        except Exception as exc:  # noqa: BLE001 - the response has already started
+            yield json.dumps({"ok": False, "error": str(exc) or type(exc).__name__}) + "\n"
+
+    return StreamingResponse(
+        _lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,148 @@
+"""Selection of the download backend: Celery workers or the in-process downloader.
+
+Celery is used while its Redis broker answers. Availability is not decided at
+import time: :func:`run_checker` (started with the app) pings Redis with the
+async client and repeats the check every ``BACKEND_CHECK_INTERVAL`` seconds, so
+a broker that comes up (or goes away) after boot is picked up without a
+restart. After the first check the backend only changes once
+``BACKEND_SWITCH_THRESHOLD`` consecutive checks disagree with it, so a single
+slow or failed ping does not flip the process. Requests that arrive before the first check finishes wait for it via
+:func:`ensure_checked`. Celery itself and the synchronous Redis client are only
+imported once Celery is actually selected, keeping serverless cold starts free
+of them.
+
+Set ``CELERY_ENABLED=0`` to always use the in-process downloader and skip the
+checks entirely.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Final, List
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CELERY_ENABLED: Final[bool] = os.getenv("CELERY_ENABLED", "1") == "1"
+BACKEND_CHECK_INTERVAL: Final[float] = float(os.getenv("BACKEND_CHECK_INTERVAL", "30"))  # seconds
+BACKEND_CHECK_TIMEOUT: Final[float] = float(os.getenv("BACKEND_CHECK_TIMEOUT", "1"))  # seconds
+# Consecutive checks that must disagree with the current backend before switching
+BACKEND_SWITCH_THRESHOLD: Final[int] = max(1, int(os.getenv("BACKEND_SWITCH_THRESHOLD", "3")))
+
+# None until the first check has completed
+_celery_available: bool | None = None if CELERY_ENABLED else False
+_disagreeing_checks = 0
+_check_lock: asyncio.Lock | None = None
+_ping_client = None
+_redis_client = None
+_celery_app = None
+_listeners: List[Callable[[bool], Awaitable[None]]] = []
+
+
+def celery_available() -> bool:
+    """Return whether new work should go to Celery (``False`` until checked)."""
+    return bool(_celery_available)
+
+
+def celery_app():
+    """Return the Celery application, importing it on first use."""
+    global _celery_app
+    if _celery_app is None:
+        from app.celery_worker import celery_app as app
+
+        _celery_app = app
+    return _celery_app
+
+
+def redis_client():
+    """Return the synchronous Redis client used next to Celery (task claims, groups)."""
+    global _redis_client
+    if _redis_client is None:
+        import redis
+
+        _redis_client = redis.from_url(REDIS_URL, socket_connect_timeout=1)
+    return _redis_client
+
+
+def on_change(callback: Callable[[bool], Awaitable[None]]) -> None:
+    """Call ``await callback(celery_available)`` after each check that changes the backend."""
+    _listeners.append(callback)
+
+
+async def _ping() -> bool:
+    global _ping_client
+    try:
+        if _ping_client is None:
+            from redis import asyncio as aioredis
+
+            _ping_client = aioredis.from_url(
+                REDIS_URL,
+                socket_connect_timeout=BACKEND_CHECK_TIMEOUT,
+                socket_timeout=BACKEND_CHECK_TIMEOUT,
+            )
+        await asyncio.wait_for(_ping_client.ping(), BACKEND_CHECK_TIMEOUT)
+    except Exception:  # noqa: BLE001
+        return False
+    return True
+
+
+async def check() -> bool:
+    """Re-check the broker now and return whether Celery is selected."""
+    global _celery_available, _disagreeing_checks
+    if not CELERY_ENABLED:
+        return False
+    available = await _ping()
+    if available and _celery_app is None:
+        try:
+            # Importing Celery takes a while, keep it off the event loop
+            await asyncio.to_thread(celery_app)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Redis is reachable but Celery could not be loaded: %s", exc)
+            available = False
+    if _celery_available is not None and available != _celery_available:
+        _disagreeing_checks += 1
+        if _disagreeing_checks < BACKEND_SWITCH_THRESHOLD:
+            logger.info(
+                "Redis %s (%d/%d checks before switching)",
+                "reachable" if available else "unreachable",
+                _disagreeing_checks,
+                BACKEND_SWITCH_THRESHOLD,
+            )
+            return _celery_available
+    _disagreeing_checks = 0
+    previous, _celery_available = _celery_available, available
+    if previous != available:
+        logger.info("Download backend: %s", "celery" if available else "in-process")
+        for callback in _listeners:
+            try:
+                await callback(available)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Backend change handler failed: %s", exc)
+    return available
+
+
+async def ensure_checked() -> None:
+    """Wait for the first availability check (runs it if nothing has yet)."""
+    global _check_lock
+    if _celery_available is not None:
+        return
+    if _check_lock is None:
+        _check_lock = asyncio.Lock()
+    async with _check_lock:
+        if _celery_available is None:
+            await check()
+
+
+async def run_checker(interval: float = BACKEND_CHECK_INTERVAL) -> None:
+    """Check the broker now and then every *interval* seconds until cancelled."""
+    await ensure_checked()
+    if not CELERY_ENABLED:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await check()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Backend check failed: %s", exc)
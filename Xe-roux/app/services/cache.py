@@ -0,0 +1,290 @@
+"""Caching helpers for expensive yt-dlp calls.
+
+Two tiers are used:
+
+* an in-process LRU with per-entry TTL that answers repeated lookups without
+  leaving the event loop, and
+* an optional Redis tier (re-using ``REDIS_URL``) so that several uvicorn
+  workers / instances share the same extraction results.
+
+Concurrent lookups for a key that is already being loaded are coalesced onto
+the in-flight load ("single-flight") so a viral URL pasted by hundreds of users
+only triggers one extraction.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Final, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+PREVIEW_CACHE_SIZE: Final[int] = int(os.getenv("PREVIEW_CACHE_SIZE", "512"))
+PREVIEW_CACHE_TTL: Final[int] = int(os.getenv("PREVIEW_CACHE_TTL", "600"))  # seconds
+# Raw info dicts are large and their stream URLs expire, keep them briefly
+INFO_CACHE_SIZE: Final[int] = int(os.getenv("INFO_CACHE_SIZE", "64"))
+INFO_CACHE_TTL: Final[int] = int(os.getenv("INFO_CACHE_TTL", "300"))  # seconds
+CACHE_REDIS_ENABLED: Final[bool] = os.getenv("CACHE_REDIS_ENABLED", "1") == "1"
+# After a Redis error the tier is skipped for this many seconds
+_REDIS_RETRY_SECONDS: Final[int] = 30
+
+# Query parameters that never change what yt-dlp extracts
+_TRACKING_PARAMS = {"fbclid", "gclid", "igshid", "si", "feature", "ref", "ref_src"}
+
+
+def normalize_url(url: str) -> str:
+    """Return a canonical form of *url* suitable for use as a cache key.
+
+    Scheme and host are lower-cased, default ports, fragments and common
+    tracking parameters are dropped and the remaining query is sorted.
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    port = parsed.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if k not in _TRACKING_PARAMS and not k.startswith("utm_")
+    )
+    path = parsed.path or "/"
+    return urlunparse((scheme, host, path, "", urlencode(query), ""))
+
+
+class LRUTTLCache:
+    """Thread-safe LRU mapping whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: str) -> Any | None:
+        with self._lock:
+            item = self._data.pop(key, None)
+        return item[1] if item else None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# ---------------------------------------------------------------------------
+# Shared Redis connection (lazy, degrades to "no Redis tier" on failure)
+# ---------------------------------------------------------------------------
+# ``redis.asyncio`` connections are bound to the loop that created them, and the
+# in-process downloader drives coroutines from worker threads with their own
+# loops, so one client is kept per event loop. Short-lived loops must close
+# theirs before they end, see :func:`run_in_new_loop`.
+_redis_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+_redis_down_until = 0.0
+
+
+def _get_redis():
+    """Return a ``redis.asyncio`` client for the running loop or ``None``."""
+    if not CACHE_REDIS_ENABLED or time.monotonic() < _redis_down_until:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _redis_clients.get(loop)
+    if client is None:
+        try:
+            from redis import asyncio as aioredis
+
+            client = aioredis.from_url(
+                REDIS_URL,
+                socket_connect_timeout=0.25,
+                socket_timeout=0.25,
+            )
+        except Exception:  # noqa: BLE001
+            return None
+        _redis_clients[loop] = client
+    return client
+
+
+async def close_redis() -> None:
+    """Close the running loop's Redis client (if one was opened)."""
+    client = _redis_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        try:
+            await client.aclose()
+        except Exception:  # noqa: BLE001
+            pass
+
+
+def run_in_new_loop(coro: Awaitable[Any]) -> Any:
+    """``asyncio.run(coro)`` that closes the cache's Redis connections of that loop.
+
+    Used by the worker threads and Celery tasks, which run one loop per job.
+    """
+
+    async def _main() -> Any:
+        try:
+            return await coro
+        finally:
+            await close_redis()
+
+    return asyncio.run(_main())
+
+
+def _mark_redis_down(exc: Exception) -> None:
+    global _redis_down_until
+    _redis_down_until = time.monotonic() + _REDIS_RETRY_SECONDS
+    logger.warning("Cache Redis tier disabled for %ss: %s", _REDIS_RETRY_SECONDS, exc)
+
+
+class TwoTierCache:
+    """In-process LRU + optional Redis cache with single-flight loading.
+
+    Values must be JSON serialisable so they can be shared through Redis.
+    """
+
+    def __init__(self, namespace: str, maxsize: int, ttl: float, use_redis: bool = True) -> None:
+        self.namespace = namespace
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self._local = LRUTTLCache(maxsize, ttl)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._counters = {"hits": 0, "redisHits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def _redis_key(self, key: str) -> str:
+        return f"clipx:{self.namespace}:{key}"
+
+    async def _redis_get(self, key: str) -> Any | None:
+        client = _get_redis() if self.use_redis else None
+        if client is None:
+            return None
+        try:
+            raw = await client.get(self._redis_key(key))
+        except Exception as exc:  # noqa: BLE001
+            _mark_redis_down(exc)
+            return None
+        return json.loads(raw) if raw else None
+
+    async def _redis_set(self, key: str, value: Any) -> None:
+        client = _get_redis() if self.use_redis else None
+        if client is None:
+            return
+        try:
+            await client.set(self._redis_key(key), json.dumps(value), ex=int(self.ttl))
+        except Exception as exc:  # noqa: BLE001
+            _mark_redis_down(exc)
+
+    async def _redis_delete(self, key: str) -> None:
+        client = _get_redis() if self.use_redis else None
+        if client is None:
+            return
+        try:
+            await client.delete(self._redis_key(key))
+        except Exception as exc:  # noqa: BLE001
+            _mark_redis_down(exc)
+
+    def get_local(self, key: str) -> Any | None:
+        """Return a value from the in-process tier only (no I/O)."""
+        return self._local.get(key)
+
+    async def get(self, key: str) -> Any | None:
+        """Return a cached value from either tier without loading it."""
+        value = self._local.get(key)
+        if value is None:
+            value = await self._redis_get(key)
+            if value is not None:
+                self._local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self._local.set(key, value)
+        await self._redis_set(key, value)
+
+    async def invalidate(self, key: str) -> None:
+        """Drop *key* from both tiers."""
+        self._local.pop(key)
+        await self._redis_delete(key)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for *key*, calling *loader* at most once concurrently.
+
+        The load runs as its own task that every caller awaits under
+        :func:`asyncio.shield`, so a cancelled caller (e.g. a disconnected
+        client) never cancels the load the other callers are waiting for.
+        """
+        value = self._local.get(key)
+        if value is not None:
+            self._counters["hits"] += 1
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None and pending.get_loop() is asyncio.get_running_loop():
+            self._counters["coalesced"] += 1
+            return await asyncio.shield(pending)
+
+        task = asyncio.ensure_future(self._load(key, loader))
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._load_finished(key, done))
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await self._redis_get(key)
+        if value is not None:
+            self._counters["redisHits"] += 1
+            self._local.set(key, value)
+            return value
+        self._counters["misses"] += 1
+        try:
+            value = await loader()
+        except Exception:
+            self._counters["errors"] += 1
+            raise
+        await self.set(key, value)
+        return value
+
+    def _load_finished(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every caller had gone away
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/coalesce counters and current sizes."""
+        return {
+            **self._counters,
+            "size": len(self._local),
+            "maxSize": self._local.maxsize,
+            "inflight": len(self._inflight),
+            "ttlSeconds": self.ttl,
+        }
+
+
+preview_cache = TwoTierCache("preview", PREVIEW_CACHE_SIZE, PREVIEW_CACHE_TTL)
+info_cache = TwoTierCache("info", INFO_CACHE_SIZE, INFO_CACHE_TTL)
@@ -0,0 +1,198 @@
+"""Download tuning profiles for yt-dlp (fragment concurrency, chunked ranges, retries).
+
+A :class:`TuningProfile` bundles the yt-dlp options that decide how fast a
+single download runs. It turns into ``YoutubeDL`` params for the library path
+(:meth:`TuningProfile.ydl_opts`) and into CLI flags for the subprocess
+fallback and the Celery worker (:meth:`TuningProfile.cli_args`).
+
+Built-in profiles:
+
+* ``default`` – 4 fragments in parallel, no chunked ranges,
+* ``chunked`` – like ``default`` plus 10 MiB HTTP range requests, which keeps
+  throttled single-file streams (YouTube) near link speed,
+* ``fragmented`` – 8 fragments in parallel and more fragment retries, for
+  HLS/DASH-heavy sites,
+* ``conservative`` – one fragment at a time and few retries, for hosts that
+  rate-limit parallel requests,
+* ``aria2c`` – hands the transfer to the external ``aria2c`` downloader with
+  several connections per file (ignored when ``aria2c`` is not installed).
+
+:func:`profile_for` picks one per download: ``DOWNLOAD_PROFILE`` when set,
+else the entry for the extractor in ``DOWNLOAD_EXTRACTOR_PROFILES`` /
+``_EXTRACTOR_DEFAULTS``, else ``fragmented`` when the info dict only offers
+HLS/DASH formats, else ``default``. The ``DOWNLOAD_*`` overrides below then
+apply on top of whichever profile was chosen.
+
+Note that ``aria2c`` (like any subprocess) resolves hostnames itself, so it is
+not covered by the in-process DNS pinning of :mod:`utils.validators`.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import os
+import shlex
+import shutil
+from dataclasses import dataclass
+from typing import Any, Dict, Final, List
+
+_MIB: Final = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class TuningProfile:
+    """yt-dlp transfer settings; ``None`` leaves yt-dlp's own default."""
+
+    name: str
+    concurrent_fragments: int = 1
+    http_chunk_size: int | None = None  # bytes per range request of single-file downloads
+    retries: int = 10
+    fragment_retries: int = 10
+    buffer_size: int | None = None  # initial download buffer in bytes
+    external_downloader: str | None = None
+    external_downloader_args: str = ""
+
+    def ydl_opts(self) -> Dict[str, Any]:
+        """Return the options to merge into ``YoutubeDL`` params."""
+        opts: Dict[str, Any] = {
+            "concurrent_fragment_downloads": self.concurrent_fragments,
+            "retries": self.retries,
+            "fragment_retries": self.fragment_retries,
+        }
+        if self.http_chunk_size:
+            opts["http_chunk_size"] = self.http_chunk_size
+        if self.buffer_size:
+            opts["buffersize"] = self.buffer_size
+        if self.external_downloader:
+            opts["external_downloader"] = {"default": self.external_downloader}
+            if self.external_downloader_args:
+                opts["external_downloader_args"] = {
+                    self.external_downloader: shlex.split(self.external_downloader_args)
+                }
+        return opts
+
+    def cli_args(self) -> List[str]:
+        """Return the equivalent yt-dlp command-line flags (one token each)."""
+        args = [
+            f"--concurrent-fragments={self.concurrent_fragments}",
+            f"--retries={self.retries}",
+            f"--fragment-retries={self.fragment_retries}",
+        ]
+        if self.http_chunk_size:
+            args.append(f"--http-chunk-size={self.http_chunk_size}")
+        if self.buffer_size:
+            args.append(f"--buffer-size={self.buffer_size}")
+        if self.external_downloader:
+            args.append(f"--downloader={self.external_downloader}")
+            if self.external_downloader_args:
+                args.append(f"--downloader-args={self.external_downloader}:{self.external_downloader_args}")
+        return args
+
+
+PROFILES: Final[Dict[str, TuningProfile]] = {
+    profile.name: profile
+    for profile in (
+        TuningProfile("default", concurrent_fragments=4),
+        TuningProfile("chunked", concurrent_fragments=4, http_chunk_size=10 * _MIB),
+        TuningProfile("fragmented", concurrent_fragments=8, fragment_retries=20, buffer_size=_MIB),
+        TuningProfile("conservative", concurrent_fragments=1, retries=3, fragment_retries=3),
+        TuningProfile(
+            "aria2c",
+            concurrent_fragments=4,
+            external_downloader="aria2c",
+            external_downloader_args="-x 8 -s 8 -k 1M --summary-interval=0",
+        ),
+    )
+}
+
+# Extractor label (see metrics.extractor_of) prefix -> profile name
+_EXTRACTOR_DEFAULTS: Final[Dict[str, str]] = {
+    "youtube": "chunked",
+    "twitch": "fragmented",
+    "vimeo": "fragmented",
+    "dailymotion": "fragmented",
+}
+
+_FRAGMENTED_PROTOCOLS: Final = frozenset({"m3u8", "m3u8_native", "http_dash_segments", "dash"})
+
+
+def _env_int(name: str) -> int | None:
+    value = os.getenv(name, "").strip()
+    return int(value) if value else None
+
+
+def _parse_mapping(value: str) -> Dict[str, str]:
+    """Parse ``"youtube=chunked,generic=conservative"``."""
+    mapping = {}
+    for entry in value.split(","):
+        key, sep, name = entry.partition("=")
+        if sep and key.strip() and name.strip():
+            mapping[key.strip().lower()] = name.strip().lower()
+    return mapping
+
+
+# Force one profile for every download (empty = choose per extractor)
+DOWNLOAD_PROFILE: Final[str] = os.getenv("DOWNLOAD_PROFILE", "").strip().lower()
+# Extra/overriding extractor -> profile entries, e.g. "youtube=aria2c,generic=conservative"
+DOWNLOAD_EXTRACTOR_PROFILES: Final[Dict[str, str]] = {
+    **_EXTRACTOR_DEFAULTS,
+    **_parse_mapping(os.getenv("DOWNLOAD_EXTRACTOR_PROFILES", "")),
+}
+# Overrides applied on top of the chosen profile (empty = keep the profile's value)
+DOWNLOAD_CONCURRENT_FRAGMENTS: Final[int | None] = _env_int("DOWNLOAD_CONCURRENT_FRAGMENTS")
+DOWNLOAD_HTTP_CHUNK_SIZE: Final[int | None] = _env_int("DOWNLOAD_HTTP_CHUNK_SIZE")  # bytes, 0 = off
+DOWNLOAD_RETRIES: Final[int | None] = _env_int("DOWNLOAD_RETRIES")
+DOWNLOAD_FRAGMENT_RETRIES: Final[int | None] = _env_int("DOWNLOAD_FRAGMENT_RETRIES")
+DOWNLOAD_BUFFER_SIZE: Final[int | None] = _env_int("DOWNLOAD_BUFFER_SIZE")  # bytes
+# "aria2c" to use it for every profile, "native" to never use an external downloader
+DOWNLOAD_EXTERNAL_DOWNLOADER: Final[str] = os.getenv("DOWNLOAD_EXTERNAL_DOWNLOADER", "").strip().lower()
+
+_overrides: Dict[str, Any] = {
+    field: value
+    for field, value in (
+        ("concurrent_fragments", DOWNLOAD_CONCURRENT_FRAGMENTS),
+        ("http_chunk_size", DOWNLOAD_HTTP_CHUNK_SIZE),
+        ("retries", DOWNLOAD_RETRIES),
+        ("fragment_retries", DOWNLOAD_FRAGMENT_RETRIES),
+        ("buffer_size", DOWNLOAD_BUFFER_SIZE),
+    )
+    if value is not None
+}
+if DOWNLOAD_EXTERNAL_DOWNLOADER == "native":
+    _overrides["external_downloader"] = None
+elif DOWNLOAD_EXTERNAL_DOWNLOADER:
+    _overrides["external_downloader"] = DOWNLOAD_EXTERNAL_DOWNLOADER
+    _overrides["external_downloader_args"] = PROFILES.get(
+        DOWNLOAD_EXTERNAL_DOWNLOADER, TuningProfile(DOWNLOAD_EXTERNAL_DOWNLOADER)
+    ).external_downloader_args
+
+_resolved: Dict[str, TuningProfile] = {}
+
+
+def _resolve(name: str) -> TuningProfile:
+    """Return profile *name* with the env overrides applied (cached)."""
+    profile = _resolved.get(name)
+    if profile is None:
+        profile = dataclasses.replace(PROFILES.get(name, PROFILES["default"]), **_overrides)
+        if profile.external_downloader and shutil.which(profile.external_downloader) is None:
+            # Not installed here: keep the profile name (for metrics) but download natively
+            profile = dataclasses.replace(profile, external_downloader=None)
+        _resolved[name] = profile
+    return profile
+
+
+def _is_fragmented(info: Dict[str, Any]) -> bool:
+    formats = info.get("formats") or [info]
+    return all(fmt.get("protocol") in _FRAGMENTED_PROTOCOLS for fmt in formats)
+
+
+def profile_for(extractor: str, info: Dict[str, Any] | None = None) -> TuningProfile:
+    """Return the tuning profile for a download from *extractor* (label of :func:`metrics.extractor_of`)."""
+    if DOWNLOAD_PROFILE:
+        return _resolve(DOWNLOAD_PROFILE)
+    for prefix, name in DOWNLOAD_EXTRACTOR_PROFILES.items():
+        if extractor.startswith(prefix):
+            return _resolve(name)
+    if info and _is_fragmented(info):
+        return _resolve("fragmented")
+    return _resolve("default")
@@ -2,44 +2,80 @@
 
 from __future__ import annotations
 
-import asyncio
+import logging
 import os
 import uuid
-import threading
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List
 
-from . import ytdlp
+from .. import cleanup
+from . import events, metrics, result_cache, ytdlp
+from .cache import run_in_new_loop
+from .job_groups import GroupStore, JobGroup, new_group
+from .job_queue import DownloadScheduler, job_priority
+from .job_store import JobStore
+from .progress import ProgressEvent
+
+logger = logging.getLogger(__name__)
 
 # Use appropriate temp directory based on OS
 DOWNLOAD_DIR = Path(os.getenv("DOWNLOAD_DIR", os.path.join(os.path.expanduser("~"), "Downloads")))
 MAX_CONCURRENT_DOWNLOADS = int(os.getenv("MAX_CONCURRENT_DOWNLOADS", "2"))
-
-_semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
-_tasks: Dict[str, threading.Thread] = {}
-_status: Dict[str, Dict] = {}
-
-
-def _download_worker(download_id: str, url: str, format_id: str, filename: str | None):
-    """Worker that executes a single yt-dlp download."""
-    print(f"DEBUG: Starting download worker for {download_id}")  # Debug log
-
-    def progress_callback(percent: float):
-        """Update download progress."""
-        print(f"DEBUG: Progress callback called with {percent}%")  # Debug log
-        _status[download_id]["progress"] = percent
-        _status[download_id]["progressPercent"] = round(percent, 1)
-
-    print(f"DEBUG: Starting download for {download_id}")  # Debug log
-    _status[download_id] = {"status": "in_progress", "progress": 0, "progressPercent": 0.0}
+# "drain" lets queued jobs finish on shutdown, "persist" saves them for the next start
+DOWNLOAD_SHUTDOWN_MODE = os.getenv("DOWNLOAD_SHUTDOWN_MODE", "drain").lower()
+DOWNLOAD_DRAIN_TIMEOUT = float(os.getenv("DOWNLOAD_DRAIN_TIMEOUT", "30"))
+ENABLE_S3_UPLOAD = os.getenv("ENABLE_S3_UPLOAD", "0") == "1"
+# "memory" keeps jobs in this process; "sqlite" shares them between uvicorn workers
+JOB_STORE_BACKEND = os.getenv("JOB_STORE_BACKEND", "memory").lower()
+SHARED_JOB_STORE = JOB_STORE_BACKEND == "sqlite"
+
+if SHARED_JOB_STORE:
+    from .sqlite_jobs import Database, SqliteGroupStore, SqliteJobStore, SqliteResultRegistry, SqliteScheduler
+
+    _db = Database(Path(os.getenv("JOB_STORE_PATH", str(DOWNLOAD_DIR / ".clipx-jobs.sqlite3"))))
+    _jobs = SqliteJobStore(_db)
+    _results = SqliteResultRegistry(_db)
+    _groups = SqliteGroupStore(_db)
+else:
+    # Bounded: finished jobs are evicted after JOB_RETENTION_SECONDS / JOB_STORE_MAX_JOBS
+    _jobs = JobStore()
+    _results = result_cache.InflightRegistry()
+    _groups = GroupStore()
+
+
+def _download_worker(download_id: str, url: str, format_id: str, filename: str | None, key: str):
+    """Worker that executes a single yt-dlp download.
+
+    Unless a custom *filename* is given the artifact is stored under its
+    content address *key* so identical requests can reuse it.
+    """
+
+    def progress_callback(event: ProgressEvent):
+        """Update download progress (already coalesced by ``ytdlp``)."""
+        fields = {"detail": event.detail()}
+        if event.percent is not None:
+            fields["progress"] = event.percent
+        _jobs.update(download_id, **fields)
+        events.publish(download_id)
+
+    _jobs.set(download_id, "in_progress")
+    events.publish(download_id)
+    live_upload = _live_upload_for(format_id)
     try:
-        target = DOWNLOAD_DIR / (filename or f"{download_id}.%(ext)s")
-        print(f"DEBUG: Starting download for {download_id} to {target}")  # Debug log
+        target = DOWNLOAD_DIR / (filename or f"{key}.%(ext)s")
+        logger.debug("Starting download %s to %s", download_id, target)
         
         # Use the synchronous download_with_progress function
-        asyncio.run(ytdlp.download_with_progress(url, format_id, str(target), progress_callback))
+        run_in_new_loop(ytdlp.download_with_progress(
+            url,
+            format_id,
+            str(target),
+            progress_callback,
+            progress_hook=live_upload.hook if live_upload else None,
+            nopart=live_upload is not None,
+        ))
         
-        print(f"DEBUG: Download completed for {download_id}")  # Debug log
+        logger.debug("Download %s completed", download_id)
         
         # Find the actual file that was created (yt-dlp replaces %(ext)s with actual extension)
         actual_file = None
@@ -47,11 +83,9 @@ def _download_worker(download_id: str, url: str, format_id: str, filename: str |
             # If custom filename was provided, use it directly
             actual_file = DOWNLOAD_DIR / filename
         else:
-            # Find files that start with the download ID
-            matching_files = list(DOWNLOAD_DIR.glob(f"{download_id}.*"))
-            if matching_files:
-                actual_file = matching_files[0]  # Take the first match
-            else:
+            # Find the file named after the content address
+            actual_file = result_cache.find_local_artifact(DOWNLOAD_DIR, key)
+            if actual_file is None:
                 # Fallback: try to find any recently created file
                 import time
                 current_time = time.time()
@@ -62,53 +96,154 @@ def _download_worker(download_id: str, url: str, format_id: str, filename: str |
         
         if actual_file and actual_file.exists():
             final_file_path = str(actual_file)
-            print(f"DEBUG: Found actual file: {final_file_path}")  # Debug log
         else:
             final_file_path = str(target)  # Fallback to original path
-            print(f"DEBUG: Could not find actual file, using original path: {final_file_path}")  # Debug log
+            logger.debug("No file found for download %s, using %s", download_id, final_file_path)
         
-        _status[download_id] = {
-            "status": "finished",
-            "filePath": final_file_path,
-            "fileUrl": None,
-            "progress": 100.0,
-            "progressPercent": 100.0,
-        }
+        cleanup.register(final_file_path)
+        _jobs.set(download_id, "finished", progress=100.0, file_path=final_file_path)
 
         # Optional S3 upload
-        if os.getenv("ENABLE_S3_UPLOAD", "0") == "1":
-            from .storage import upload_to_s3  # local import to avoid heavy deps if disabled
+        if ENABLE_S3_UPLOAD:
+            from . import storage  # local import to avoid heavy deps if disabled
 
             try:
-                presigned_url = asyncio.run(upload_to_s3(target))
-                _status[download_id]["fileUrl"] = presigned_url
+                # Already on a worker thread, so upload synchronously
+                if live_upload is not None:
+                    presigned_url, stats = live_upload.finish(final_file_path)
+                else:
+                    presigned_url, stats = storage.upload_file_sync(final_file_path)
+                _jobs.update(download_id, file_url=presigned_url, upload=stats.to_dict())
+                metrics.observe_upload(stats.seconds, stats.bytes, stats.live)
             except Exception as s3_exc:  # pragma: no cover
-                _status[download_id]["s3Error"] = str(s3_exc)
+                _jobs.update(download_id, s3_error=str(s3_exc))
+        events.publish(download_id)
 
     except Exception as exc:  # noqa: BLE001
-        print(f"DEBUG: Download failed for {download_id}: {exc}")  # Debug log
-        _status[download_id] = {"status": "error", "message": str(exc), "progress": 0, "progressPercent": 0.0}
+        logger.warning("Download %s failed: %s", download_id, exc)
+        if live_upload is not None:
+            live_upload.abort()
+        _jobs.set(download_id, "error", message=str(exc))
+        _results.release(key, download_id)
+        events.publish(download_id)
+
+
+def _live_upload_for(format_id: str):
+    """Return a ``storage.LiveUpload`` if *format_id* can be uploaded while downloading.
+
+    Merged (``a+b``) and converted (mp3) downloads rewrite the file at the end,
+    so they are uploaded after the download instead.
+    """
+    if not ENABLE_S3_UPLOAD:
+        return None
+    from . import storage
+
+    selector = ytdlp.resolve_format(format_id)
+    if not storage.S3_UPLOAD_WHILE_DOWNLOADING or format_id.lower() == "mp3" or "+" in selector:
+        return None
+    return storage.LiveUpload()
+
+
+def _is_shareable(download_id: str) -> bool:
+    """Return True if another request may attach to *download_id*."""
+    record = _jobs.get(download_id)
+    if record is None:
+        return False
+    if record.status in {"queued", "in_progress"}:
+        return True
+    if record.status == "finished":
+        return bool(record.file_url) or bool(record.file_path and Path(record.file_path).exists())
+    return False
 
 
 async def queue_download(url: str, format_id: str, filename: str | None = None):
-    """Public API: queue a download and return its ID."""
+    """Public API: queue a download and return its ID.
 
+    Requests for a URL/format that is already downloading (or finished and
+    still on disk / in S3) return the existing download ID instead of
+    starting a duplicate job.
+    """
+
+    key = result_cache.result_key(url, format_id, filename=filename)
     download_id = str(uuid.uuid4())
-    _status[download_id] = {"status": "queued"}
-    
-    # Start the download in a background thread
-    thread = threading.Thread(
-        target=_download_worker,
-        args=(download_id, url, format_id, filename)
-    )
-    thread.daemon = True
-    thread.start()
-    _tasks[download_id] = thread
+    existing = _results.claim(key, download_id, _is_shareable)
+    if existing is not None:
+        return existing
+
+    if not filename:
+        artifact = result_cache.find_local_artifact(DOWNLOAD_DIR, key)
+        file_url = None if artifact else await result_cache.find_s3_artifact(key)
+        if artifact or file_url:
+            if artifact:
+                cleanup.touch(artifact)
+            _jobs.set(
+                download_id,
+                "finished",
+                progress=100.0,
+                file_path=str(artifact) if artifact else None,
+                file_url=file_url,
+            )
+            return download_id
+
+    _jobs.set(download_id, "queued")
+    try:
+        _scheduler.submit(download_id, job_priority(format_id), url, format_id, filename, key)
+    except RuntimeError:
+        _jobs.pop(download_id)
+        _results.release(key, download_id)
+        raise
     
     return download_id
 
 
+async def queue_group(
+    urls: List[str], format_id: str, source_url: str | None = None, title: str | None = None
+) -> JobGroup:
+    """Queue one download per URL and record them as a single job group."""
+    download_ids = [await queue_download(url, format_id) for url in urls]
+    group = new_group(download_ids, source_url, title)
+    _groups.add(group)
+    return group
+
+
+def get_group(group_id: str) -> JobGroup | None:
+    return _groups.get(group_id)
+
+
 def get_status(download_id: str) -> Dict:  # noqa: D401
     """Return current status dict for given download ID."""
 
-    return _status.get(download_id, {"status": "not_found"})
\ No newline at end of file
+    record = _jobs.get(download_id)
+    if record is None:
+        return {"status": "not_found"}
+    status_info = record.to_dict()
+    if record.status == "queued":
+        status_info["queuePosition"] = _scheduler.position(download_id)
+    return status_info
+
+
+def restore_pending() -> int:
+    """Re-queue downloads persisted by a previous shutdown; returns the count."""
+
+    def _prepare(job) -> None:
+        # Before the job is runnable, so this never resets a job a worker already claimed
+        _jobs.set(job.download_id, "queued")
+        _results.claim(job.args[-1], job.download_id, lambda _: False)
+
+    return len(_scheduler.restore(_prepare))
+
+
+def shutdown() -> None:
+    """Drain or persist the download queue (see ``DOWNLOAD_SHUTDOWN_MODE``)."""
+    _scheduler.shutdown(DOWNLOAD_SHUTDOWN_MODE, DOWNLOAD_DRAIN_TIMEOUT)
+
+
+if SHARED_JOB_STORE:
+    _scheduler = SqliteScheduler(_db, _download_worker, MAX_CONCURRENT_DOWNLOADS, on_change=metrics.set_queue)
+else:
+    _scheduler = DownloadScheduler(
+        _download_worker,
+        MAX_CONCURRENT_DOWNLOADS,
+        DOWNLOAD_DIR / ".clipx-pending-downloads.json",
+        on_change=metrics.set_queue,
+    )
\ No newline at end of file
@@ -0,0 +1,190 @@
+"""Push-based download progress notifications.
+
+Two sources feed the ``/download/events`` (SSE) and ``/download/ws``
+(WebSocket) endpoints:
+
+* the in-process downloader calls :func:`publish` from its worker threads,
+  which wakes every subscriber on its own event loop, and
+* Celery workers call :func:`publish_remote`, which sends the payload over the
+  Redis pub/sub channel ``clipx:progress:<id>``.
+
+Subscribers only keep the latest payload, and :func:`coalesce` caps delivery at
+``EVENTS_MAX_PER_SECOND`` so fast progress hooks never flood a client.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Final, Set
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+EVENTS_MAX_PER_SECOND: Final[float] = float(os.getenv("EVENTS_MAX_PER_SECOND", "4"))
+EVENTS_HEARTBEAT_SECONDS: Final[float] = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+TERMINAL_STATES: Final[Set[str]] = {"SUCCESS", "FAILURE", "REVOKED"}
+
+
+def _channel(download_id: str) -> str:
+    return f"clipx:progress:{download_id}"
+
+
+class Subscription:
+    """Latest-value mailbox for one client, safe to notify from any thread."""
+
+    def __init__(self) -> None:
+        self.latest: Dict[str, Any] | None = None
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+
+    def notify(self, payload: Dict[str, Any] | None = None) -> None:
+        """Record *payload* (if any) and wake the subscriber."""
+        def _set() -> None:
+            if payload is not None:
+                self.latest = payload
+            self._changed.set()
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            _set()
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(_set)
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait for a notification; return False on timeout."""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._changed.clear()
+        return True
+
+
+# ---------------------------------------------------------------------------
+# In-process broker
+# ---------------------------------------------------------------------------
+_subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def subscribe(download_id: str):
+    """Register a :class:`Subscription` for in-process updates of *download_id*."""
+    sub = Subscription()
+    with _lock:
+        _subscribers[download_id].add(sub)
+    try:
+        yield sub
+    finally:
+        with _lock:
+            subs = _subscribers.get(download_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del _subscribers[download_id]
+
+
+def publish(download_id: str, payload: Dict[str, Any] | None = None) -> None:
+    """Wake in-process subscribers of *download_id* (callable from any thread)."""
+    with _lock:
+        subs = list(_subscribers.get(download_id, ()))
+    for sub in subs:
+        sub.notify(payload)
+
+
+# ---------------------------------------------------------------------------
+# Redis pub/sub (Celery workers)
+# ---------------------------------------------------------------------------
+_sync_redis = None
+
+
+def publish_remote(download_id: str, payload: Dict[str, Any]) -> None:
+    """Publish *payload* for *download_id* on Redis; errors are only logged."""
+    global _sync_redis
+    try:
+        if _sync_redis is None:
+            import redis
+
+            _sync_redis = redis.from_url(REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+        _sync_redis.publish(_channel(download_id), json.dumps(payload, default=str))
+    except Exception as exc:  # noqa: BLE001
+        logger.debug("Progress publish failed for %s: %s", download_id, exc)
+
+
+@contextlib.asynccontextmanager
+async def subscribe_remote(download_id: str):
+    """Yield a :class:`Subscription` fed from the Redis channel of *download_id*."""
+    from redis import asyncio as aioredis
+
+    sub = Subscription()
+    client = aioredis.from_url(REDIS_URL)
+    pubsub = client.pubsub()
+    await pubsub.subscribe(_channel(download_id))
+
+    async def _reader() -> None:
+        async for message in pubsub.listen():
+            if message.get("type") != "message":
+                continue
+            try:
+                sub.notify(json.loads(message["data"]))
+            except ValueError:
+                continue
+
+    reader = asyncio.create_task(_reader())
+    try:
+        yield sub
+    finally:
+        reader.cancel()
+        with contextlib.suppress(Exception):
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+            await client.aclose()
+
+
+# ---------------------------------------------------------------------------
+# Coalesced delivery
+# ---------------------------------------------------------------------------
+async def coalesce(
+    sub: Subscription,
+    snapshot: Callable[[], Awaitable[Dict[str, Any]]],
+    max_per_second: float = EVENTS_MAX_PER_SECOND,
+    poll_interval: float | None = None,
+) -> AsyncIterator[Dict[str, Any] | None]:
+    """Yield changed snapshots at most *max_per_second* times per second.
+
+    ``None`` is yielded when nothing changed for ``EVENTS_HEARTBEAT_SECONDS``
+    so transports can send a keep-alive. Iteration stops after a payload whose
+    ``state`` is terminal. With *poll_interval* the snapshot is also re-read
+    that often without a notification, for jobs run by other processes.
+    """
+    min_interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+    last_payload: Dict[str, Any] | None = None
+    last_sent = 0.0
+    while True:
+        payload = await snapshot()
+        if payload != last_payload:
+            last_payload = payload
+            last_sent = time.monotonic()
+            yield payload
+            if payload.get("state") in TERMINAL_STATES:
+                return
+        if not await sub.wait(poll_interval or EVENTS_HEARTBEAT_SECONDS):
+            if time.monotonic() - last_sent >= EVENTS_HEARTBEAT_SECONDS:
+                last_sent = time.monotonic()
+                yield None
+            continue
+        # Let further updates pile up into the next snapshot
+        delay = last_sent + min_interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
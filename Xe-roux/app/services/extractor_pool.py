@@ -0,0 +1,153 @@
+"""Warm pool of yt-dlp extractor processes.
+
+Spawning the ``yt-dlp`` CLI costs a fresh Python interpreter plus the import of
+every extractor before any network I/O happens. This module keeps a
+``ProcessPoolExecutor`` whose workers import :mod:`yt_dlp` once, hold a
+long-lived ``YoutubeDL`` instance and run ``extract_info(download=False)`` on
+demand. Workers are recycled after ``EXTRACTOR_MAX_JOBS_PER_WORKER`` jobs so
+extractor caches cannot grow without bound.
+
+Enable it with ``YTDLP_ENGINE=pool`` (see :mod:`app.services.ytdlp`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Final
+
+from utils import validators
+
+logger = logging.getLogger(__name__)
+
+EXTRACTOR_POOL_SIZE: Final[int] = int(os.getenv("EXTRACTOR_POOL_SIZE", str(os.cpu_count() or 2)))
+EXTRACTOR_MAX_JOBS_PER_WORKER: Final[int] = int(os.getenv("EXTRACTOR_MAX_JOBS_PER_WORKER", "200"))
+
+_YDL_OPTS: Final[Dict[str, Any]] = {
+    "quiet": True,
+    "no_warnings": True,
+    "noprogress": True,
+    "skip_download": True,
+}
+
+# Per-worker-process YoutubeDL instance, created by ``_init_worker``
+_ydl = None
+# Second instance for flat playlist listings, created on first use
+_flat_ydl = None
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Code executed inside the worker processes
+# ---------------------------------------------------------------------------
+def _init_worker() -> None:
+    """Import yt-dlp and build the worker's YoutubeDL instance once."""
+    global _ydl
+    import yt_dlp  # type: ignore
+
+    # Workers only run yt-dlp, so every lookup may be checked
+    validators.install_dns_pinning(strict=True)
+    _ydl = yt_dlp.YoutubeDL(dict(_YDL_OPTS))
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _extract(url: str, pins: Dict[str, Any]) -> Dict[str, Any]:
+    validators.load_pins(pins)
+    try:
+        info = _ydl.extract_info(url, download=False)
+        return _ydl.sanitize_info(info)
+    except Exception as exc:  # noqa: BLE001
+        # yt-dlp exceptions carry tracebacks that do not pickle reliably
+        raise RuntimeError(str(exc)) from None
+
+
+def _extract_flat(url: str, playlist_items: str, pins: Dict[str, Any]) -> Dict[str, Any]:
+    global _flat_ydl
+    import yt_dlp  # type: ignore
+
+    validators.load_pins(pins)
+    if _flat_ydl is None:
+        _flat_ydl = yt_dlp.YoutubeDL({**_YDL_OPTS, "extract_flat": "in_playlist"})
+    # Workers run one job at a time, so the range can be set per call
+    _flat_ydl.params["playlist_items"] = playlist_items
+    try:
+        info = _flat_ydl.extract_info(url, download=False)
+        return _flat_ydl.sanitize_info(info)
+    except Exception as exc:  # noqa: BLE001
+        raise RuntimeError(str(exc)) from None
+
+
+# ---------------------------------------------------------------------------
+# Parent-process API
+# ---------------------------------------------------------------------------
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=EXTRACTOR_POOL_SIZE,
+                initializer=_init_worker,
+                max_tasks_per_child=EXTRACTOR_MAX_JOBS_PER_WORKER,
+            )
+        return _executor
+
+
+def _reset_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def extract_info(url: str) -> Dict[str, Any]:
+    """Run ``YoutubeDL.extract_info(url, download=False)`` in a warm worker.
+
+    Returns the sanitized (JSON-compatible) info dict. Raises ``RuntimeError``
+    on extraction failure, mirroring the CLI engine.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        # Hand over the addresses validate_url_async checked for this host
+        return await loop.run_in_executor(_get_executor(), _extract, url, validators.pins_for(url))
+    except BrokenProcessPool as exc:
+        logger.warning("Extractor pool broke, recreating: %s", exc)
+        _reset_executor()
+        raise RuntimeError("Extractor worker crashed") from exc
+
+
+async def extract_flat(url: str, playlist_items: str) -> Dict[str, Any]:
+    """Flat (unresolved) playlist extraction of the *playlist_items* range."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            _get_executor(), _extract_flat, url, playlist_items, validators.pins_for(url)
+        )
+    except BrokenProcessPool as exc:
+        logger.warning("Extractor pool broke, recreating: %s", exc)
+        _reset_executor()
+        raise RuntimeError("Extractor worker crashed") from exc
+
+
+async def warm_up() -> None:
+    """Start every worker so the first requests do not pay the import cost."""
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    await asyncio.gather(
+        *(loop.run_in_executor(executor, _ping) for _ in range(EXTRACTOR_POOL_SIZE)),
+        return_exceptions=True,
+    )
+
+
+def shutdown() -> None:
+    """Terminate the worker processes (called on application shutdown)."""
+    _reset_executor()
@@ -0,0 +1,122 @@
+"""Background dependency health probing for ``/healthz``.
+
+A single task (:func:`run_prober`, started with the app) pings Redis and S3
+every ``HEALTH_PROBE_INTERVAL`` seconds using long-lived pooled clients and
+stores the outcome. ``/healthz`` answers from that snapshot, so load-balancer
+polling never opens connections or waits on a dead dependency.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Final
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+S3_ENABLED: Final[bool] = os.getenv("ENABLE_S3_UPLOAD", "0") == "1"
+HEALTH_PROBE_INTERVAL: Final[float] = float(os.getenv("HEALTH_PROBE_INTERVAL", "5"))  # seconds
+HEALTH_PROBE_TIMEOUT: Final[float] = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))  # seconds
+
+
+@dataclass
+class ProbeResult:
+    """Outcome of the most recent probe of one dependency."""
+
+    ok: bool | None = None  # None = disabled / not probed yet
+    latency_ms: float | None = None
+    checked_at: float | None = None
+    last_success: float | None = None
+    error: str | None = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ok": self.ok,
+            "latencyMs": self.latency_ms,
+            "checkedAt": self.checked_at,
+            "lastSuccess": self.last_success,
+            "error": self.error,
+        }
+
+
+_results: Dict[str, ProbeResult] = {"redis": ProbeResult(), "s3": ProbeResult()}
+_redis_client = None
+
+
+async def _probe_redis() -> None:
+    global _redis_client
+    if _redis_client is None:
+        from redis import asyncio as aioredis
+
+        # One pooled client for the prober's lifetime
+        _redis_client = aioredis.from_url(
+            REDIS_URL,
+            socket_connect_timeout=HEALTH_PROBE_TIMEOUT,
+            socket_timeout=HEALTH_PROBE_TIMEOUT,
+        )
+    await _redis_client.ping()
+
+
+async def _probe_s3() -> None:
+    from . import storage  # shares the upload client's connection pool
+
+    # The client is built on first use, keep that off the event loop too
+    await asyncio.to_thread(lambda: storage._client().head_bucket(Bucket=storage._require_bucket()))
+
+
+async def _run_probe(name: str, probe: Callable[[], Awaitable[None]]) -> None:
+    result = _results[name]
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(probe(), HEALTH_PROBE_TIMEOUT)
+    except Exception as exc:  # noqa: BLE001
+        result.ok = False
+        result.error = str(exc) or type(exc).__name__
+    else:
+        result.ok = True
+        result.error = None
+        result.last_success = time.time()
+    result.latency_ms = round((time.perf_counter() - start) * 1000, 1)
+    result.checked_at = time.time()
+
+
+async def refresh() -> None:
+    """Probe all enabled dependencies concurrently."""
+    probes = [_run_probe("redis", _probe_redis)]
+    if S3_ENABLED:
+        probes.append(_run_probe("s3", _probe_s3))
+    await asyncio.gather(*probes)
+
+
+async def run_prober(interval: float = HEALTH_PROBE_INTERVAL) -> None:
+    """Refresh the health snapshot every *interval* seconds until cancelled."""
+    while True:
+        try:
+            await refresh()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Health probe failed: %s", exc)
+        await asyncio.sleep(interval)
+
+
+def has_snapshot() -> bool:
+    return _results["redis"].checked_at is not None
+
+
+def snapshot() -> Dict[str, Any]:
+    """Return the cached health payload served by ``/healthz``."""
+    redis_result, s3_result = _results["redis"], _results["s3"]
+    broker_ok = bool(redis_result.ok)
+    s3_ok = bool(s3_result.ok) if S3_ENABLED else None
+    checks = {"redis": redis_result.to_dict()}
+    if S3_ENABLED:
+        checks["s3"] = s3_result.to_dict()
+    return {
+        "status": "ok" if broker_ok and (s3_ok in (True, None)) else "degraded",
+        "redis": "reachable" if broker_ok else "unreachable",
+        "s3": "ok" if s3_ok else ("disabled" if s3_ok is None else "unreachable"),
+        "checks": checks,
+    }
@@ -0,0 +1,176 @@
+"""Job groups: one id over several download ids (e.g. a playlist download).
+
+The group only records its member download ids; their status stays in the
+job store (or in Celery), so a group never goes stale, and
+:func:`aggregate_progress` folds those statuses into one byte-weighted figure.
+Groups are kept for ``JOB_RETENTION_SECONDS`` like finished jobs, bounded by
+``JOB_GROUPS_MAX``.
+
+:class:`GroupStore` serves the in-process downloader; with
+``JOB_STORE_BACKEND=sqlite`` :class:`app.services.sqlite_jobs.SqliteGroupStore`
+is used instead, and Celery deployments keep groups in Redis through
+:func:`save_remote` / :func:`load_remote`.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Final, Iterable, List
+
+from .job_store import JOB_RETENTION_SECONDS
+
+JOB_GROUPS_MAX: Final[int] = int(os.getenv("JOB_GROUPS_MAX", "1000"))
+
+
+@dataclass(slots=True)
+class JobGroup:
+    """Download ids enqueued together."""
+
+    group_id: str
+    download_ids: List[str]
+    source_url: str | None = None
+    title: str | None = None
+    created_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "groupId": self.group_id,
+            "downloadIds": list(self.download_ids),
+            "sourceUrl": self.source_url,
+            "title": self.title,
+            "createdAt": self.created_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "JobGroup":
+        return cls(
+            data["groupId"],
+            list(data["downloadIds"]),
+            data.get("sourceUrl"),
+            data.get("title"),
+            data.get("createdAt") or time.time(),
+        )
+
+
+def new_group(download_ids: List[str], source_url: str | None = None, title: str | None = None) -> JobGroup:
+    return JobGroup(str(uuid.uuid4()), list(download_ids), source_url, title)
+
+
+class GroupStore:
+    """Thread-safe ``group_id -> JobGroup`` map with retention limits."""
+
+    def __init__(self, retention_seconds: float = JOB_RETENTION_SECONDS, max_groups: int = JOB_GROUPS_MAX) -> None:
+        self.retention_seconds = retention_seconds
+        self.max_groups = max_groups
+        # Insertion order == creation order, so the oldest groups come first
+        self._groups: "OrderedDict[str, JobGroup]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, group: JobGroup) -> None:
+        with self._lock:
+            self._groups[group.group_id] = group
+            self._prune()
+
+    def get(self, group_id: str) -> JobGroup | None:
+        with self._lock:
+            self._prune()
+            return self._groups.get(group_id)
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        while self._groups:
+            group = next(iter(self._groups.values()))
+            if group.created_at > cutoff and len(self._groups) <= self.max_groups:
+                break
+            self._groups.popitem(last=False)
+
+
+def _file_size(path: str | None) -> int | None:
+    try:
+        return os.path.getsize(path) if path else None
+    except OSError:
+        return None
+
+
+def aggregate_progress(members: Iterable[Dict[str, Any] | None]) -> Dict[str, Any]:
+    """Combine member status dicts (``None`` = not started) into group progress.
+
+    Progress is weighted by bytes: finished members count with their file
+    size, running ones with ``downloadedBytes``/``totalBytes``. Members whose
+    size is not known yet are assumed to be as large as the average known
+    member, so a long queue of unstarted items still holds the bar back.
+    Without any known size the plain mean of member percentages is used.
+    Failed members are left out of the figure.
+    """
+    counts = {"queued": 0, "in_progress": 0, "finished": 0, "error": 0}
+    done_bytes = 0
+    known_total = 0
+    known = 0
+    unknown_percents: List[float] = []
+    for info in members:
+        status = (info or {}).get("status") or "queued"
+        status = status if status in counts else "in_progress"
+        counts[status] += 1
+        if status == "error":
+            continue
+        if status == "finished":
+            size = _file_size(info.get("filePath")) or info.get("totalBytes")
+            percent = 100.0
+        else:
+            size = info.get("totalBytes") if info else None
+            percent = float((info or {}).get("progress") or 0.0)
+        if size:
+            known += 1
+            known_total += size
+            done_bytes += min(size, info.get("downloadedBytes") or 0) if status != "finished" else size
+        else:
+            unknown_percents.append(percent)
+
+    active = known + len(unknown_percents)
+    if known:
+        average = known_total / known
+        total = known_total + average * len(unknown_percents)
+        done = done_bytes + sum(average * p / 100 for p in unknown_percents)
+        progress = done / total * 100 if total else 0.0
+    else:
+        progress = sum(unknown_percents) / active if active else 0.0
+
+    if counts["queued"] + counts["in_progress"]:
+        status = "in_progress" if counts["in_progress"] or counts["finished"] or counts["error"] else "queued"
+    else:
+        status = "finished" if counts["finished"] else "error"
+    return {
+        "status": status,
+        "progress": progress,
+        "progressPercent": round(progress, 1),
+        "downloadedBytes": done_bytes,
+        "totalBytes": known_total if not unknown_percents else None,
+        "counts": counts,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Celery / Redis variant
+# ---------------------------------------------------------------------------
+def _redis_key(group_id: str) -> str:
+    return f"clipx:group:{group_id}"
+
+
+def save_remote(redis_client, group: JobGroup) -> None:
+    redis_client.set(_redis_key(group.group_id), json.dumps(group.to_dict()), ex=int(JOB_RETENTION_SECONDS))
+
+
+def load_remote(redis_client, group_id: str) -> JobGroup | None:
+    raw = redis_client.get(_redis_key(group_id))
+    if raw is None:
+        return None
+    return JobGroup.from_dict(json.loads(raw))
@@ -0,0 +1,190 @@
+"""Bounded worker pool with a priority queue for the in-process downloader.
+
+A fixed number of worker threads (``MAX_CONCURRENT_DOWNLOADS``) pull jobs from
+a priority queue so that a burst of requests cannot launch dozens of
+concurrent yt-dlp / ffmpeg processes. Audio-only and explicitly selected
+formats are served before full "best video" downloads.
+
+On shutdown the queue is either drained (running and queued jobs finish, up to
+a timeout) or persisted to disk and re-queued on the next startup.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_AUDIO_FORMATS = {"mp3", "m4a", "aac", "opus", "bestaudio", "ba", "worstaudio", "wa"}
+
+
+def job_priority(format_id: str) -> int:
+    """Return the queue priority for *format_id* (lower runs first).
+
+    Audio-only downloads are small and fast, explicit format ids usually pick a
+    single progressive stream, and "best"/"mp4" may need a merge step.
+    """
+    fmt = format_id.lower()
+    if fmt in _AUDIO_FORMATS or fmt.startswith("bestaudio"):
+        return 0
+    if fmt not in {"best", "mp4", "bestvideo+bestaudio", "bv+ba"}:
+        return 1
+    return 2
+
+
+@dataclass(order=True)
+class Job:
+    priority: int
+    seq: int
+    download_id: str = field(compare=False)
+    args: Tuple[Any, ...] = field(compare=False, default=())
+
+
+class DownloadScheduler:
+    """Fixed pool of worker threads fed from a priority queue."""
+
+    def __init__(
+        self,
+        worker_fn: Callable[..., None],
+        workers: int,
+        persist_path: Path,
+        on_change: Callable[[int, int], None] | None = None,
+    ) -> None:
+        self._worker_fn = worker_fn
+        self._on_change = on_change
+        self._size = max(1, workers)
+        self._persist_path = persist_path
+        self._heap: List[Job] = []
+        self._running: Dict[str, Job] = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._accepting = True
+        self._stopping = False
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+    def _ensure_started(self) -> None:
+        if self._threads:
+            return
+        for index in range(self._size):
+            thread = threading.Thread(target=self._run, name=f"download-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap and not self._stopping:
+                    self._cond.wait()
+                if self._stopping and not self._heap:
+                    return
+                job = heapq.heappop(self._heap)
+                self._running[job.download_id] = job
+                self._changed()
+            try:
+                self._worker_fn(job.download_id, *job.args)
+            except Exception:  # noqa: BLE001
+                logger.exception("Download worker crashed for %s", job.download_id)
+            finally:
+                with self._cond:
+                    self._running.pop(job.download_id, None)
+                    self._changed()
+                    self._cond.notify_all()
+
+    def _changed(self) -> None:
+        """Report queue depth and active jobs (called with the lock held)."""
+        if self._on_change is not None:
+            self._on_change(len(self._heap), len(self._running))
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def submit(self, download_id: str, priority: int, *args: Any) -> None:
+        """Queue a job; raises ``RuntimeError`` once shutdown has begun."""
+        with self._cond:
+            if not self._accepting:
+                raise RuntimeError("Downloader is shutting down")
+            self._ensure_started()
+            heapq.heappush(self._heap, Job(priority, next(self._seq), download_id, args))
+            self._changed()
+            self._cond.notify()
+
+    def position(self, download_id: str) -> int | None:
+        """Return the 1-based queue position of a waiting job, else ``None``."""
+        with self._cond:
+            job = next((j for j in self._heap if j.download_id == download_id), None)
+            if job is None:
+                return None
+            return 1 + sum(1 for other in self._heap if other < job)
+
+    def depth(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return len(self._heap)
+
+    def active(self) -> int:
+        """Number of jobs currently running."""
+        return len(self._running)
+
+    def shutdown(self, mode: str = "drain", timeout: float = 30.0) -> None:
+        """Stop accepting jobs and either drain or persist the queue.
+
+        ``drain`` lets queued and running jobs finish (bounded by *timeout*);
+        ``persist`` writes queued and running jobs to ``persist_path`` so
+        :meth:`restore` can re-queue them on the next start.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._accepting = False
+            if mode == "persist":
+                pending = sorted(self._heap) + list(self._running.values())
+                self._heap.clear()
+                self._changed()
+                self._write_pending(pending)
+            self._stopping = True
+            self._cond.notify_all()
+        if mode == "persist":
+            return
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def restore(self, prepare: Callable[[Job], None] | None = None) -> List[Job]:
+        """Re-queue jobs persisted by a previous ``shutdown(mode="persist")``.
+
+        *prepare* is called for each job before it is submitted, so records it
+        writes cannot overwrite progress made by a worker that already picked
+        the job up.
+        """
+        try:
+            entries = json.loads(self._persist_path.read_text())
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable persisted queue %s: %s", self._persist_path, exc)
+            return []
+        self._persist_path.unlink(missing_ok=True)
+        jobs = [Job(e["priority"], 0, e["downloadId"], tuple(e["args"])) for e in entries]
+        for job in jobs:
+            if prepare is not None:
+                prepare(job)
+            self.submit(job.download_id, job.priority, *job.args)
+        return jobs
+
+    def _write_pending(self, jobs: List[Job]) -> None:
+        if not jobs:
+            return
+        payload = [{"downloadId": j.download_id, "priority": j.priority, "args": list(j.args)} for j in jobs]
+        try:
+            self._persist_path.write_text(json.dumps(payload))
+            logger.info("Persisted %d pending downloads to %s", len(jobs), self._persist_path)
+        except OSError as exc:
+            logger.error("Could not persist pending downloads: %s", exc)
@@ -0,0 +1,120 @@
+"""Bounded status store for in-process download jobs.
+
+Each job is a slotted :class:`JobRecord` instead of a free-form dict, and
+finished or failed jobs are evicted once they are older than
+``JOB_RETENTION_SECONDS`` or when more than ``JOB_STORE_MAX_JOBS`` records
+are held. Queued and running jobs are never evicted.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Final
+
+JOB_RETENTION_SECONDS: Final[float] = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+JOB_STORE_MAX_JOBS: Final[int] = int(os.getenv("JOB_STORE_MAX_JOBS", "10000"))
+
+TERMINAL_STATUSES: Final = frozenset({"finished", "error"})
+
+
+@dataclass(slots=True)
+class JobRecord:
+    """Compact status of one download job."""
+
+    status: str
+    progress: float = 0.0
+    file_path: str | None = None
+    file_url: str | None = None
+    message: str | None = None
+    s3_error: str | None = None
+    upload: Dict[str, Any] | None = None
+    finished_at: float | None = None
+    # Speed / ETA / bytes / fragment / phase of a running job (see ProgressEvent.detail)
+    detail: Dict[str, Any] | None = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the JSON status shape served by ``/download/status``."""
+        if self.status == "queued":
+            return {"status": "queued"}
+        if self.status == "error":
+            return {"status": "error", "message": self.message, "progress": 0, "progressPercent": 0.0}
+        payload: Dict[str, Any] = {
+            "status": self.status,
+            "progress": self.progress,
+            "progressPercent": round(self.progress, 1),
+        }
+        if self.detail is not None:
+            payload.update(self.detail)
+        if self.status == "finished":
+            payload["filePath"] = self.file_path
+            payload["fileUrl"] = self.file_url
+            if self.upload is not None:
+                payload["upload"] = self.upload
+            if self.s3_error is not None:
+                payload["s3Error"] = self.s3_error
+        return payload
+
+
+class JobStore:
+    """Thread-safe ``download_id -> JobRecord`` map with retention limits."""
+
+    def __init__(
+        self,
+        retention_seconds: float = JOB_RETENTION_SECONDS,
+        max_jobs: int = JOB_STORE_MAX_JOBS,
+    ) -> None:
+        self.retention_seconds = retention_seconds
+        self.max_jobs = max_jobs
+        self._records: Dict[str, JobRecord] = {}
+        # Ids of terminal jobs in completion order
+        self._finished: Deque[str] = deque()
+        self._lock = threading.Lock()
+
+    def set(self, download_id: str, status: str, **fields: Any) -> JobRecord:
+        """Replace the record of *download_id* with a new one."""
+        record = JobRecord(status, **fields)
+        with self._lock:
+            if status in TERMINAL_STATUSES:
+                record.finished_at = time.monotonic()
+                self._finished.append(download_id)
+            self._records[download_id] = record
+            self._prune()
+        return record
+
+    def update(self, download_id: str, **fields: Any) -> None:
+        """Change fields of an existing record (no-op if it was evicted)."""
+        with self._lock:
+            record = self._records.get(download_id)
+            if record is None:
+                return
+            for name, value in fields.items():
+                setattr(record, name, value)
+
+    def get(self, download_id: str) -> JobRecord | None:
+        with self._lock:
+            self._prune()
+            return self._records.get(download_id)
+
+    def pop(self, download_id: str) -> None:
+        with self._lock:
+            self._records.pop(download_id, None)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _prune(self) -> None:
+        """Drop expired terminal jobs, then the oldest ones beyond ``max_jobs``."""
+        cutoff = time.monotonic() - self.retention_seconds
+        while self._finished:
+            download_id = self._finished[0]
+            record = self._records.get(download_id)
+            # Entries of jobs that were removed or re-queued are just dropped
+            if record is not None and record.finished_at is not None:
+                if record.finished_at > cutoff and len(self._records) <= self.max_jobs:
+                    break
+                del self._records[download_id]
+            self._finished.popleft()
@@ -0,0 +1,208 @@
+"""Prometheus instrumentation for the download pipeline.
+
+All metrics live here so modules only call small helpers (``observe_*`` /
+``set_*``) that turn into no-ops when ``prometheus_client`` is not installed.
+
+Multi-process deployments (several uvicorn workers, Celery workers) must set
+``PROMETHEUS_MULTIPROC_DIR`` to a shared, empty directory before the
+processes start; ``/metrics`` then aggregates the values of every process.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Dict, Final
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Import prometheus_client with fallback
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+    from prometheus_client import multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; charset=utf-8"
+
+MULTIPROC_DIR: Final[str | None] = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+_LATENCY_BUCKETS: Final = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+_JOB_BUCKETS: Final = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+# Bytes per second: 128 KiB/s .. 1 GiB/s
+_THROUGHPUT_BUCKETS: Final = tuple(float(128 * 1024 * 2**i) for i in range(14))
+
+
+class _NoOpMetric:
+    """Stand-in used when ``prometheus_client`` is missing."""
+
+    def labels(self, *args: Any, **kwargs: Any) -> "_NoOpMetric":
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+
+if PROMETHEUS_AVAILABLE:
+    HTTP_REQUEST_DURATION = Histogram(
+        "clipx_http_request_duration_seconds",
+        "HTTP request latency by router",
+        ["router", "method", "status"],
+        buckets=_LATENCY_BUCKETS,
+    )
+    EXTRACTION_DURATION = Histogram(
+        "clipx_extraction_duration_seconds",
+        "yt-dlp metadata extraction time",
+        ["extractor", "engine", "outcome"],
+        buckets=_LATENCY_BUCKETS,
+    )
+    DOWNLOAD_DURATION = Histogram(
+        "clipx_download_duration_seconds",
+        "yt-dlp download time",
+        ["extractor", "outcome"],
+        buckets=_JOB_BUCKETS,
+    )
+    DOWNLOADED_BYTES = Counter("clipx_downloaded_bytes", "Bytes downloaded by yt-dlp", ["extractor"])
+    DOWNLOAD_THROUGHPUT = Histogram(
+        "clipx_download_throughput_bytes_per_second",
+        "Effective throughput of successful downloads by tuning profile",
+        ["profile", "extractor"],
+        buckets=_THROUGHPUT_BUCKETS,
+    )
+    UPLOADED_BYTES = Counter("clipx_uploaded_bytes", "Bytes uploaded to S3")
+    S3_UPLOAD_DURATION = Histogram(
+        "clipx_s3_upload_duration_seconds",
+        "Time to upload one artifact to S3",
+        ["mode"],
+        buckets=_JOB_BUCKETS,
+    )
+    QUEUE_DEPTH = Gauge(
+        "clipx_download_queue_depth", "In-process downloads waiting for a worker", multiprocess_mode="livesum"
+    )
+    ACTIVE_WORKERS = Gauge(
+        "clipx_download_active_workers", "In-process downloads currently running", multiprocess_mode="livesum"
+    )
+    CLEANUP_RECLAIMED_BYTES = Counter("clipx_cleanup_reclaimed_bytes", "Bytes freed by temp-file cleanup")
+    CLEANUP_REMOVED_FILES = Counter("clipx_cleanup_removed_files", "Files removed by temp-file cleanup")
+    RATE_LIMITED = Counter("clipx_rate_limited_requests", "Requests rejected with 429", ["bucket"])
+else:
+    HTTP_REQUEST_DURATION = EXTRACTION_DURATION = DOWNLOAD_DURATION = _NoOpMetric()
+    DOWNLOAD_THROUGHPUT = _NoOpMetric()
+    DOWNLOADED_BYTES = UPLOADED_BYTES = S3_UPLOAD_DURATION = _NoOpMetric()
+    QUEUE_DEPTH = ACTIVE_WORKERS = CLEANUP_RECLAIMED_BYTES = CLEANUP_REMOVED_FILES = _NoOpMetric()
+    RATE_LIMITED = _NoOpMetric()
+
+
+# ---------------------------------------------------------------------------
+# Helpers used by the services
+# ---------------------------------------------------------------------------
+def extractor_of(info: Dict[str, Any] | None) -> str:
+    """Return a low-cardinality extractor label for an info dict."""
+    if not info:
+        return "unknown"
+    return str(info.get("extractor_key") or info.get("extractor") or "unknown").split(":")[0].lower()
+
+
+def observe_extraction(extractor: str, engine: str, seconds: float, ok: bool = True) -> None:
+    EXTRACTION_DURATION.labels(extractor, engine, "ok" if ok else "error").observe(seconds)
+
+
+def observe_download(
+    extractor: str, seconds: float, downloaded_bytes: int, ok: bool = True, profile: str = "default"
+) -> None:
+    DOWNLOAD_DURATION.labels(extractor, "ok" if ok else "error").observe(seconds)
+    if downloaded_bytes:
+        DOWNLOADED_BYTES.labels(extractor).inc(downloaded_bytes)
+        if ok and seconds > 0:
+            DOWNLOAD_THROUGHPUT.labels(profile, extractor).observe(downloaded_bytes / seconds)
+
+
+def observe_upload(seconds: float, uploaded_bytes: int, live: bool = False) -> None:
+    S3_UPLOAD_DURATION.labels("live" if live else "after_download").observe(seconds)
+    UPLOADED_BYTES.inc(uploaded_bytes)
+
+
+def set_queue(depth: int, active: int) -> None:
+    QUEUE_DEPTH.set(depth)
+    ACTIVE_WORKERS.set(active)
+
+
+def observe_cleanup(files: int, reclaimed_bytes: int) -> None:
+    CLEANUP_REMOVED_FILES.inc(files)
+    CLEANUP_RECLAIMED_BYTES.inc(reclaimed_bytes)
+
+
+def observe_rate_limited(bucket: str) -> None:
+    RATE_LIMITED.labels(bucket).inc()
+
+
+# ---------------------------------------------------------------------------
+# Request latency
+# ---------------------------------------------------------------------------
+_ROUTER_PREFIXES: Final = (
+    ("/download/status", "status"),
+    ("/download/file", "file"),
+    ("/download/events", "events"),
+    ("/download/stream", "stream"),
+    ("/download", "download"),
+    ("/preview", "preview"),
+    ("/healthz", "health"),
+    ("/metrics", "metrics"),
+)
+
+
+def router_label(path: str) -> str:
+    for prefix, label in _ROUTER_PREFIXES:
+        if path.startswith(prefix):
+            return label
+    return "other"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per router.
+
+    Pure ASGI (not ``BaseHTTPMiddleware``) so streamed and zero-copy
+    responses pass through untouched; time is measured until the last body
+    message was sent.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not PROMETHEUS_AVAILABLE:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def _send(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            HTTP_REQUEST_DURATION.labels(
+                router_label(scope["path"]), scope["method"], str(status_code)
+            ).observe(time.perf_counter() - start)
+
+
+def render() -> bytes:
+    """Return the text exposition of all metrics (all processes in multiprocess mode)."""
+    if not PROMETHEUS_AVAILABLE:
+        return b"# prometheus_client is not installed\n"
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
@@ -0,0 +1,129 @@
+"""Lazy, cursor-paginated listing of playlist and channel entries.
+
+Playlists are read with yt-dlp's flat extraction one page at a time
+(``--flat-playlist --playlist-items START:END``), so a listing never resolves
+per-entry format lists and only fetches the remote pages it returns. Each
+entry carries just ``id``, ``title``, ``duration``, ``thumbnail`` and the
+``url`` to download it with (``null`` for media embedded in the playlist page
+itself, which cannot be fetched on its own). Format resolution happens later,
+per entry, when (and if) the entry is actually downloaded.
+
+Cursors are opaque strings handed back as ``nextCursor``; pass one to get the
+following page. A URL that is not a playlist lists as a single entry.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import os
+from typing import Any, AsyncIterator, Dict, Final, List
+
+from . import ytdlp
+from .cache import TwoTierCache, normalize_url
+
+PLAYLIST_PAGE_SIZE: Final[int] = int(os.getenv("PLAYLIST_PAGE_SIZE", "50"))
+PLAYLIST_MAX_PAGE_SIZE: Final[int] = int(os.getenv("PLAYLIST_MAX_PAGE_SIZE", "200"))
+# Upper bound on entries listed by a stream
+PLAYLIST_MAX_ENTRIES: Final[int] = int(os.getenv("PLAYLIST_MAX_ENTRIES", "1000"))
+# Upper bound on entries enqueued by one playlist download (each is charged to the "download" bucket)
+PLAYLIST_DOWNLOAD_MAX_ENTRIES: Final[int] = int(os.getenv("PLAYLIST_DOWNLOAD_MAX_ENTRIES", "25"))
+PLAYLIST_CACHE_SIZE: Final[int] = int(os.getenv("PLAYLIST_CACHE_SIZE", "256"))
+PLAYLIST_CACHE_TTL: Final[int] = int(os.getenv("PLAYLIST_CACHE_TTL", "300"))  # seconds
+
+page_cache = TwoTierCache("playlist", PLAYLIST_CACHE_SIZE, PLAYLIST_CACHE_TTL)
+
+
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(f"o{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> int:
+    """Return the 0-based offset of *cursor*; raises ``ValueError`` if malformed."""
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError("Invalid cursor") from None
+    if not raw.startswith("o") or not raw[1:].isdigit():
+        raise ValueError("Invalid cursor")
+    return int(raw[1:])
+
+
+def _thumbnail(raw: Dict[str, Any]) -> str | None:
+    if raw.get("thumbnail"):
+        return raw["thumbnail"]
+    thumbnails = raw.get("thumbnails") or []
+    return thumbnails[-1].get("url") if thumbnails else None
+
+
+def _entry_url(raw: Dict[str, Any], playlist_url: str | None) -> str | None:
+    """Return the URL that downloads just this entry, if it has one."""
+    if raw.get("_type") in {"url", "url_transparent"} and "://" in (raw.get("url") or ""):
+        # Drop yt-dlp's internal "#__youtubedl_smuggle=" hints
+        return raw["url"].split("#__youtubedl_smuggle=")[0]
+    # Entries embedded in the playlist page itself have no URL of their own
+    url = raw.get("webpage_url")
+    return url if url and url != playlist_url else None
+
+
+def _entry(raw: Dict[str, Any], index: int, playlist_url: str | None) -> Dict[str, Any]:
+    """Map a flat yt-dlp entry to the public listing shape."""
+    return {
+        "index": index,
+        "id": raw.get("id"),
+        "title": raw.get("title"),
+        "duration": raw.get("duration"),
+        "thumbnail": _thumbnail(raw),
+        "url": _entry_url(raw, playlist_url),
+    }
+
+
+async def _load_page(url: str, offset: int, limit: int) -> Dict[str, Any]:
+    # One extra entry tells whether another page exists without counting the playlist
+    info = await ytdlp.extract_flat(url, offset + 1, offset + limit + 1)
+    if info.get("_type") not in {"playlist", "multi_video"}:
+        raws: List[Dict[str, Any]] = [info] if offset == 0 else []
+        playlist_url = None
+    else:
+        raws = [raw for raw in info.get("entries") or [] if raw]
+        playlist_url = info.get("webpage_url")
+    entries = [_entry(raw, offset + i, playlist_url) for i, raw in enumerate(raws[:limit])]
+    return {
+        "id": info.get("id"),
+        "title": info.get("title"),
+        "uploader": info.get("uploader") or info.get("channel"),
+        "extractor": info.get("extractor_key") or info.get("extractor"),
+        "entryCount": info.get("playlist_count"),
+        "entries": entries,
+        "nextCursor": encode_cursor(offset + limit) if len(raws) > limit else None,
+    }
+
+
+async def fetch_page(url: str, cursor: str | None = None, limit: int | None = None) -> Dict[str, Any]:
+    """Return one page of entries of the playlist at *url*.
+
+    Raises ``ValueError`` for a malformed cursor.
+    """
+    offset = decode_cursor(cursor)
+    limit = max(1, min(limit or PLAYLIST_PAGE_SIZE, PLAYLIST_MAX_PAGE_SIZE))
+    key = f"{normalize_url(url)}#{offset}:{limit}"
+    page = await page_cache.get_or_load(key, lambda: _load_page(url, offset, limit))
+    return {**page, "url": url}
+
+
+async def iter_entries(url: str, max_entries: int = PLAYLIST_MAX_ENTRIES) -> AsyncIterator[Dict[str, Any]]:
+    """Yield the entries of *url* page by page, stopping after *max_entries*."""
+    cursor = None
+    emitted = 0
+    while True:
+        page = await fetch_page(url, cursor, PLAYLIST_MAX_PAGE_SIZE)
+        for entry in page["entries"]:
+            if emitted >= max_entries:
+                return
+            yield entry
+            emitted += 1
+        cursor = page["nextCursor"]
+        if cursor is None:
+            return
@@ -0,0 +1,191 @@
+"""Helpers for turning yt-dlp progress into throttled status updates.
+
+yt-dlp progress reaches us in two shapes: hook dicts (library path) and, on
+the CLI path, one JSON line per tick emitted through ``--progress-template``
+(see :data:`PROGRESS_TEMPLATE_ARGS`). Both are parsed into the same
+:class:`ProgressEvent`, and :class:`ProgressCoalescer` limits how often the
+consumer callback runs.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Final, List
+
+# Minimum time and percent change between two published progress updates
+PROGRESS_MIN_INTERVAL: Final[float] = float(os.getenv("PROGRESS_MIN_INTERVAL", "1.0"))  # seconds
+PROGRESS_MIN_DELTA: Final[float] = float(os.getenv("PROGRESS_MIN_DELTA", "1.0"))  # percent
+# Publish at least this often so speed/ETA stay fresh while percent stalls
+PROGRESS_MAX_INTERVAL: Final[float] = float(os.getenv("PROGRESS_MAX_INTERVAL", "10.0"))  # seconds
+# Upper bound on progress callbacks per download
+PROGRESS_CALLBACK_MAX_PER_SECOND: Final[float] = float(os.getenv("PROGRESS_CALLBACK_MAX_PER_SECOND", "4"))
+
+# Lines starting with this marker carry one JSON progress dict
+PROGRESS_MARKER: Final[str] = "[clipx-progress] "
+PROGRESS_TEMPLATE_ARGS: Final[List[str]] = [
+    "--newline",
+    "--progress",
+    "--progress-template",
+    f"download:{PROGRESS_MARKER}%(progress)j",
+    "--progress-template",
+    f"postprocess:{PROGRESS_MARKER}%(progress)j",
+]
+
+
+@dataclass(slots=True)
+class ProgressEvent:
+    """One progress update of a download.
+
+    ``phase`` is ``"downloading"``, ``"downloaded"`` (one file done; merged
+    formats download several) or ``"postprocessing"`` (merge / conversion,
+    with the post-processor name in ``postprocessor``).
+    """
+
+    phase: str
+    percent: float | None = None
+    downloaded_bytes: int | None = None
+    total_bytes: int | None = None
+    speed: float | None = None
+    eta: int | None = None
+    fragment_index: int | None = None
+    fragment_count: int | None = None
+    postprocessor: str | None = None
+
+    def detail(self) -> Dict[str, Any]:
+        """Return the camelCase status fields describing this event."""
+        return {
+            "phase": self.phase,
+            "downloadedBytes": self.downloaded_bytes,
+            "totalBytes": self.total_bytes,
+            "speed": self.speed,
+            "eta": self.eta,
+            "fragmentIndex": self.fragment_index,
+            "fragmentCount": self.fragment_count,
+            "postprocessor": self.postprocessor,
+        }
+
+    def to_meta(self) -> Dict[str, Any]:
+        """Return the status meta published for Celery tasks."""
+        percent = self.percent or 0.0
+        return {"status": "in_progress", "progress": percent, "progressPercent": round(percent, 1), **self.detail()}
+
+
+def parse_progress(d: Dict[str, Any]) -> ProgressEvent | None:
+    """Convert a yt-dlp progress or post-processor hook dict into an event."""
+    status = d.get("status")
+    if "postprocessor" in d:
+        if status not in {"started", "processing"}:
+            return None
+        return ProgressEvent("postprocessing", 100.0, postprocessor=d.get("postprocessor"))
+    if status not in {"downloading", "finished"}:
+        return None
+    total = d.get("total_bytes") or d.get("total_bytes_estimate")
+    downloaded = d.get("downloaded_bytes") or 0
+    if total:
+        percent = min(downloaded / total * 100, 100.0)
+    elif d.get("fragment_count"):
+        percent = (d.get("fragment_index") or 0) / d["fragment_count"] * 100
+    else:
+        percent = None
+    return ProgressEvent(
+        "downloading" if status == "downloading" else "downloaded",
+        100.0 if status == "finished" else percent,
+        downloaded,
+        total,
+        d.get("speed"),
+        d.get("eta"),
+        d.get("fragment_index"),
+        d.get("fragment_count"),
+    )
+
+
+def parse_progress_line(line: str) -> ProgressEvent | None:
+    """Parse one CLI output line produced with :data:`PROGRESS_TEMPLATE_ARGS`."""
+    if not line.startswith(PROGRESS_MARKER):
+        return None
+    try:
+        return parse_progress(json.loads(line[len(PROGRESS_MARKER):]))
+    except (ValueError, TypeError):
+        return None
+
+
+class ProgressCoalescer:
+    """Forward events to *callback* at most *max_per_second* times per second.
+
+    Phase changes are always delivered; in between only the latest event is
+    kept and :meth:`flush` delivers it once the download ends. Safe to push
+    from any thread.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[ProgressEvent], None],
+        max_per_second: float = PROGRESS_CALLBACK_MAX_PER_SECOND,
+    ) -> None:
+        self._callback = callback
+        self._min_interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+        self._last_sent = float("-inf")
+        self._last_phase: str | None = None
+        self._pending: ProgressEvent | None = None
+        self._lock = threading.Lock()
+
+    def push(self, event: ProgressEvent | None) -> None:
+        if event is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if event.phase == self._last_phase and now - self._last_sent < self._min_interval:
+                self._pending = event
+                return
+            self._pending = None
+            self._last_sent = now
+            self._last_phase = event.phase
+        self._deliver(event)
+
+    def flush(self) -> None:
+        with self._lock:
+            event, self._pending = self._pending, None
+        if event is not None:
+            self._deliver(event)
+
+    def _deliver(self, event: ProgressEvent) -> None:
+        try:
+            self._callback(event)
+        except Exception:  # noqa: BLE001 - progress must never abort the download
+            pass
+
+
+class ProgressThrottle:
+    """Decide whether a progress update is worth publishing.
+
+    An update passes when the download completed, when at least
+    ``min_interval`` seconds *and* ``min_delta`` percent passed since the last
+    published update, or when nothing was published for ``max_interval``.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = PROGRESS_MIN_INTERVAL,
+        min_delta: float = PROGRESS_MIN_DELTA,
+        max_interval: float = PROGRESS_MAX_INTERVAL,
+    ) -> None:
+        self.min_interval = min_interval
+        self.min_delta = min_delta
+        self.max_interval = max_interval
+        self._last_time: float | None = None
+        self._last_percent = 0.0
+
+    def should_emit(self, percent: float) -> bool:
+        now = time.monotonic()
+        if self._last_time is not None and percent < 100.0:
+            elapsed = now - self._last_time
+            moved = abs(percent - self._last_percent) >= self.min_delta
+            if elapsed < self.max_interval and not (elapsed >= self.min_interval and moved):
+                return False
+        self._last_time = now
+        self._last_percent = percent
+        return True
@@ -0,0 +1,275 @@
+"""Built-in rate limiting: local token buckets reconciled with Redis.
+
+Every decision is made in-process against a token bucket per
+``(bucket, client)``, so limited routes (including frequent status polls) cost
+no network round trip. A background task periodically pushes the units each
+bucket consumed to Redis, where a Lua script keeps a sliding-window count per
+client across all workers. The cluster-wide count it returns then lowers the
+local bucket, so a client cannot multiply its allowance by spreading requests
+over several processes for longer than one sync interval.
+
+When Redis is unreachable the limiter keeps enforcing the local buckets and
+retries Redis after ``_REDIS_RETRY_SECONDS``.
+
+Routes declare a cost against a named bucket::
+
+    @router.post("/", dependencies=[Depends(rate_limit.limit(5))])
+
+Buckets (allowance per period, per client):
+
+* ``api`` – ``RATE_LIMIT_REQUESTS`` units per ``RATE_LIMIT_PERIOD`` seconds,
+  shared by previews and status/file/event polls with per-route costs,
+* ``download`` – ``RATE_LIMIT_DOWNLOADS`` enqueues per
+  ``RATE_LIMIT_DOWNLOAD_PERIOD`` seconds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Final, List, Set, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_ENABLED: Final[bool] = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_REQUESTS: Final[int] = int(os.getenv("RATE_LIMIT_REQUESTS", "120"))
+RATE_LIMIT_PERIOD: Final[float] = float(os.getenv("RATE_LIMIT_PERIOD", "60"))  # seconds
+RATE_LIMIT_DOWNLOADS: Final[int] = int(os.getenv("RATE_LIMIT_DOWNLOADS", "3"))
+RATE_LIMIT_DOWNLOAD_PERIOD: Final[float] = float(os.getenv("RATE_LIMIT_DOWNLOAD_PERIOD", "1800"))  # seconds
+# Units charged per request in the "api" bucket
+RATE_LIMIT_COST_POLL: Final[int] = int(os.getenv("RATE_LIMIT_COST_POLL", "1"))  # status / events / file
+RATE_LIMIT_COST_PREVIEW: Final[int] = int(os.getenv("RATE_LIMIT_COST_PREVIEW", "5"))
+# Per URL of a batch preview, charged once the body is parsed
+RATE_LIMIT_COST_PREVIEW_BATCH_URL: Final[int] = int(
+    os.getenv("RATE_LIMIT_COST_PREVIEW_BATCH_URL", str(RATE_LIMIT_COST_PREVIEW))
+)
+# How often consumed units are pushed to (and cluster usage read from) Redis
+RATE_LIMIT_SYNC_INTERVAL: Final[float] = float(os.getenv("RATE_LIMIT_SYNC_INTERVAL", "1"))  # seconds
+RATE_LIMIT_REDIS_ENABLED: Final[bool] = os.getenv("RATE_LIMIT_REDIS_ENABLED", "1") == "1"
+# Key clients by X-Forwarded-For (only behind reverse proxies that append to it;
+# otherwise clients can pick their own id and bypass every limit)
+RATE_LIMIT_TRUST_FORWARDED: Final[bool] = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0") == "1"
+# Number of trusted proxies in front of the app; the client is the hop the outermost one saw
+RATE_LIMIT_TRUSTED_PROXIES: Final[int] = max(1, int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "1")))
+# Local buckets kept at most; idle full buckets are dropped first
+RATE_LIMIT_MAX_CLIENTS: Final[int] = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+_REDIS_RETRY_SECONDS: Final[int] = 30
+
+# Sliding-window counter: the current fixed window plus the previous one
+# weighted by how much of it still overlaps the sliding window.
+# KEYS[1] current window, KEYS[2] previous window
+# ARGV[1] units to add, ARGV[2] window length (ms), ARGV[3] ms elapsed in the current window
+_SLIDING_WINDOW_LUA: Final[str] = """
+local added = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local current = redis.call('INCRBY', KEYS[1], added)
+if current == added then
+    redis.call('PEXPIRE', KEYS[1], window * 2)
+end
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+return current + math.floor(previous * (window - tonumber(ARGV[3])) / window)
+"""
+
+
+@dataclass(frozen=True)
+class Bucket:
+    """Allowance of *capacity* units per *period* seconds."""
+
+    name: str
+    capacity: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+
+BUCKETS: Final[Dict[str, Bucket]] = {
+    "api": Bucket("api", RATE_LIMIT_REQUESTS, RATE_LIMIT_PERIOD),
+    "download": Bucket("download", RATE_LIMIT_DOWNLOADS, RATE_LIMIT_DOWNLOAD_PERIOD),
+}
+
+
+class _TokenState:
+    __slots__ = ("tokens", "updated", "pending")
+
+    def __init__(self, tokens: float, updated: float) -> None:
+        self.tokens = tokens
+        self.updated = updated
+        # Units consumed since the last Redis sync
+        self.pending = 0
+
+
+class RateLimiter:
+    """Token buckets per ``(bucket, client)`` with periodic Redis reconciliation."""
+
+    def __init__(self, max_clients: int = RATE_LIMIT_MAX_CLIENTS) -> None:
+        self.max_clients = max_clients
+        # Least recently used first
+        self._states: "OrderedDict[Tuple[str, str], _TokenState]" = OrderedDict()
+        # Keys with units not yet pushed to Redis
+        self._dirty: Set[Tuple[str, str]] = set()
+        self._redis = None
+        self._script = None
+        self._redis_down_until = 0.0
+
+    def _refill(self, bucket: Bucket, state: _TokenState, now: float) -> None:
+        state.tokens = min(bucket.capacity, state.tokens + (now - state.updated) * bucket.rate)
+        state.updated = now
+
+    def acquire(self, bucket: Bucket, client: str, cost: int) -> float:
+        """Consume *cost* units; return 0, or the seconds to wait when denied."""
+        now = time.monotonic()
+        key = (bucket.name, client)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _TokenState(float(bucket.capacity), now)
+            self._evict(now)
+        else:
+            self._states.move_to_end(key)
+            self._refill(bucket, state, now)
+        if state.tokens >= cost:
+            state.tokens -= cost
+            state.pending += cost
+            self._dirty.add(key)
+            return 0.0
+        return min((cost - state.tokens) / bucket.rate, bucket.period)
+
+    def _evict(self, now: float) -> None:
+        """Drop buckets idle long enough to be full again, then the least recent beyond ``max_clients``."""
+        while self._states:
+            key, state = next(iter(self._states.items()))
+            idle = now - state.updated >= BUCKETS[key[0]].period and key not in self._dirty
+            if not idle and len(self._states) <= self.max_clients:
+                break
+            self._states.popitem(last=False)
+            self._dirty.discard(key)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    # ------------------------------------------------------------------
+    # Redis reconciliation
+    # ------------------------------------------------------------------
+    def _get_redis(self):
+        if not RATE_LIMIT_REDIS_ENABLED or time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            try:
+                from redis import asyncio as aioredis
+
+                self._redis = aioredis.from_url(REDIS_URL, socket_connect_timeout=0.25, socket_timeout=0.25)
+                self._script = self._redis.register_script(_SLIDING_WINDOW_LUA)
+            except Exception:  # noqa: BLE001
+                return None
+        return self._redis
+
+    def _collect(self) -> List[Tuple[Tuple[str, str], _TokenState, int]]:
+        """Take the units consumed since the last sync."""
+        batch = []
+        for key in self._dirty:
+            state = self._states.get(key)
+            if state is not None:
+                batch.append((key, state, state.pending))
+                state.pending = 0
+        self._dirty.clear()
+        return batch
+
+    async def sync(self) -> None:
+        """Push consumed units to Redis and apply the cluster-wide usage."""
+        redis = self._get_redis()
+        if redis is None:
+            return
+        batch = self._collect()
+        if not batch:
+            return
+        wall = time.time()
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                for (name, client), _, units in batch:
+                    bucket = BUCKETS[name]
+                    window_ms = int(bucket.period * 1000)
+                    index, elapsed = divmod(int(wall * 1000), window_ms)
+                    base = f"clipx:ratelimit:{name}:{client}"
+                    await self._script(
+                        keys=[f"{base}:{index}", f"{base}:{index - 1}"],
+                        args=[units, window_ms, elapsed],
+                        client=pipe,
+                    )
+                used = await pipe.execute()
+        except Exception as exc:  # noqa: BLE001
+            for key, state, units in batch:
+                state.pending += units
+                self._dirty.add(key)
+            self._redis_down_until = time.monotonic() + _REDIS_RETRY_SECONDS
+            logger.warning("Rate limiter running local-only for %ss: %s", _REDIS_RETRY_SECONDS, exc)
+            return
+        now = time.monotonic()
+        for ((name, _), state, _), cluster_used in zip(batch, used):
+            bucket = BUCKETS[name]
+            self._refill(bucket, state, now)
+            # Units taken by this process since the batch was collected are still local
+            state.tokens = min(state.tokens, bucket.capacity - int(cluster_used) - state.pending)
+
+    async def run(self) -> None:
+        """Reconcile with Redis every ``RATE_LIMIT_SYNC_INTERVAL`` seconds."""
+        while True:
+            await asyncio.sleep(RATE_LIMIT_SYNC_INTERVAL)
+            try:
+                await self.sync()
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Rate limiter sync failed: %s", exc)
+
+
+limiter = RateLimiter()
+
+
+def client_id(request: Request) -> str:
+    """Return the id requests are limited by: the peer address, or a forwarded hop.
+
+    With ``RATE_LIMIT_TRUST_FORWARDED`` each of the ``RATE_LIMIT_TRUSTED_PROXIES``
+    proxies appends the address it received the request from, so the client is
+    that many hops from the right; entries further left are client-supplied.
+    """
+    if RATE_LIMIT_TRUST_FORWARDED:
+        hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if hops:
+            return hops[-min(RATE_LIMIT_TRUSTED_PROXIES, len(hops))]
+    return request.client.host if request.client else "unknown"
+
+
+def charge(request: Request, cost: int, bucket: str = "api") -> None:
+    """Consume *cost* units of *bucket* for the client of *request*, raising 429 when denied.
+
+    For routes whose cost depends on the request body; fixed costs use :func:`limit`.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    spec = BUCKETS[bucket]
+    retry_after = limiter.acquire(spec, client_id(request), cost)
+    if retry_after:
+        metrics.observe_rate_limited(spec.name)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded. Try again later.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+def limit(cost: int = 1, bucket: str = "api") -> Callable[[Request], Any]:
+    """Return a dependency charging *cost* units of *bucket* per request."""
+
+    async def _dependency(request: Request) -> None:
+        charge(request, cost, bucket)
+
+    return _dependency
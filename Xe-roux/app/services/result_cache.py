@@ -0,0 +1,170 @@
+"""Content-addressed cache of download results.
+
+Downloads are keyed on ``(normalized URL, resolved format, options)`` so that
+identical requests share one artifact:
+
+* a request matching a finished artifact (local file or S3 object that is
+  still within the cleanup TTL) is answered immediately, and
+* a request matching a job that is still queued or running is attached to
+  that job and sees its progress instead of starting a duplicate.
+
+The in-process downloader keeps the key → download-id mapping in memory; the
+Celery path keeps it in Redis (``SET NX`` so concurrent API workers agree on
+one task). Celery reports ``PENDING`` for unknown or lost task ids too, so a
+claimed task is only joined while its liveness marker exists: the API sets it
+for ``TASK_QUEUED_TTL`` seconds when sending the task, and the worker keeps
+refreshing it (``TASK_HEARTBEAT_TTL``) while the task runs.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import contextlib
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Final, Iterator, Tuple
+
+from ..cleanup import TTL_MINUTES, is_artifact_name
+from .cache import normalize_url
+from .ytdlp import resolve_format
+
+RESULT_TTL_SECONDS: Final[int] = TTL_MINUTES * 60
+S3_ENABLED: Final[bool] = os.getenv("ENABLE_S3_UPLOAD", "0") == "1"
+# How long a sent Celery task may wait in the queue before it counts as lost
+TASK_QUEUED_TTL: Final[int] = int(os.getenv("TASK_QUEUED_TTL", "900"))  # seconds
+# A running task whose worker stopped refreshing its marker for this long counts as dead
+TASK_HEARTBEAT_TTL: Final[int] = int(os.getenv("TASK_HEARTBEAT_TTL", "30"))  # seconds
+
+
+def result_key(url: str, format_id: str, **options: Any) -> str:
+    """Return the content address for a download request."""
+    payload = json.dumps(
+        [normalize_url(url), resolve_format(format_id), format_id.lower() == "mp3", options],
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def find_local_artifact(directory: Path, key: str) -> Path | None:
+    """Return a finished, non-expired file named after *key* in *directory*."""
+    cutoff = time.time() - RESULT_TTL_SECONDS
+    for candidate in directory.glob(f"{key}.*"):
+        # Only the final "<key>.<ext>", never fragments or unmerged formats
+        if not is_artifact_name(candidate.name) or not candidate.is_file():
+            continue
+        if candidate.stat().st_mtime >= cutoff:
+            return candidate
+    return None
+
+
+async def find_s3_artifact(key: str) -> str | None:
+    """Return a presigned URL for a non-expired S3 object named after *key*."""
+    if not S3_ENABLED:
+        return None
+    from . import storage  # local import to avoid heavy deps if disabled
+
+    object_key = await storage.find_object(f"{key}.", max_age_seconds=RESULT_TTL_SECONDS)
+    return storage.presign(object_key) if object_key else None
+
+
+class InflightRegistry:
+    """In-process mapping of result keys to the download id producing them."""
+
+    def __init__(self, ttl: float = RESULT_TTL_SECONDS) -> None:
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key: str, download_id: str, is_live: Callable[[str], bool]) -> str | None:
+        """Register *download_id* for *key* unless a live entry exists.
+
+        ``is_live`` decides whether a previously registered download id can
+        still be shared (queued, running, or finished with its artifact
+        present). Returns that download id when the key is already claimed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now and is_live(entry[0]):
+                return entry[0]
+            self._entries[key] = (download_id, now + self.ttl)
+            # Opportunistically drop expired entries
+            if len(self._entries) > 1024:
+                self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+        return None
+
+    def release(self, key: str, download_id: str) -> None:
+        """Forget *key* if it still points at *download_id* (e.g. after a failure)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == download_id:
+                del self._entries[key]
+
+
+# ---------------------------------------------------------------------------
+# Celery / Redis variant
+# ---------------------------------------------------------------------------
+def _redis_key(key: str) -> str:
+    return f"clipx:result:{key}"
+
+
+def claim_remote(redis_client, key: str, task_id: str) -> str | None:
+    """Atomically register *task_id* for *key* in Redis.
+
+    Returns the task id already registered for the key, or ``None`` if this
+    call claimed it.
+    """
+    if redis_client.set(_redis_key(key), task_id, nx=True, ex=RESULT_TTL_SECONDS):
+        return None
+    existing = redis_client.get(_redis_key(key))
+    if existing is None:  # expired between SET and GET
+        return claim_remote(redis_client, key, task_id)
+    return existing.decode() if isinstance(existing, bytes) else existing
+
+
+def release_remote(redis_client, key: str, task_id: str) -> None:
+    """Drop the Redis entry for *key* if it still points at *task_id*."""
+    existing = redis_client.get(_redis_key(key))
+    if existing is not None and (existing.decode() if isinstance(existing, bytes) else existing) == task_id:
+        redis_client.delete(_redis_key(key))
+
+
+def _alive_key(task_id: str) -> str:
+    return f"clipx:task-alive:{task_id}"
+
+
+def mark_alive(redis_client, task_id: str, ttl: int) -> None:
+    """Mark Celery task *task_id* as queued or running for *ttl* seconds."""
+    redis_client.set(_alive_key(task_id), 1, ex=ttl)
+
+
+def is_alive(redis_client, task_id: str) -> bool:
+    """Return True while *task_id* is known to be queued or running."""
+    return bool(redis_client.exists(_alive_key(task_id)))
+
+
+@contextlib.contextmanager
+def heartbeat(redis_client, task_id: str, ttl: int = TASK_HEARTBEAT_TTL) -> Iterator[None]:
+    """Keep *task_id*'s liveness marker fresh from a background thread while the block runs."""
+    stop = threading.Event()
+
+    def _beat() -> None:
+        while True:
+            try:
+                mark_alive(redis_client, task_id, ttl)
+            except Exception:  # noqa: BLE001 - a missed beat must not fail the task
+                pass
+            if stop.wait(ttl / 3):
+                return
+
+    thread = threading.Thread(target=_beat, name=f"heartbeat-{task_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        # The marker is left to expire: Celery stores the final state only after the task returns
+        stop.set()
+        thread.join()
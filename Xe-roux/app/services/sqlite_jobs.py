@@ -0,0 +1,446 @@
+"""SQLite-backed job store and work queue shared by processes on one host.
+
+Enabled with ``JOB_STORE_BACKEND=sqlite``. Every uvicorn worker opens the same
+database (``JOB_STORE_PATH``, WAL mode) so status and file lookups work no
+matter which worker answers, and each worker's download threads claim queued
+jobs atomically with ``UPDATE ... RETURNING``. This gives multi-core scaling
+on a single box without Redis or Celery.
+
+The three classes mirror the in-memory implementations used by
+:mod:`app.services.downloader`:
+
+* :class:`SqliteJobStore` – :class:`app.services.job_store.JobStore`
+* :class:`SqliteScheduler` – :class:`app.services.job_queue.DownloadScheduler`
+* :class:`SqliteResultRegistry` – :class:`app.services.result_cache.InflightRegistry`
+* :class:`SqliteGroupStore` – :class:`app.services.job_groups.GroupStore`
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Final, Iterator, List
+
+from .job_groups import JOB_GROUPS_MAX, JobGroup
+from .job_queue import Job
+from .job_store import JOB_RETENTION_SECONDS, JOB_STORE_MAX_JOBS, TERMINAL_STATUSES, JobRecord
+from .result_cache import RESULT_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# How often idle workers look for jobs queued by other processes
+SQLITE_POLL_INTERVAL: Final[float] = float(os.getenv("JOB_STORE_POLL_INTERVAL", "0.5"))  # seconds
+
+_SCHEMA: Final[str] = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    file_path TEXT,
+    file_url TEXT,
+    message TEXT,
+    s3_error TEXT,
+    upload TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    args TEXT,
+    owner INTEGER,
+    queued_at REAL,
+    finished_at REAL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, queued_at);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at) WHERE finished_at IS NOT NULL;
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    download_id TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_groups (
+    id TEXT PRIMARY KEY,
+    download_ids TEXT NOT NULL,
+    source_url TEXT,
+    title TEXT,
+    created_at REAL NOT NULL
+);
+"""
+
+# Columns a JobRecord maps to (in dataclass field order)
+_RECORD_COLUMNS: Final = (
+    "status", "progress", "file_path", "file_url", "message", "s3_error", "upload", "finished_at", "detail"
+)
+# Record columns stored as JSON text
+_JSON_COLUMNS: Final = ("upload", "detail")
+# Columns added after the first release, created on databases that lack them
+_ADDED_COLUMNS: Final = {"detail": "TEXT"}
+
+
+class Database:
+    """One SQLite file with a connection per thread."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self.connection()
+        conn.executescript(_SCHEMA)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for name, column_type in _ADDED_COLUMNS.items():
+            if name not in existing:
+                try:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {column_type}")
+                except sqlite3.OperationalError:
+                    pass  # added concurrently by another worker
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly below
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """``BEGIN IMMEDIATE`` transaction (re-entrant within one thread)."""
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+def _to_column(name: str, value: Any) -> Any:
+    if name in _JSON_COLUMNS and value is not None:
+        return json.dumps(value)
+    return value
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SqliteJobStore:
+    """:class:`JobStore` equivalent persisted in the ``jobs`` table."""
+
+    def __init__(
+        self,
+        db: Database,
+        retention_seconds: float = JOB_RETENTION_SECONDS,
+        max_jobs: int = JOB_STORE_MAX_JOBS,
+    ) -> None:
+        self.db = db
+        self.retention_seconds = retention_seconds
+        self.max_jobs = max_jobs
+        self._last_prune = 0.0
+
+    def set(self, download_id: str, status: str, **fields: Any) -> JobRecord:
+        record = JobRecord(status, **fields)
+        if status in TERMINAL_STATUSES:
+            record.finished_at = time.time()
+        values = [_to_column(name, getattr(record, name)) for name in _RECORD_COLUMNS]
+        updates = ", ".join(f"{name} = excluded.{name}" for name in _RECORD_COLUMNS)
+        with self.db.transaction() as conn:
+            conn.execute(
+                f"INSERT INTO jobs (id, {', '.join(_RECORD_COLUMNS)}) VALUES (?{', ?' * len(_RECORD_COLUMNS)}) "
+                f"ON CONFLICT (id) DO UPDATE SET {updates}",
+                (download_id, *values),
+            )
+            # Pruning scans the finished index, so do it at most once per second
+            if record.finished_at is not None and time.monotonic() - self._last_prune > 1.0:
+                self._last_prune = time.monotonic()
+                self._prune(conn)
+        return record
+
+    def update(self, download_id: str, **fields: Any) -> None:
+        fields = {name: _to_column(name, value) for name, value in fields.items()}
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self.db.connection().execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), download_id)
+        )
+
+    def get(self, download_id: str) -> JobRecord | None:
+        row = self.db.connection().execute(
+            f"SELECT {', '.join(_RECORD_COLUMNS)} FROM jobs WHERE id = ?", (download_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = JobRecord(*row)
+        if record.finished_at is not None and record.finished_at < time.time() - self.retention_seconds:
+            return None
+        for name in _JSON_COLUMNS:
+            value = getattr(record, name)
+            if value:
+                setattr(record, name, json.loads(value))
+        return record
+
+    def pop(self, download_id: str) -> None:
+        self.db.connection().execute("DELETE FROM jobs WHERE id = ?", (download_id,))
+
+    def __len__(self) -> int:
+        return self.db.connection().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+            (time.time() - self.retention_seconds,),
+        )
+        conn.execute(
+            "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE finished_at IS NOT NULL "
+            "ORDER BY finished_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_jobs,),
+        )
+
+
+class SqliteScheduler:
+    """:class:`DownloadScheduler` equivalent whose queue is the ``jobs`` table.
+
+    Each process runs ``workers`` threads that claim the highest-priority
+    queued job with a single ``UPDATE ... RETURNING`` statement, so a job is
+    executed by exactly one worker across all processes.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        worker_fn: Callable[..., None],
+        workers: int,
+        on_change: Callable[[int, int], None] | None = None,
+        poll_interval: float = SQLITE_POLL_INTERVAL,
+    ) -> None:
+        self.db = db
+        self._worker_fn = worker_fn
+        self._size = max(1, workers)
+        self._on_change = on_change
+        self._poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._running: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._accepting = True
+        self._stopping = False
+        self._pid = os.getpid()
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self._size):
+                thread = threading.Thread(target=self._run, name=f"download-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _claim(self) -> Job | None:
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "UPDATE jobs SET status = 'in_progress', owner = ? WHERE id = ("
+                "  SELECT id FROM jobs WHERE status = 'queued' AND args IS NOT NULL"
+                "  ORDER BY priority, queued_at LIMIT 1"
+                ") RETURNING id, priority, args",
+                (self._pid,),
+            ).fetchone()
+        if row is None:
+            return None
+        return Job(row[1], 0, row[0], tuple(json.loads(row[2])))
+
+    def _run(self) -> None:
+        while not self._stopping:
+            try:
+                job = self._claim()
+            except sqlite3.Error as exc:
+                logger.warning("Could not claim a download job: %s", exc)
+                job = None
+            if job is None:
+                self._wakeup.wait(self._poll_interval)
+                self._wakeup.clear()
+                continue
+            with self._lock:
+                self._running[job.download_id] = threading.current_thread()
+            self._changed()
+            try:
+                self._worker_fn(job.download_id, *job.args)
+            except Exception:  # noqa: BLE001
+                logger.exception("Download worker crashed for %s", job.download_id)
+            finally:
+                with self._lock:
+                    self._running.pop(job.download_id, None)
+                self._changed()
+
+    def _changed(self) -> None:
+        if self._on_change is not None:
+            self._on_change(self.depth(), self.active())
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def submit(self, download_id: str, priority: int, *args: Any) -> None:
+        """Queue a job; raises ``RuntimeError`` once shutdown has begun."""
+        if not self._accepting:
+            raise RuntimeError("Downloader is shutting down")
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, priority, args, queued_at) VALUES (?, 'queued', ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET status = 'queued', priority = excluded.priority, "
+                "args = excluded.args, queued_at = excluded.queued_at, owner = NULL",
+                (download_id, priority, json.dumps(list(args)), time.time()),
+            )
+        self._ensure_started()
+        self._wakeup.set()
+        self._changed()
+
+    def position(self, download_id: str) -> int | None:
+        """Return the 1-based queue position of a waiting job, else ``None``."""
+        row = self.db.connection().execute(
+            "SELECT 1 + (SELECT COUNT(*) FROM jobs o WHERE o.status = 'queued' AND o.args IS NOT NULL "
+            "AND (o.priority, o.queued_at) < (j.priority, j.queued_at)) "
+            "FROM jobs j WHERE j.id = ? AND j.status = 'queued'",
+            (download_id,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def depth(self) -> int:
+        """Number of jobs (from all processes) waiting for a worker."""
+        return self.db.connection().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND args IS NOT NULL"
+        ).fetchone()[0]
+
+    def active(self) -> int:
+        """Number of jobs currently running in this process."""
+        return len(self._running)
+
+    def shutdown(self, mode: str = "drain", timeout: float = 30.0) -> None:
+        """Stop claiming jobs; queued jobs stay in the database for other workers.
+
+        ``drain`` waits (up to *timeout*) for this process's running jobs;
+        ``persist`` puts them back in the queue so another worker or the next
+        start re-runs them.
+        """
+        deadline = time.monotonic() + timeout
+        self._accepting = False
+        self._stopping = True
+        self._wakeup.set()
+        if mode == "persist":
+            with self._lock:
+                running = list(self._running)
+            if running:
+                with self.db.transaction() as conn:
+                    conn.executemany(
+                        "UPDATE jobs SET status = 'queued', owner = NULL, progress = 0 WHERE id = ?",
+                        [(download_id,) for download_id in running],
+                    )
+            return
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def restore(self, prepare: Callable[[Job], None] | None = None) -> List[Job]:
+        """Start this process's workers and re-queue jobs of dead processes.
+
+        Called at startup by every worker process so each one claims jobs,
+        including those queued by the others. *prepare* runs for each job in
+        the transaction that makes it claimable again.
+        """
+        with self.db.transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, priority, args, owner FROM jobs WHERE status = 'in_progress' AND args IS NOT NULL"
+            ).fetchall()
+            jobs = [
+                Job(row[1], 0, row[0], tuple(json.loads(row[2])))
+                for row in rows
+                if row[3] is None or not _pid_alive(row[3])
+            ]
+            for job in jobs:
+                if prepare is not None:
+                    prepare(job)
+            conn.executemany(
+                "UPDATE jobs SET status = 'queued', owner = NULL, progress = 0 WHERE id = ?",
+                [(job.download_id,) for job in jobs],
+            )
+        self._ensure_started()
+        return jobs
+
+
+class SqliteResultRegistry:
+    """:class:`InflightRegistry` equivalent shared through the ``results`` table."""
+
+    def __init__(self, db: Database, ttl: float = RESULT_TTL_SECONDS) -> None:
+        self.db = db
+        self.ttl = ttl
+
+    def claim(self, key: str, download_id: str, is_live: Callable[[str], bool]) -> str | None:
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT download_id, expires_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row and row[1] > now and is_live(row[0]):
+                return row[0]
+            conn.execute(
+                "INSERT INTO results (key, download_id, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET download_id = excluded.download_id, expires_at = excluded.expires_at",
+                (key, download_id, now + self.ttl),
+            )
+            conn.execute("DELETE FROM results WHERE expires_at < ?", (now,))
+        return None
+
+    def release(self, key: str, download_id: str) -> None:
+        self.db.connection().execute(
+            "DELETE FROM results WHERE key = ? AND download_id = ?", (key, download_id)
+        )
+
+
+class SqliteGroupStore:
+    """:class:`GroupStore` equivalent persisted in the ``job_groups`` table."""
+
+    def __init__(
+        self,
+        db: Database,
+        retention_seconds: float = JOB_RETENTION_SECONDS,
+        max_groups: int = JOB_GROUPS_MAX,
+    ) -> None:
+        self.db = db
+        self.retention_seconds = retention_seconds
+        self.max_groups = max_groups
+
+    def add(self, group: JobGroup) -> None:
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO job_groups (id, download_ids, source_url, title, created_at) VALUES (?, ?, ?, ?, ?)",
+                (group.group_id, json.dumps(group.download_ids), group.source_url, group.title, group.created_at),
+            )
+            conn.execute("DELETE FROM job_groups WHERE created_at < ?", (time.time() - self.retention_seconds,))
+            conn.execute(
+                "DELETE FROM job_groups WHERE id IN (SELECT id FROM job_groups "
+                "ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_groups,),
+            )
+
+    def get(self, group_id: str) -> JobGroup | None:
+        row = self.db.connection().execute(
+            "SELECT download_ids, source_url, title, created_at FROM job_groups WHERE id = ?", (group_id,)
+        ).fetchone()
+        if row is None or row[3] < time.time() - self.retention_seconds:
+            return None
+        return JobGroup(group_id, json.loads(row[0]), row[1], row[2], row[3])
+
+    def __len__(self) -> int:
+        return self.db.connection().execute("SELECT COUNT(*) FROM job_groups").fetchone()[0]
@@ -4,6 +4,12 @@ Provides an async-compatible `upload_to_s3` helper that uploads the given file t
 an S3 bucket (or compatible service like MinIO / LocalStack) and returns a
 presigned download URL valid for a limited time (default: 24 h).
 
+Large files are sent as parallel multipart uploads through a pooled client
+(part size, concurrency and pool size are tunable via env). With
+``S3_UPLOAD_WHILE_DOWNLOADING=1`` a :class:`LiveUpload` starts sending parts
+while yt-dlp is still writing the file, so time-to-URL is roughly the download
+time rather than download plus upload.
+
 The upload is executed in a background thread so that the FastAPI event loop is
 not blocked by the synchronous boto3 client.
 """
@@ -11,13 +17,25 @@ not blocked by the synchronous boto3 client.
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import logging
 import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Final
+from typing import Any, Dict, Final, List, Tuple
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 
+logger = logging.getLogger(__name__)
+
+_MIB: Final[int] = 1024 * 1024
+
 # Environment variables (names follow Story 1.05 spec)
 S3_ENDPOINT: Final[str | None] = os.getenv("S3_ENDPOINT")
 S3_ACCESS_KEY: Final[str | None] = os.getenv("S3_ACCESS_KEY")
@@ -26,46 +44,266 @@ S3_BUCKET_NAME: Final[str | None] = os.getenv("S3_BUCKET")
 AWS_REGION: Final[str | None] = os.getenv("AWS_REGION", "us-east-1")
 PRESIGN_EXPIRES_SECONDS: Final[int] = int(os.getenv("S3_PRESIGN_TTL", "3600"))  # 1h default
 
-_session = boto3.session.Session()
-_s3 = _session.client(
-    "s3",
-    endpoint_url=S3_ENDPOINT,
-    region_name=AWS_REGION,
-    aws_access_key_id=S3_ACCESS_KEY,
-    aws_secret_access_key=S3_SECRET_KEY,
-    config=boto3.session.Config(s3={'addressing_style': 'path'}),
-)
+# Multipart tuning (S3 requires parts of at least 5 MiB except the last one)
+S3_PART_SIZE: Final[int] = max(5, int(os.getenv("S3_PART_SIZE_MB", "16"))) * _MIB
+S3_UPLOAD_CONCURRENCY: Final[int] = int(os.getenv("S3_UPLOAD_CONCURRENCY", "8"))
+S3_MAX_POOL_CONNECTIONS: Final[int] = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "16"))
+S3_UPLOAD_WHILE_DOWNLOADING: Final[bool] = os.getenv("S3_UPLOAD_WHILE_DOWNLOADING", "0") == "1"
+# How often a LiveUpload checks the growing file for new full parts
+_LIVE_POLL_SECONDS: Final[float] = 0.5
+
+# Created on first use so importing this module stays cheap (see _client)
+_s3 = None
+_part_executor: ThreadPoolExecutor | None = None
+_client_lock = threading.Lock()
 # Disable boto3 logger noise unless explicitly enabled
 if os.getenv("S3_DEBUG", "0") != "1":
-    import logging
     logging.getLogger("boto3").setLevel(logging.WARNING)
     logging.getLogger("botocore").setLevel(logging.WARNING)
 
 
-async def upload_to_s3(file_path: str | Path) -> str:  # pragma: no cover
-    """Upload *file_path* to ``S3_BUCKET_NAME`` and return a presigned URL.
+def _client():
+    """Return the shared pooled S3 client, creating it on first use."""
+    global _s3, _part_executor
+    if _s3 is None:
+        with _client_lock:
+            if _s3 is None:
+                _part_executor = ThreadPoolExecutor(max_workers=S3_UPLOAD_CONCURRENCY, thread_name_prefix="s3-part")
+                _s3 = boto3.session.Session().client(
+                    "s3",
+                    endpoint_url=S3_ENDPOINT,
+                    region_name=AWS_REGION,
+                    aws_access_key_id=S3_ACCESS_KEY,
+                    aws_secret_access_key=S3_SECRET_KEY,
+                    config=Config(
+                        s3={'addressing_style': 'path'},
+                        max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                        retries={"max_attempts": 5, "mode": "adaptive"},
+                    ),
+                )
+    return _s3
 
-    The object key will be the filename (no directories). If the bucket/env is
-    not configured, raises ``RuntimeError``.
-    """
 
+@dataclass
+class UploadStats:
+    """Throughput and per-part timings of one upload."""
+
+    bytes: int = 0
+    seconds: float = 0.0
+    parts: List[Tuple[int, int, float]] = field(default_factory=list)  # (number, size, seconds)
+    live: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        part_seconds = [p[2] for p in self.parts]
+        return {
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 3),
+            "mbps": round(self.bytes * 8 / self.seconds / 1e6, 2) if self.seconds else None,
+            "parts": len(self.parts),
+            "partSecondsAvg": round(sum(part_seconds) / len(part_seconds), 3) if part_seconds else None,
+            "partSecondsMax": round(max(part_seconds), 3) if part_seconds else None,
+            "uploadedWhileDownloading": self.live,
+        }
+
+
+def _require_bucket() -> str:
     if not S3_BUCKET_NAME:
         raise RuntimeError("S3_BUCKET_NAME env var is not configured")
+    return S3_BUCKET_NAME
+
+
+def _read_range(path: Path, offset: int, size: int) -> bytes:
+    with path.open("rb") as fh:
+        fh.seek(offset)
+        return fh.read(size)
 
+
+class _MultipartUpload:
+    """Parallel multipart upload of byte ranges of a local file."""
+
+    def __init__(self, key: str, stats: UploadStats) -> None:
+        self.bucket = _require_bucket()
+        self.key = key
+        self.stats = stats
+        self.upload_id = _client().create_multipart_upload(Bucket=self.bucket, Key=key)["UploadId"]
+        self._futures: List[Future] = []
+        self._etags: Dict[int, Tuple[str, str]] = {}  # part -> (etag, md5 of data)
+        self._lock = threading.Lock()
+
+    def submit(self, path: Path, number: int, offset: int, size: int) -> None:
+        self._futures.append(_part_executor.submit(self._upload_part, path, number, offset, size))
+
+    def _upload_part(self, path: Path, number: int, offset: int, size: int) -> None:
+        data = _read_range(path, offset, size)
+        start = time.perf_counter()
+        response = _client().upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=number, Body=data
+        )
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._etags[number] = (response["ETag"], hashlib.md5(data).hexdigest())
+            self.stats.parts.append((number, len(data), elapsed))
+            self.stats.bytes += len(data)
+
+    def wait(self) -> None:
+        for future in self._futures:
+            future.result()
+        self._futures.clear()
+
+    def part_digest(self, number: int) -> str | None:
+        entry = self._etags.get(number)
+        return entry[1] if entry else None
+
+    def complete(self) -> None:
+        self.wait()
+        parts = [{"PartNumber": n, "ETag": self._etags[n][0]} for n in sorted(self._etags)]
+        _client().complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, MultipartUpload={"Parts": parts}
+        )
+
+    def abort(self) -> None:
+        for future in self._futures:
+            future.cancel()
+        try:
+            _client().abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        except (ClientError, BotoCoreError) as exc:  # pragma: no cover
+            logger.warning("Failed to abort multipart upload %s: %s", self.key, exc)
+
+
+def upload_file_sync(file_path: str | Path) -> Tuple[str, UploadStats]:  # pragma: no cover
+    """Upload *file_path* (key = filename) and return ``(presigned_url, stats)``.
+
+    Files larger than one part are sent as a parallel multipart upload.
+    """
     path = Path(file_path)
     if not path.exists():
         raise FileNotFoundError(path)
 
-    key = path.name
+    bucket = _require_bucket()
+    stats = UploadStats()
+    size = path.stat().st_size
+    start = time.perf_counter()
+    if size <= S3_PART_SIZE:
+        with path.open("rb") as fh:
+            _client().put_object(Bucket=bucket, Key=path.name, Body=fh)
+        stats.bytes = size
+    else:
+        upload = _MultipartUpload(path.name, stats)
+        try:
+            for number, offset in enumerate(range(0, size, S3_PART_SIZE), start=1):
+                upload.submit(path, number, offset, min(S3_PART_SIZE, size - offset))
+            upload.complete()
+        except Exception:
+            upload.abort()
+            raise
+    stats.seconds = time.perf_counter() - start
+    return presign(path.name), stats
 
-    def _upload() -> None:
-        _s3.upload_file(str(path), S3_BUCKET_NAME, key)
+
+async def upload_to_s3(file_path: str | Path) -> str:  # pragma: no cover
+    """Upload *file_path* to ``S3_BUCKET_NAME`` and return a presigned URL.
+
+    The object key will be the filename (no directories). If the bucket/env is
+    not configured, raises ``RuntimeError``.
+    """
 
     # run sync upload in a thread so as not to block
-    await asyncio.to_thread(_upload)
+    presigned_url, _ = await asyncio.to_thread(upload_file_sync, file_path)
+    return presigned_url
+
+
+class LiveUpload:  # pragma: no cover
+    """Upload a file in parts while yt-dlp is still writing it.
+
+    Pass :meth:`hook` as a yt-dlp progress hook (with ``nopart`` enabled so
+    yt-dlp writes the final file directly). Every time another full part is
+    on disk it is uploaded in the background. :meth:`finish` uploads the tail,
+    re-checks each uploaded part against the final file (post-processors may
+    rewrite it) and completes the upload, falling back to a regular upload if
+    the file changed underneath.
+    """
+
+    def __init__(self) -> None:
+        self.stats = UploadStats(live=True)
+        self._path: Path | None = None
+        self._upload: _MultipartUpload | None = None
+        self._offset = 0
+        self._next_part = 1
+        self._done = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._error: BaseException | None = None
+        self._start = time.perf_counter()
+
+    def hook(self, d: Dict[str, Any]) -> None:
+        if self._thread is None and d.get("status") == "downloading" and d.get("filename"):
+            self._path = Path(d["filename"])
+            self._thread = threading.Thread(target=self._tail, name="s3-live-upload", daemon=True)
+            self._thread.start()
+
+    def _tail(self) -> None:
+        try:
+            while not self._done.is_set():
+                self._submit_full_parts()
+                self._done.wait(_LIVE_POLL_SECONDS)
+        except BaseException as exc:  # noqa: BLE001
+            self._error = exc
 
+    def _submit_full_parts(self) -> None:
+        size = self._path.stat().st_size if self._path.exists() else 0
+        while size - self._offset >= S3_PART_SIZE:
+            if self._upload is None:
+                self._upload = _MultipartUpload(self._path.name, self.stats)
+            self._upload.submit(self._path, self._next_part, self._offset, S3_PART_SIZE)
+            self._offset += S3_PART_SIZE
+            self._next_part += 1
+
+    def _parts_still_valid(self, final_path: Path) -> bool:
+        """Return True if every uploaded part matches the final file's bytes."""
+        for number in range(1, self._next_part):
+            offset = (number - 1) * S3_PART_SIZE
+            data = _read_range(final_path, offset, S3_PART_SIZE)
+            if len(data) != S3_PART_SIZE or hashlib.md5(data).hexdigest() != self._upload.part_digest(number):
+                return False
+        return True
+
+    def finish(self, final_path: str | Path) -> Tuple[str, UploadStats]:
+        """Complete the upload of *final_path*; returns ``(presigned_url, stats)``."""
+        final_path = Path(final_path)
+        self._done.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._upload is None or self._error is not None or final_path.name != self._path.name:
+            if self._upload is not None:
+                self._upload.abort()
+            return upload_file_sync(final_path)
+
+        try:
+            self._upload.wait()
+            if not self._parts_still_valid(final_path):
+                self._upload.abort()
+                return upload_file_sync(final_path)
+            size = final_path.stat().st_size
+            if size > self._offset:
+                self._upload.submit(final_path, self._next_part, self._offset, size - self._offset)
+            self._upload.complete()
+        except Exception:
+            self._upload.abort()
+            raise
+        self.stats.seconds = time.perf_counter() - self._start
+        return presign(final_path.name), self.stats
+
+    def abort(self) -> None:
+        self._done.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._upload is not None:
+            self._upload.abort()
+
+
+def presign(key: str) -> str:  # pragma: no cover
+    """Return a presigned GET URL for object *key* in ``S3_BUCKET_NAME``."""
     try:
-        presigned_url = _s3.generate_presigned_url(
+        presigned_url = _client().generate_presigned_url(
             "get_object",
             Params={"Bucket": S3_BUCKET_NAME, "Key": key},
             ExpiresIn=PRESIGN_EXPIRES_SECONDS,
@@ -73,4 +311,29 @@ async def upload_to_s3(file_path: str | Path) -> str:  # pragma: no cover
     except (ClientError, BotoCoreError) as exc:  # pragma: no cover
         raise RuntimeError(f"Failed to create presigned URL: {exc}") from exc
 
-    return presigned_url
\ No newline at end of file
+    return presigned_url
+
+
+async def find_object(prefix: str, max_age_seconds: float | None = None) -> str | None:  # pragma: no cover
+    """Return the key of an object starting with *prefix*, or ``None``.
+
+    Objects older than *max_age_seconds* are ignored so callers can honour
+    the temp-file TTL.
+    """
+    if not S3_BUCKET_NAME:
+        return None
+
+    def _find() -> str | None:
+        response = _client().list_objects_v2(Bucket=S3_BUCKET_NAME, Prefix=prefix, MaxKeys=5)
+        for obj in response.get("Contents", []):
+            if max_age_seconds is not None:
+                age = (datetime.now(tz=timezone.utc) - obj["LastModified"]).total_seconds()
+                if age > max_age_seconds:
+                    continue
+            return obj["Key"]
+        return None
+
+    try:
+        return await asyncio.to_thread(_find)
+    except (ClientError, BotoCoreError):
+        return None
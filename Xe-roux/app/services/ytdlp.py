@@ -1,12 +1,52 @@
 """Wrapper around yt-dlp CLI to extract video metadata and handle downloads."""
 
 import asyncio
+import contextlib
+import copy
+import functools
+import importlib.util
 import json
+import os
+import re
 import shlex
 import subprocess
 import sys
+import tempfile
+import time
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List
+from urllib.parse import parse_qs, urlparse
+
+from utils import validators
+
+from . import download_tuning, metrics
+from .cache import info_cache, normalize_url, preview_cache
+from .progress import PROGRESS_TEMPLATE_ARGS, ProgressCoalescer, ProgressEvent, parse_progress, parse_progress_line
+
+# Extraction engine: "cli" spawns the yt-dlp executable per call, "pool" runs
+# extraction inside a warm process pool (see app.services.extractor_pool).
+YTDLP_ENGINE = os.getenv("YTDLP_ENGINE", "cli").lower()
+
+# Starts the yt-dlp CLI with the validated DNS answers pinned (see utils.validators)
+_PINNED_LAUNCHER = str(Path(validators.__file__).with_name("pinned_ytdlp.py"))
+
+
+@functools.lru_cache(maxsize=1)
+def _library_available() -> bool:
+    return importlib.util.find_spec("yt_dlp") is not None
+
+
+def ytdlp_command(url: str) -> List[str]:
+    """Return the argv prefix that runs the yt-dlp CLI for *url*.
+
+    When the ``yt_dlp`` package is importable, the CLI runs through
+    ``utils/pinned_ytdlp.py`` so the subprocess connects only to the addresses
+    validated for *url*'s host. Otherwise the ``yt-dlp`` executable is used
+    and resolves hostnames itself.
+    """
+    if _library_available():
+        return [sys.executable, _PINNED_LAUNCHER, json.dumps(validators.pins_for(url))]
+    return ["yt-dlp"]
 
 
 async def _run_cmd(cmd: List[str]) -> str:
@@ -40,230 +80,232 @@ async def _run_cmd(cmd: List[str]) -> str:
         return stdout.decode()
 
 
-async def _run_cmd_with_progress(cmd: List[str], progress_callback=None) -> str:
-    """Run external command with progress tracking using yt-dlp's progress output."""
-    import re
-    
-    # Add progress reporting option to yt-dlp (newline ensures real-time output)
-    progress_cmd = cmd + ["--newline", "--progress"]
-    
-    # On Windows, use subprocess.run in a thread pool to avoid asyncio subprocess issues
+async def _run_cmd_with_progress(cmd: List[str], on_event: Callable[[ProgressEvent], None]) -> str:
+    """Run a yt-dlp command, passing parsed progress events to *on_event*.
+
+    Progress is requested as one JSON object per line via
+    ``--progress-template`` (see :mod:`app.services.progress`); all other
+    output is collected, stdout returned and stderr used as the error message.
+    """
+    progress_cmd = cmd + PROGRESS_TEMPLATE_ARGS
+    stdout_lines: List[str] = []
+    stderr_lines: List[str] = []
+
+    def _handle(line: str, sink: List[str]) -> None:
+        event = parse_progress_line(line)
+        if event is not None:
+            on_event(event)
+        else:
+            sink.append(line)
+
+    # On Windows, use subprocess.Popen in a thread to avoid asyncio subprocess issues
     if sys.platform == "win32":
-        import concurrent.futures
-        
-        def _run_with_progress():
-            import threading
-            import queue
-            
+        import threading
+
+        def _run_in_thread() -> int:
             process = subprocess.Popen(
                 progress_cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
                 bufsize=1,
-                universal_newlines=True
             )
-            
-            stdout_lines = []
-            stderr_lines = []
-            progress_queue = queue.Queue()
-            
-            def read_stderr():
-                """Read stderr and capture progress."""
-                try:
-                    print("DEBUG: Starting to read stderr")  # Debug log
-                    for line in iter(process.stderr.readline, ''):
-                        if not line:
-                            break
-                        stderr_lines.append(line)
-                        print(f"DEBUG: Stderr line: {line.strip()}")  # Debug log
-                        
-                        # Parse progress information
-                        if progress_callback and "[download]" in line:
-                            print(f"DEBUG: Found download line: {line.strip()}")  # Debug log
-                            # Extract percentage using regex
-                            percent_match = re.search(r'(\d+(?:\.\d+)?)%', line)
-                            if percent_match:
-                                try:
-                                    percent = float(percent_match.group(1))
-                                    print(f"DEBUG: Extracted progress: {percent}%")  # Debug log
-                                    progress_queue.put(percent)
-                                    # Call progress callback immediately
-                                    progress_callback(percent)
-                                except Exception as e:
-                                    print(f"DEBUG: Error parsing percentage: {e}")  # Debug log
-                    print("DEBUG: Finished reading stderr")  # Debug log
-                except Exception as e:
-                    print(f"DEBUG: Exception in read_stderr: {e}")  # Debug log
-            
-            # Start stderr reading thread
-            stderr_thread = threading.Thread(target=read_stderr)
-            stderr_thread.daemon = True
+
+            def _read_stderr() -> None:
+                for line in process.stderr:
+                    _handle(line, stderr_lines)
+
+            stderr_thread = threading.Thread(target=_read_stderr, daemon=True)
             stderr_thread.start()
-            
-            # Read stdout
-            try:
-                for line in iter(process.stdout.readline, ''):
-                    if not line:
-                        break
-                    stdout_lines.append(line)
-                    # NEW: Also parse progress information from stdout (some systems emit progress here)
-                    if progress_callback and "[download]" in line:
-                        percent_match = re.search(r'(\d+(?:\.\d+)?)%', line)
-                        if percent_match:
-                            try:
-                                percent = float(percent_match.group(1))
-                                progress_queue.put(percent)
-                                progress_callback(percent)
-                            except Exception as e:
-                                print(f"DEBUG: Error parsing percentage from stdout: {e}")  # Debug log
-            except Exception:
-                pass
-            
-            # Wait for stderr thread
+            for line in process.stdout:
+                _handle(line, stdout_lines)
             stderr_thread.join()
-            
-            # Wait for process to complete with timeout
-            print("DEBUG: Waiting for process to complete...")  # Debug log
-            try:
-                returncode = process.wait(timeout=300)  # 5 minute timeout
-                print(f"DEBUG: Process completed with return code: {returncode}")  # Debug log
-            except subprocess.TimeoutExpired:
-                print("DEBUG: Process timed out after 5 minutes")  # Debug log
-                process.kill()
-                raise Exception("yt-dlp process timed out after 5 minutes")
-            
-            stderr_thread.join(timeout=10)  # Give stderr thread time to finish
-            
-            # Get final progress if available
-            final_progress = None
-            while not progress_queue.empty():
-                final_progress = progress_queue.get_nowait()
-            
-            if final_progress is not None:
-                print(f"DEBUG: Final progress: {final_progress}%")  # Debug log
-                progress_callback(final_progress)
-            
-            if returncode != 0:
-                error_output = ''.join(stderr_lines)
-                print(f"DEBUG: Error output: {error_output}")  # Debug log
-                raise RuntimeError(error_output)
-            
-            # Store progress values for async processing
-            progress_values = []
-            while not progress_queue.empty():
-                progress_values.append(progress_queue.get())
-            
-            return ''.join(stdout_lines), progress_values
-        
-        loop = asyncio.get_event_loop()
-        with concurrent.futures.ThreadPoolExecutor() as pool:
-            result, progress_values = await loop.run_in_executor(pool, _run_with_progress)
-            
-            # Process progress values
-            if progress_callback and progress_values:
-                print(f"DEBUG: Processing {len(progress_values)} progress values")  # Debug log
-                for progress_value in progress_values:
-                    print(f"DEBUG: Calling progress callback with {progress_value}%")  # Debug log
-                    await progress_callback(progress_value)
-            else:
-                print(f"DEBUG: No progress callback or values: callback={progress_callback}, values={progress_values}")  # Debug log
-            
-            return result
+            return process.wait()
+
+        returncode = await asyncio.get_running_loop().run_in_executor(None, _run_in_thread)
     else:
-        # For non-Windows systems, use asyncio subprocess with progress tracking
         process = await asyncio.create_subprocess_exec(
             *progress_cmd,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
         )
-        
-        stdout_lines = []
-        
-        async def read_stderr():
-            while True:
-                line = await process.stderr.readline()
-                if not line:
-                    break
-                line = line.decode()
-                
-                # Parse progress information
-                if progress_callback and "[download]" in line:
-                    percent_match = re.search(r'(\d+(?:\.\d+)?)%', line)
-                    if percent_match:
-                        try:
-                            percent = float(percent_match.group(1))
-                            await progress_callback(percent)
-                        except Exception:
-                            pass  # Ignore parsing errors
-        
-        async def read_stdout():
-            while True:
-                line = await process.stdout.readline()
-                if not line:
-                    break
-                stdout_lines.append(line.decode())
-        
+
+        async def _read(stream: asyncio.StreamReader, sink: List[str]) -> None:
+            async for raw in stream:
+                _handle(raw.decode(errors="replace"), sink)
+
         # Read both streams concurrently
-        await asyncio.gather(read_stderr(), read_stdout())
-        
-        await process.wait()
-        
-        if process.returncode != 0:
-            stderr_output = await process.stderr.read()
-            raise RuntimeError(stderr_output.decode())
-        
-        return ''.join(stdout_lines)
+        await asyncio.gather(_read(process.stdout, stdout_lines), _read(process.stderr, stderr_lines))
+        returncode = await process.wait()
+
+    if returncode != 0:
+        raise RuntimeError("".join(stderr_lines))
+    return "".join(stdout_lines)
 
 
 async def fetch_preview(url: str) -> Dict[str, Any]:
-    """Return metadata for the provided URL using yt-dlp --dump-json."""
-    cmd = [
-        "yt-dlp",
-        "--dump-json",
-        "--skip-download",
-        url,
-    ]
-    output = await _run_cmd(cmd)
-    data = json.loads(output)
-    
-    # Filter formats to only MP4 and audio formats
-    all_formats = data.get("formats", [])
-    filtered_formats = []
-    
-    for fmt in all_formats:
-        ext = fmt.get("ext", "").lower()
-        # Keep video formats (MP4) ONLY if they contain both video and audio
-        if ext in {"mp4"}:
-            if fmt.get("vcodec") != "none" and fmt.get("acodec") != "none":
-                # Exclude resolutions higher than 2K (1440p)
-                height = fmt.get("height")
-                if height is None and fmt.get("resolution"):
-                    # resolution might be like "1920x1080" or "1080p"
-                    import re
-                    m = re.search(r"(\d+)[pP]", fmt.get("resolution"))
-                    if m:
-                        height = int(m.group(1))
-                if height is None or height <= 2160:
-                    filtered_formats.append(fmt)
-        # Keep common audio-only formats where vcodec is 'none'
-        elif ext in {"m4a", "mp3", "wav", "flac", "aac", "ogg"}:
-            if fmt.get("vcodec") == "none":
-                filtered_formats.append(fmt)
-    
-    # Simplify and deduplicate based on ext + quality label
-    mapped_formats = []
+    """Return metadata for the provided URL, served from the preview cache.
+
+    Lookups are keyed on the normalized URL; concurrent requests for the same
+    URL share a single yt-dlp extraction.
+    """
+    preview = await preview_cache.get_or_load(normalize_url(url), lambda: _fetch_preview_uncached(url))
+    return {**preview, "url": url}
+
+
+def _pool_engine_enabled() -> bool:
+    """Return True when the warm extractor pool should be used."""
+    if YTDLP_ENGINE != "pool":
+        return False
+    try:
+        import yt_dlp  # type: ignore  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def extract_info(url: str) -> Dict[str, Any]:
+    """Return the raw yt-dlp info dict for *url* using the configured engine."""
+    engine = "pool" if _pool_engine_enabled() else "cli"
+    start = time.perf_counter()
+    try:
+        if engine == "pool":
+            from . import extractor_pool
+
+            info = await extractor_pool.extract_info(url)
+        else:
+            cmd = [
+                *ytdlp_command(url),
+                "--dump-json",
+                "--skip-download",
+                url,
+            ]
+            output = await _run_cmd(cmd)
+            info = json.loads(output)
+    except Exception:
+        metrics.observe_extraction("unknown", engine, time.perf_counter() - start, ok=False)
+        raise
+    metrics.observe_extraction(metrics.extractor_of(info), engine, time.perf_counter() - start)
+    return info
+
+
+async def extract_flat(url: str, start: int, end: int) -> Dict[str, Any]:
+    """Return the playlist info of *url* with flat entries *start*..*end* (1-based, inclusive).
+
+    Entries are not resolved (no per-item format lists), and extractors that
+    page lazily only fetch the pages covering the requested range.
+    """
+    engine = "pool" if _pool_engine_enabled() else "cli"
+    items = f"{start}:{end}"
+    started = time.perf_counter()
+    try:
+        if engine == "pool":
+            from . import extractor_pool
+
+            info = await extractor_pool.extract_flat(url, items)
+        else:
+            cmd = [
+                *ytdlp_command(url),
+                "--flat-playlist",
+                "--dump-single-json",
+                "--playlist-items",
+                items,
+                url,
+            ]
+            info = json.loads(await _run_cmd(cmd))
+    except Exception:
+        metrics.observe_extraction("unknown", f"{engine}-flat", time.perf_counter() - started, ok=False)
+        raise
+    metrics.observe_extraction(metrics.extractor_of(info), f"{engine}-flat", time.perf_counter() - started)
+    return info
+
+
+# Stream URLs must stay valid at least this long for a cached info dict to be reused
+INFO_EXPIRY_MARGIN_SECONDS = int(os.getenv("INFO_EXPIRY_MARGIN_SECONDS", "120"))
+_EXPIRY_QUERY_KEYS = ("expire", "expires", "Expires")
+
+
+def _info_expired(info: Dict[str, Any]) -> bool:
+    """Return True if any signed stream URL in *info* is about to expire."""
+    deadline = time.time() + INFO_EXPIRY_MARGIN_SECONDS
+    for fmt in info.get("formats") or [info]:
+        stream_url = fmt.get("url")
+        if not stream_url or "xpire" not in stream_url:
+            continue
+        query = parse_qs(urlparse(stream_url).query)
+        for key in _EXPIRY_QUERY_KEYS:
+            value = query.get(key)
+            if value and value[0].isdigit() and int(value[0]) < deadline:
+                return True
+    return False
+
+
+async def get_cached_info(url: str) -> Dict[str, Any] | None:
+    """Return the info dict kept from a recent preview of *url*, if still usable."""
+    key = normalize_url(url)
+    info = await info_cache.get(key)
+    if info is None:
+        return None
+    if _info_expired(info):
+        await info_cache.invalidate(key)
+        return None
+    return info
+
+
+async def _fetch_preview_uncached(url: str) -> Dict[str, Any]:
+    """Return metadata for the provided URL using the configured extraction engine."""
+    data = await extract_info(url)
+    # Keep the full info dict so a following download can skip re-extraction
+    await info_cache.set(normalize_url(url), data)
+    return build_preview(data, url)
+
+
+# Preview format mapping (build_preview)
+_PREVIEW_VIDEO_EXTS = frozenset({"mp4"})
+_PREVIEW_AUDIO_EXTS = frozenset({"m4a", "mp3", "wav", "flac", "aac", "ogg"})
+_PREVIEW_MAX_HEIGHT = 2160
+_RESOLUTION_HEIGHT_RE = re.compile(r"(\d+)[pP]")  # "1080p"
+_FIRST_NUMBER_RE = re.compile(r"(\d+)")
+
+
+def _preview_sort_key(item: Dict[str, Any]) -> tuple:
+    """MP4 video first, then other video, then audio; ascending resolution/bitrate within each."""
+    label = item["resolution"]
+    is_video = label.endswith("p") or label.isdigit()
+    m = _FIRST_NUMBER_RE.search(str(label))
+    return (0 if is_video and item["ext"] == "mp4" else 1 if is_video else 2, int(m.group(1)) if m else 0)
+
+
+def build_preview(data: Dict[str, Any], url: str) -> Dict[str, Any]:
+    """Map a raw yt-dlp info dict to the preview payload served to the frontend.
+
+    One pass over the formats keeps MP4s carrying both video and audio (up
+    to 2160p) and audio-only formats of common types, labels each with its
+    resolution or rounded bitrate, drops repeated ``ext``/label pairs and
+    orders the result with :func:`_preview_sort_key`.
+    """
+    mapped_formats: List[Dict[str, Any]] = []
     seen_keys: set[str] = set()
-    for fmt in filtered_formats:
+    for fmt in data.get("formats", []):
         ext = fmt.get("ext", "").lower()
-        # Determine quality/label field
-        if fmt.get("vcodec") == "none":  # audio-only
+        vcodec = fmt.get("vcodec")
+        if ext in _PREVIEW_VIDEO_EXTS:
+            if vcodec == "none" or fmt.get("acodec") == "none":
+                continue
+            height = fmt.get("height")
+            if height is None and fmt.get("resolution"):
+                # resolution might be like "1920x1080" or "1080p"
+                m = _RESOLUTION_HEIGHT_RE.search(fmt.get("resolution"))
+                if m:
+                    height = int(m.group(1))
+            if height is not None and height > _PREVIEW_MAX_HEIGHT:
+                continue
+        elif ext not in _PREVIEW_AUDIO_EXTS or vcodec != "none":
+            continue
+
+        if vcodec == "none":  # audio-only
             abr = fmt.get("abr") or fmt.get("tbr")
-            if abr:
-                abr_int = int(round(abr / 32) * 32)
-                quality_label = f"{abr_int}K"
-            else:
-                quality_label = "audio only"
+            quality_label = f"{int(round(abr / 32) * 32)}K" if abr else "audio only"
         else:
             quality_label = fmt.get("resolution") or fmt.get("height") or "video"
 
@@ -271,34 +313,15 @@ async def fetch_preview(url: str) -> Dict[str, Any]:
         if key in seen_keys:
             continue  # skip duplicate quality for same extension
         seen_keys.add(key)
-
         mapped_formats.append({
             "formatId": fmt.get("format_id", ""),
             "ext": ext,
             "resolution": quality_label,
-            "filesize": fmt.get("filesize", None)
+            "filesize": fmt.get("filesize", None),
         })
 
-    # Sort formats: Video (MP4 first) then audio, keeping ascending resolution/bitrate for user friendliness
-    import re  # ensure available inside nested function
-    def sort_key(item):
-        is_video = item["resolution"].endswith("p") or item["resolution"].isdigit()
-        if is_video:
-            # extract number before 'p'
-            m = re.search(r"(\d+)", str(item["resolution"]))
-            height = int(m.group(1)) if m else 0
-        else:
-            # audio bitrate like 128K
-            m = re.search(r"(\d+)", str(item["resolution"]))
-            height = int(m.group(1)) if m else 0
-        return (
-            0 if is_video and item["ext"] == "mp4" else 1 if is_video else 2,  # MP4 video first, other video, then audio
-            height
-        )
-
-    mapped_formats.sort(key=sort_key)
-
-    
+    # Stable: equal keys keep the order yt-dlp listed them in
+    mapped_formats.sort(key=_preview_sort_key)
     return {
         "id": data.get("id"),
         "url": url,
@@ -309,69 +332,249 @@ async def fetch_preview(url: str) -> Dict[str, Any]:
     }
 
 
-async def download_with_progress(url: str, format_id: str, output_path: str, progress_callback=None) -> str:
-    """Download video with progress tracking. Uses python yt_dlp for precise progress if available."""
-    try:
-        import yt_dlp  # type: ignore
-
-        # Build format string mapping similar to previous logic
-        if format_id.lower() == "mp4":
-            mapped_format = f"bestvideo[ext={format_id}]+bestaudio[ext=m4a]/best[ext={format_id}]/best"
-            final_format = mapped_format
-        elif format_id.lower() == "mp3":
-            final_format = "bestaudio"
-        else:
-            final_format = format_id
-
-        def _hook(d: dict):
-            if d.get("status") == "downloading":
-                total = d.get("total_bytes") or d.get("total_bytes_estimate")
-                downloaded = d.get("downloaded_bytes", 0)
-                if total:
-                    percent = downloaded / total * 100
-                    if progress_callback:
+def resolve_format(format_id: str) -> str:
+    """Map the frontend's format choice to a yt-dlp format selector."""
+    if format_id.lower() == "mp4":
+        return f"bestvideo[ext={format_id}]+bestaudio[ext=m4a]/best[ext={format_id}]/best"
+    if format_id.lower() == "mp3":
+        return "bestaudio"
+    return format_id
+
+
+async def download_with_progress(
+    url: str,
+    format_id: str,
+    output_path: str,
+    progress_callback=None,
+    info: Dict[str, Any] | None = None,
+    progress_hook=None,
+    nopart: bool = False,
+) -> str:
+    """Download video with progress tracking. Uses python yt_dlp for precise progress if available.
+
+    When *info* (or an info dict cached by a recent preview of *url*) is
+    available, yt-dlp starts from it via ``process_ie_result`` instead of
+    extracting the page again. A fresh extraction only happens when its stream
+    URLs have expired or the cached download fails.
+
+    *progress_callback* receives :class:`ProgressEvent` objects, coalesced to
+    ``PROGRESS_CALLBACK_MAX_PER_SECOND``; *progress_hook* receives the raw
+    yt-dlp progress dicts (library path only). With *nopart* yt-dlp writes straight to the final file instead of a
+    ``.part`` file, so it can be read while it grows.
+
+    Fragment concurrency, chunked ranges, retries and the optional external
+    downloader come from the :mod:`download_tuning` profile for the
+    extractor; its throughput is recorded per profile in :mod:`metrics`.
+    """
+    if info is None:
+        info = await get_cached_info(url)
+
+    coalescer = ProgressCoalescer(progress_callback) if progress_callback else None
+
+    with _download_metrics(info) as tracker:
+
+        def _on_event(event: ProgressEvent | None) -> None:
+            if event is not None and event.phase == "downloaded":
+                tracker["bytes"] += event.total_bytes or event.downloaded_bytes or 0
+            if coalescer is not None:
+                coalescer.push(event)
+
+        try:
+            import yt_dlp  # type: ignore
+
+            final_format = resolve_format(format_id)
+
+            def _hook(d: dict):
+                if d.get("status") == "finished" and d.get("info_dict"):
+                    tracker["extractor"] = metrics.extractor_of(d["info_dict"])
+                _on_event(parse_progress(d))
+
+            ydl_opts = {
+                "format": final_format,
+                "outtmpl": output_path,
+                "progress_hooks": [_hook] + ([progress_hook] if progress_hook else []),
+                "postprocessor_hooks": [_hook],
+                # Suppress additional output – we manage our own logging/progress
+                "noprogress": True,
+                "quiet": True,
+                # Keep the local mtime so TTL-based cleanup and caching see the download time
+                "updatetime": False,
+                "nopart": nopart,
+                **tracker["profile"].ydl_opts(),
+            }
+            if not validators.strict_covers_threads():
+                # Fragment threads would resolve outside strict_resolution()
+                ydl_opts["concurrent_fragment_downloads"] = 1
+
+            def _download() -> None:
+                # Connect only to validated/pinned, non-private addresses
+                with validators.strict_resolution(), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    if info is not None:
                         try:
-                            progress_callback(percent)
-                        except Exception:
-                            pass
-        ydl_opts = {
-            "format": final_format,
-            "outtmpl": output_path,
-            "progress_hooks": [_hook],
-            # Suppress additional output – we manage our own logging/progress
-            "noprogress": True,
-            "quiet": True,
-        }
-        # Run in thread executor to avoid blocking event loop
-        import asyncio, functools
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, lambda: yt_dlp.YoutubeDL(ydl_opts).download([url]))
-        return output_path
-    except ImportError:
-        # Fallback to CLI method
-        if format_id.lower() in {"mp4"}:
-            mapped_format = f"bestvideo[ext={format_id}]+bestaudio[ext=m4a]/best[ext={format_id}]/best"
-            format_id_arg = mapped_format
-        elif format_id.lower() == "mp3":
-            format_id_arg = "bestaudio"
-        else:
-            format_id_arg = format_id
-
-        cmd = [
-            "yt-dlp",
-            "-f",
-            format_id_arg,
-        ]
-
-        if format_id.lower() == "mp3":
-            cmd += ["-x", "--audio-format", "mp3"]
-
-        cmd += [
-            "-o",
-            output_path,
-            url,
-        ]
-        if progress_callback:
-            return await _run_cmd_with_progress(cmd, progress_callback)
-        else:
-            return await _run_cmd(cmd)
\ No newline at end of file
+                            ydl.process_ie_result(copy.deepcopy(info), download=True)
+                            return
+                        except yt_dlp.utils.DownloadError:
+                            pass  # stale stream URLs – extract again below
+                    ydl.download([url])
+
+            # Run in thread executor to avoid blocking event loop
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, _download)
+            if coalescer is not None:
+                coalescer.flush()
+            return output_path
+        except ImportError:
+            # Fallback to CLI method
+            format_id_arg = resolve_format(format_id)
+
+            cmd = [
+                *ytdlp_command(url),
+                "-f",
+                format_id_arg,
+            ]
+
+            if format_id.lower() == "mp3":
+                cmd += ["-x", "--audio-format", "mp3"]
+
+            if nopart:
+                cmd.append("--no-part")
+
+            cmd += tracker["profile"].cli_args()
+            cmd += [
+                "--no-mtime",
+                "-o",
+                output_path,
+            ]
+            with _info_json_file(info) as info_path:
+                # --load-info-json falls back to the webpage URL on its own when
+                # the stored stream URLs no longer work.
+                cmd += ["--load-info-json", info_path] if info_path else [url]
+                output = await _run_cmd_with_progress(cmd, _on_event)
+                if coalescer is not None:
+                    coalescer.flush()
+                return output
+
+
+@contextlib.contextmanager
+def _download_metrics(info: Dict[str, Any] | None) -> Iterator[Dict[str, Any]]:
+    """Record duration, outcome and bytes of one download in :mod:`metrics`.
+
+    ``tracker["profile"]`` is the :class:`download_tuning.TuningProfile` the
+    download should use.
+    """
+    extractor = metrics.extractor_of(info)
+    tracker: Dict[str, Any] = {
+        "bytes": 0,
+        "extractor": extractor,
+        "profile": download_tuning.profile_for(extractor, info),
+    }
+    start = time.perf_counter()
+    ok = False
+    try:
+        yield tracker
+        ok = True
+    finally:
+        metrics.observe_download(
+            tracker["extractor"], time.perf_counter() - start, tracker["bytes"], ok, tracker["profile"].name
+        )
+
+
+@contextlib.contextmanager
+def _info_json_file(info: Dict[str, Any] | None) -> Iterator[str | None]:
+    """Write *info* to a temporary ``.info.json`` file for ``--load-info-json``."""
+    if info is None:
+        yield None
+        return
+    with tempfile.NamedTemporaryFile("w", suffix=".info.json", delete=False, encoding="utf-8") as fh:
+        json.dump(info, fh)
+    try:
+        yield fh.name
+    finally:
+        Path(fh.name).unlink(missing_ok=True)
+
+
+# ---------------------------------------------------------------------------
+# Stream-through downloads (no local disk)
+# ---------------------------------------------------------------------------
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", str(256 * 1024)))
+
+
+def stream_format(format_id: str) -> str | None:
+    """Return a single-file format selector for *format_id*, or ``None``.
+
+    Streaming to stdout only works for formats yt-dlp can write without a
+    merge or post-processing step, so "mp4" is mapped to the best progressive
+    MP4 and "mp3" (needs conversion) or merge selectors are rejected.
+    """
+    fmt = format_id.lower()
+    if fmt == "mp4":
+        return "best[ext=mp4]/best"
+    if fmt == "mp3" or "+" in fmt:
+        return None
+    return format_id
+
+
+def stream_extension(format_id: str, info: Dict[str, Any] | None) -> str | None:
+    """Best guess of the streamed file's extension, for headers."""
+    if format_id.lower() == "mp4":
+        return "mp4"
+    for fmt in (info or {}).get("formats") or []:
+        if fmt.get("format_id") == format_id:
+            return fmt.get("ext")
+    return None
+
+
+async def stream_download(url: str, format_id: str, info: Dict[str, Any] | None = None) -> AsyncIterator[bytes]:
+    """Yield the media bytes of *url* as yt-dlp writes them to stdout.
+
+    The pipe is only read when the consumer asks for the next chunk, so a slow
+    client applies backpressure all the way to yt-dlp. The process is killed
+    if the consumer stops early. Raises ``ValueError`` for formats that need a
+    merge step and ``RuntimeError`` if yt-dlp fails before any data was sent.
+    """
+    selector = stream_format(format_id)
+    if selector is None:
+        raise ValueError(f"Format '{format_id}' needs merging or conversion and cannot be streamed")
+
+    with _info_json_file(info) as info_path:
+        cmd = [*ytdlp_command(url), "-f", selector, "--quiet", "--no-warnings", "--no-part", "-o", "-"]
+        cmd += ["--load-info-json", info_path] if info_path else [url]
+
+        if sys.platform == "win32":
+            # Same restriction as _run_cmd: avoid asyncio subprocesses on Windows
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            stderr_task = asyncio.ensure_future(asyncio.to_thread(process.stderr.read))
+            try:
+                while True:
+                    chunk = await asyncio.to_thread(process.stdout.read, STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+                returncode = await asyncio.to_thread(process.wait)
+            finally:
+                if process.poll() is None:
+                    process.kill()
+            if returncode != 0:
+                raise RuntimeError((await stderr_task).decode(errors="replace"))
+            return
+
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        # Drain stderr concurrently so a chatty process cannot block on it
+        stderr_task = asyncio.create_task(process.stderr.read())
+        try:
+            while True:
+                chunk = await process.stdout.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+            await process.wait()
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+        if process.returncode != 0:
+            raise RuntimeError((await stderr_task).decode(errors="replace"))
@@ -0,0 +1,108 @@
+"""Throughput benchmark: ``/download/file`` delivery before and after range support.
+
+Serves one synthetic file through two routes on a local uvicorn server:
+
+* ``/baseline`` – the previous implementation (plain ``FileResponse`` with
+  ``application/octet-stream``), and
+* ``/current`` – :func:`app.services.file_delivery.file_response`.
+
+and downloads it repeatedly from concurrent client threads.
+
+Usage (from the ``Xe-roux`` directory):
+
+    python -m benchmarks.bench_file_delivery --size-mb 256 --requests 16 --concurrency 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse
+
+from app.services.file_delivery import file_response
+
+
+def _build_app(path: Path) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/baseline")
+    async def baseline():
+        return FileResponse(path=path, filename=path.name, media_type="application/octet-stream")
+
+    @app.get("/current")
+    async def current(request: Request):
+        return file_response(request, path)
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _fetch(port: int, route: str) -> int:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    conn.request("GET", route)
+    response = conn.getresponse()
+    received = 0
+    while True:
+        chunk = response.read(1024 * 1024)
+        if not chunk:
+            break
+        received += len(chunk)
+    conn.close()
+    return received
+
+
+def _measure(port: int, route: str, requests: int, concurrency: int) -> dict:
+    _fetch(port, route)  # warm page cache and connection setup
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        total = sum(pool.map(lambda _: _fetch(port, route), range(requests)))
+    elapsed = time.perf_counter() - start
+    return {"route": route, "bytes": total, "seconds": round(elapsed, 3), "MBps": round(total / elapsed / 1e6, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=128)
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.mp4"
+        with path.open("wb") as fh:
+            block = os.urandom(1024 * 1024)
+            for _ in range(args.size_mb):
+                fh.write(block)
+
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(_build_app(path), port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+        results = [_measure(port, route, args.requests, args.concurrency) for route in ("/baseline", "/current")]
+        server.should_exit = True
+        thread.join()
+
+    print(json.dumps({"sizeMB": args.size_mb, "concurrency": args.concurrency, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Microbenchmarks and golden-output checks for the format-mapping and progress-parsing hot paths.
+
+Runs :func:`app.services.ytdlp.build_preview` over every info dict in
+``benchmarks/fixtures/info`` and :func:`app.services.progress.parse_progress_line`
+over every log in ``benchmarks/fixtures/progress`` (see
+:mod:`benchmarks.fixtures.generate`). Timings are reported per call like
+pytest-benchmark does (min/max/mean/stddev/median over ``--rounds`` rounds,
+each repeating the call enough times to last about ``--round-ms``).
+
+The outputs are compared with the recorded ones in
+``benchmarks/fixtures/golden``, so an optimisation of either path cannot
+change what the frontend receives unnoticed; the script exits non-zero on any
+difference. ``--update-golden`` records the current outputs instead (only do
+that for intended changes).
+
+Usage (from the ``Xe-roux`` directory):
+
+    python -m benchmarks.bench_hot_paths               # check + benchmark
+    python -m benchmarks.bench_hot_paths --check-only  # golden check, for CI
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import gzip
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.services.progress import parse_progress_line
+from app.services.ytdlp import build_preview
+
+_FIXTURES = Path(__file__).resolve().parent / "fixtures"
+_GOLDEN = _FIXTURES / "golden"
+_PAGE_URL = "https://example.com/watch"
+
+
+def _read(path: Path) -> str:
+    data = path.read_bytes()
+    return (gzip.decompress(data) if path.suffix == ".gz" else data).decode("utf-8")
+
+
+def _stem(path: Path) -> str:
+    return path.name.split(".")[0]
+
+
+def _cases() -> List[Tuple[str, Callable[[], Any]]]:
+    """Return ``(name, call)`` pairs; each call returns the JSON-able output to check."""
+    cases: List[Tuple[str, Callable[[], Any]]] = []
+    for path in sorted((_FIXTURES / "info").glob("*.json*")):
+        info = json.loads(_read(path))
+        cases.append((f"preview/{_stem(path)}", lambda info=info: build_preview(info, _PAGE_URL)))
+    for path in sorted((_FIXTURES / "progress").glob("*.log*")):
+        lines = _read(path).splitlines(keepends=True)
+
+        def parse(lines: List[str] = lines) -> List[Dict[str, Any] | None]:
+            return [dataclasses.asdict(e) if (e := parse_progress_line(line)) else None for line in lines]
+
+        cases.append((f"progress/{_stem(path)}", parse))
+    return cases
+
+
+def _timeit(call: Callable[[], Any], rounds: int, round_seconds: float) -> Dict[str, Any]:
+    # Calibrate how many calls make up one round
+    iterations = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            call()
+        if time.perf_counter() - started >= round_seconds / 4 or iterations >= 1 << 20:
+            break
+        iterations *= 2
+    iterations = max(1, int(iterations * round_seconds / max(time.perf_counter() - started, 1e-9)))
+
+    per_call: List[float] = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            call()
+        per_call.append((time.perf_counter() - started) / iterations)
+    us = lambda seconds: round(seconds * 1e6, 2)  # noqa: E731
+    mean = statistics.fmean(per_call)
+    return {
+        "rounds": rounds,
+        "iterations": iterations,
+        "minUs": us(min(per_call)),
+        "maxUs": us(max(per_call)),
+        "meanUs": us(mean),
+        "stddevUs": us(statistics.stdev(per_call)) if rounds > 1 else 0.0,
+        "medianUs": us(statistics.median(per_call)),
+        "ops": round(1 / mean, 1),
+    }
+
+
+def _golden_path(name: str) -> Path:
+    return _GOLDEN / f"{name}.json.gz"
+
+
+def _check(name: str, output: Any, update: bool) -> bool:
+    """Compare *output* with the recorded golden output; returns True when equal."""
+    path = _golden_path(name)
+    current = json.loads(json.dumps(output))
+    if update:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.GzipFile(path, "wb", mtime=0) as fh:
+            fh.write(json.dumps(current, indent=1).encode())
+        return True
+    if not path.exists():
+        print(f"{name}: no golden output (run with --update-golden)", file=sys.stderr)
+        return False
+    if json.loads(_read(path)) != current:
+        print(f"{name}: output differs from {path.relative_to(_FIXTURES.parent.parent)}", file=sys.stderr)
+        return False
+    return True
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=15)
+    parser.add_argument("--round-ms", type=float, default=50)
+    parser.add_argument("-k", "--filter", default="", help="only cases whose name contains this")
+    parser.add_argument("--check-only", action="store_true", help="skip timing")
+    parser.add_argument("--update-golden", action="store_true", help="record current outputs as golden")
+    parser.add_argument("--output", type=Path, help="also write the results JSON here")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {}
+    failed = []
+    for name, call in _cases():
+        if args.filter not in name:
+            continue
+        if not _check(name, call(), args.update_golden):
+            failed.append(name)
+        results[name] = {"golden": name not in failed}
+        if not args.check_only:
+            results[name].update(_timeit(call, args.rounds, args.round_ms / 1000))
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    if failed:
+        print(f"golden output mismatch: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
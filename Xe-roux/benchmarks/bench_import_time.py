@@ -0,0 +1,110 @@
+"""Cold-start benchmark: import time of the serverless entrypoint (``api.index``).
+
+Runs ``python -X importtime -c "import api.index"`` in fresh interpreters and
+reports the median total import time, the time spent in this repo's own
+modules (``app``, ``utils``, ``api``) and the slowest imports. Exits non-zero
+when the total exceeds ``--budget-ms``, the repo's own modules exceed
+``--app-budget-ms``, or a backend that must load lazily (Celery, boto3, Redis,
+yt-dlp) is imported on the boot path, so it can run in CI.
+
+Usage (from the ``Xe-roux`` directory):
+
+    python -m benchmarks.bench_import_time --runs 5 --budget-ms 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+_ROOT = Path(__file__).resolve().parent.parent
+# "import time:       self [us] |  cumulative |   module" (indent = nesting)
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$")
+_OWN_PACKAGES = ("app", "utils", "api")
+# Heavy backends that must only be imported on first use
+_FORBIDDEN = ("celery", "kombu", "boto3", "botocore", "redis", "yt_dlp")
+
+
+def _import_once(module: str) -> Tuple[Dict[str, Tuple[int, int]], List[str]]:
+    """Import *module* in a fresh interpreter.
+
+    Returns ``({module: (self_us, cumulative_us)}, loaded_modules)``; the
+    importtime log also lists optional imports that failed, ``sys.modules``
+    only the ones that loaded.
+    """
+    env = {**os.environ, "PYTHONPATH": str(_ROOT)}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import json, sys, {module}; print(json.dumps(sorted(sys.modules)))"],
+        cwd=_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    timings: Dict[str, Tuple[int, int]] = {}
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            timings[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return timings, json.loads(proc.stdout.splitlines()[-1])
+
+
+def _is_own(name: str) -> bool:
+    return name.split(".")[0] in _OWN_PACKAGES
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="api.index")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--budget-ms", type=float, default=1000, help="max median total import time")
+    parser.add_argument("--app-budget-ms", type=float, default=150, help="max median self time of app/utils/api")
+    args = parser.parse_args()
+
+    results = [_import_once(args.module) for _ in range(args.runs)]
+    runs = [timings for timings, _ in results]
+    loaded = set().union(*(modules for _, modules in results))
+
+    def median_ms(values: List[int]) -> float:
+        return round(statistics.median(values) / 1000, 1)
+
+    total_ms = median_ms([run.get(args.module, (0, 0))[1] for run in runs])
+    own_ms = median_ms([sum(t[0] for name, t in run.items() if _is_own(name)) for run in runs])
+    names = set().union(*runs)
+    cumulative = {name: median_ms([run[name][1] for run in runs if name in run]) for name in names}
+    slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[: args.top]
+    forbidden = sorted({name.split(".")[0] for name in loaded} & set(_FORBIDDEN))
+
+    result = {
+        "module": args.module,
+        "runs": args.runs,
+        "totalMs": total_ms,
+        "budgetMs": args.budget_ms,
+        "appSelfMs": own_ms,
+        "appBudgetMs": args.app_budget_ms,
+        "modules": len(loaded),
+        "slowest": [{"module": name, "cumulativeMs": ms} for name, ms in slowest],
+        "forbiddenImported": forbidden,
+    }
+    print(json.dumps(result, indent=2))
+    if forbidden:
+        print(f"boot path imports lazy-only backends: {', '.join(forbidden)}", file=sys.stderr)
+        return 1
+    if total_ms > args.budget_ms or own_ms > args.app_budget_ms:
+        print("cold start exceeds its import-time budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
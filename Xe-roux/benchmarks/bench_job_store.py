@@ -0,0 +1,87 @@
+"""Memory benchmark: bytes retained per finished job in the in-process job store.
+
+Fills a :class:`app.services.job_store.JobStore` with finished jobs and
+compares the traced allocation per job against the previous layout (one status
+dict per job). Exits non-zero when a ``JobRecord`` costs more than
+``--budget-bytes`` or the store grows past ``max_jobs``, so it can run in CI.
+
+Usage (from the ``Xe-roux`` directory):
+
+    python -m benchmarks.bench_job_store --jobs 50000 --budget-bytes 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tracemalloc
+import uuid
+from typing import Callable, List
+
+from app.services.job_store import JobStore
+
+_PATH = "/tmp/0123456789abcdef0123456789abcdef.mp4"
+
+
+def _measure(fill: Callable[[List[str]], object], ids: List[str]) -> float:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    holder = fill(ids)  # noqa: F841 - keep the structure alive while measuring
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return retained / len(ids)
+
+
+def _fill_dicts(ids: List[str]) -> dict:
+    status = {}
+    for download_id in ids:
+        status[download_id] = {
+            "status": "finished",
+            "filePath": _PATH,
+            "fileUrl": None,
+            "progress": 100.0,
+            "progressPercent": 100.0,
+        }
+    return status
+
+
+def _fill_store(ids: List[str]) -> JobStore:
+    store = JobStore(retention_seconds=3600, max_jobs=len(ids))
+    for download_id in ids:
+        store.set(download_id, "finished", progress=100.0, file_path=_PATH)
+    return store
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=20000)
+    parser.add_argument("--budget-bytes", type=int, default=200, help="max bytes per retained job")
+    args = parser.parse_args()
+
+    ids = [str(uuid.uuid4()) for _ in range(args.jobs)]
+    dict_bytes = _measure(_fill_dicts, ids)
+    store_bytes = _measure(_fill_store, ids)
+
+    capped = JobStore(retention_seconds=3600, max_jobs=args.jobs // 10)
+    for download_id in ids:
+        capped.set(download_id, "finished", progress=100.0, file_path=_PATH)
+
+    result = {
+        "jobs": args.jobs,
+        "bytesPerJobDict": round(dict_bytes, 1),
+        "bytesPerJobStore": round(store_bytes, 1),
+        "budgetBytes": args.budget_bytes,
+        "cappedStoreSize": len(capped),
+        "cappedStoreLimit": capped.max_jobs,
+    }
+    print(json.dumps(result, indent=2))
+    if store_bytes > args.budget_bytes or len(capped) > capped.max_jobs:
+        print("job store exceeds its memory or size budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
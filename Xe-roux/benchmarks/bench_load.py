@@ -0,0 +1,345 @@
+"""End-to-end load test of the HTTP API, fully offline.
+
+Starts :mod:`benchmarks.media_server`, then the app under uvicorn (and, in
+``celery`` mode, a Celery worker) with ``benchmarks/fakes`` first on ``PATH``
+and ``PYTHONPATH``, so the ``yt-dlp`` executable and the ``yt_dlp`` module are
+the fakes serving recorded info dicts from ``benchmarks/fixtures/info`` and
+fetching media from the local server. Then it drives, at ``--concurrency``:
+
+* ``preview`` – ``POST /preview/`` with distinct URLs (cold extraction),
+* ``previewCached`` – ``POST /preview/`` of one URL (cache hits),
+* ``download`` – ``POST /download/`` of the previewed URLs (enqueue latency),
+* ``downloadComplete`` – enqueue until ``finished`` per download,
+* ``status`` – ``GET /download/status/{id}``,
+* ``file`` – ``GET /download/file/{id}`` with the whole body read.
+
+Each scenario reports p50/p95/p99/mean latency, requests/s and MB/s. The
+results are printed and saved as JSON (``--output``); ``--compare`` prints the
+change against an earlier result file. Celery mode needs a reachable Redis
+(``REDIS_URL``) and is reported as skipped otherwise.
+
+Usage (from the ``Xe-roux`` directory):
+
+    python -m benchmarks.bench_load --mode both --requests 200 --concurrency 16 \\
+        --media-mb 8 --bandwidth-mbps 200 --latency-ms 10 --extract-ms 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+from benchmarks.media_server import MediaServer
+
+_ROOT = Path(__file__).resolve().parent.parent
+_FAKES = Path(__file__).resolve().parent / "fakes"
+_FIXTURES = Path(__file__).resolve().parent / "fixtures" / "info"
+_RESULTS = Path(__file__).resolve().parent / "results"
+_MB = 1_000_000
+_POLL_SECONDS = 0.1
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, min(len(ordered), round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def _summary(latencies: List[float], errors: int, elapsed: float, nbytes: int = 0) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 2)  # noqa: E731
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50Ms": ms(_percentile(ordered, 50)),
+        "p95Ms": ms(_percentile(ordered, 95)),
+        "p99Ms": ms(_percentile(ordered, 99)),
+        "meanMs": ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+        "requestsPerSec": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mbPerSec": round(nbytes / _MB / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+async def _drive(count: int, concurrency: int, call: Callable[[int], Awaitable[int]]) -> Dict[str, Any]:
+    """Run ``call(i)`` for ``i < count`` on *concurrency* workers; *call* returns bytes received."""
+    latencies: List[float] = []
+    errors = 0
+    nbytes = 0
+    next_index = 0
+
+    async def _worker() -> None:
+        nonlocal errors, nbytes, next_index
+        while next_index < count:
+            index, next_index = next_index, next_index + 1
+            started = time.perf_counter()
+            try:
+                nbytes += await call(index)
+            except Exception:  # noqa: BLE001 - counted, the run goes on
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker() for _ in range(max(1, min(concurrency, count)))))
+    return _summary(latencies, errors, time.perf_counter() - started, nbytes)
+
+
+def _checked(response: "httpx.Response") -> "httpx.Response":
+    response.raise_for_status()
+    return response
+
+
+async def _run_scenarios(base: str, media: str, args: argparse.Namespace, celery: bool) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    pages = [f"{media}/watch/{args.fixture}?n={i}" for i in range(args.requests)]
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base, timeout=args.timeout, limits=limits) as client:
+
+        async def preview(i: int) -> int:
+            return len(_checked(await client.post("/preview/", json={"url": pages[i]})).content)
+
+        results["preview"] = await _drive(args.requests, args.concurrency, preview)
+
+        async def preview_cached(i: int) -> int:
+            return len(_checked(await client.post("/preview/", json={"url": pages[0]})).content)
+
+        results["previewCached"] = await _drive(args.requests, args.concurrency, preview_cached)
+
+        download_ids: List[str] = []
+        enqueued_at: Dict[str, float] = {}
+
+        async def download(i: int) -> int:
+            response = _checked(await client.post("/download/", json={"url": pages[i], "format": args.format}))
+            payload = response.json()
+            if celery == ("note" in payload):
+                raise RuntimeError(f"download went to the wrong backend: {payload}")
+            download_ids.append(payload["downloadId"])
+            enqueued_at[payload["downloadId"]] = time.perf_counter()
+            return len(response.content)
+
+        results["download"] = await _drive(args.requests, args.concurrency, download)
+
+        # Completion: poll every download until it settles
+        done: Dict[str, float] = {}
+        failed = 0
+        deadline = time.perf_counter() + args.timeout
+        pending = set(download_ids)
+        while pending and time.perf_counter() < deadline:
+            for download_id in list(pending):
+                state = (await client.get(f"/download/status/{download_id}")).json().get("state")
+                if state == "SUCCESS":
+                    done[download_id] = time.perf_counter() - enqueued_at[download_id]
+                    pending.discard(download_id)
+                elif state in {"FAILURE", "REVOKED"}:
+                    failed += 1
+                    pending.discard(download_id)
+            await asyncio.sleep(_POLL_SECONDS)
+        # Throughput over the window from the first enqueue to the last completion
+        window = max((enqueued_at[d] + t for d, t in done.items()), default=0.0) - min(enqueued_at.values(), default=0.0)
+        finished = list(done)
+        sizes = [
+            int((await client.head(f"/download/file/{d}")).headers.get("content-length", 0)) for d in finished
+        ]
+        results["downloadComplete"] = _summary(list(done.values()), failed + len(pending), window, sum(sizes))
+        if not finished:
+            return results
+
+        async def status(i: int) -> int:
+            return len(_checked(await client.get(f"/download/status/{finished[i % len(finished)]}")).content)
+
+        results["status"] = await _drive(args.requests, args.concurrency, status)
+
+        async def file(i: int) -> int:
+            nbytes = 0
+            async with client.stream("GET", f"/download/file/{finished[i % len(finished)]}") as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_raw():
+                    nbytes += len(chunk)
+            return nbytes
+
+        results["file"] = await _drive(args.requests, args.concurrency, file)
+    return results
+
+
+def _redis_reachable(url: str) -> bool:
+    try:
+        import redis
+
+        return bool(redis.from_url(url, socket_connect_timeout=1).ping())
+    except Exception:  # noqa: BLE001
+        return False
+
+
+def _wait_http(url: str, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up in {timeout}s")
+
+
+def _wait_celery(env: Dict[str, str], timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    cmd = [sys.executable, "-m", "celery", "-A", "app.celery_worker.celery_app", "inspect", "ping", "-t", "1"]
+    while time.monotonic() < deadline:
+        if subprocess.run(cmd, cwd=_ROOT, env=env, capture_output=True, check=False).returncode == 0:
+            return
+        time.sleep(1)
+    raise RuntimeError(f"Celery worker did not answer in {timeout}s")
+
+
+def _stop(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _run_mode(mode: str, media: MediaServer, args: argparse.Namespace) -> Dict[str, Any]:
+    celery = mode == "celery"
+    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    if celery and not _redis_reachable(redis_url):
+        return {"skipped": f"Redis unreachable at {redis_url}"}
+
+    workdir = Path(tempfile.mkdtemp(prefix=f"clipx-load-{mode}-"))
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PATH": f"{_FAKES}{os.pathsep}{os.environ.get('PATH', '')}",
+        "PYTHONPATH": os.pathsep.join([str(_FAKES), str(_ROOT)]),
+        "FAKE_YTDLP_FIXTURES": str(_FIXTURES),
+        "FAKE_YTDLP_MEDIA_URL": media.url,
+        "FAKE_YTDLP_MEDIA_BYTES": str(int(args.media_mb * _MB)),
+        "FAKE_YTDLP_EXTRACT_MS": str(args.extract_ms),
+        "YTDLP_ENGINE": args.engine,
+        "DOWNLOAD_DIR": str(workdir),
+        "CELERY_ENABLED": "1" if celery else "0",
+        "SSRF_ALLOWED_HOSTS": "localhost",
+        "RATE_LIMIT_ENABLED": "0",
+        "CACHE_REDIS_ENABLED": "1" if celery else "0",
+        "ENABLE_S3_UPLOAD": "0",
+        # Several uvicorn workers only see each other's in-process jobs through SQLite
+        "JOB_STORE_BACKEND": "sqlite" if args.workers > 1 else os.getenv("JOB_STORE_BACKEND", "memory"),
+    }
+    processes: List[subprocess.Popen] = []
+    log = (workdir / "server.log").open("wb")
+    try:
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning",
+             "--workers", str(args.workers)],
+            cwd=_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+        ))
+        if celery:
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "celery", "-A", "app.celery_worker.celery_app", "worker",
+                 "--loglevel", "WARNING", "--concurrency", str(args.celery_concurrency),
+                 "--without-gossip", "--without-mingle"],
+                cwd=_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+            ))
+        base = f"http://127.0.0.1:{port}"
+        _wait_http(f"{base}/healthz", processes[0])
+        if celery:
+            _wait_celery(env)
+        return asyncio.run(_run_scenarios(base, media.url, args, celery))
+    except Exception as exc:  # noqa: BLE001 - report and keep the other mode's results
+        log.flush()
+        tail = (workdir / "server.log").read_text(errors="replace")[-2000:]
+        return {"error": str(exc), "log": tail}
+    finally:
+        for process in processes:
+            _stop(process)
+        log.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _compare(current: Dict[str, Any], baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text())
+    print(f"Change against {baseline_path}:")
+    for mode, scenarios in current["modes"].items():
+        for name, stats in scenarios.items():
+            before = baseline.get("modes", {}).get(mode, {}).get(name)
+            if not isinstance(stats, dict) or not isinstance(before, dict) or "p95Ms" not in stats:
+                continue
+            p95 = (stats["p95Ms"] / before["p95Ms"] - 1) * 100 if before.get("p95Ms") else 0.0
+            rps = (stats["requestsPerSec"] / before["requestsPerSec"] - 1) * 100 if before.get("requestsPerSec") else 0.0
+            print(f"  {mode:10} {name:17} p95 {p95:+6.1f}%   req/s {rps:+6.1f}%")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["inprocess", "celery", "both"], default="inprocess")
+    parser.add_argument("--engine", choices=["cli", "pool"], default="cli", help="YTDLP_ENGINE of the app")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--celery-concurrency", type=int, default=4)
+    parser.add_argument("--fixture", default="video", help="info dict in benchmarks/fixtures/info")
+    parser.add_argument("--format", default="best")
+    parser.add_argument("--media-mb", type=float, default=4, help="size of every media file")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0, help="media server, per connection")
+    parser.add_argument("--latency-ms", type=float, default=0, help="media server, per response")
+    parser.add_argument("--extract-ms", type=float, default=0, help="simulated extraction time of the fakes")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", type=Path, help="result file (default: benchmarks/results/load-<time>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier result file to compare against")
+    args = parser.parse_args()
+    if not HTTPX_AVAILABLE:
+        print("httpx is required: pip install httpx", file=sys.stderr)
+        return 2
+
+    modes = ["inprocess", "celery"] if args.mode == "both" else [args.mode]
+    media = MediaServer(bandwidth_mbps=args.bandwidth_mbps, latency_ms=args.latency_ms).start()
+    try:
+        result = {
+            "startedAt": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+            "modes": {mode: _run_mode(mode, media, args) for mode in modes},
+        }
+    finally:
+        media.stop()
+
+    output = args.output or _RESULTS / f"load-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(json.dumps(result, indent=2))
+    print(f"Saved to {output}", file=sys.stderr)
+    if args.compare:
+        _compare(result, args.compare)
+    failed = any("error" in scenarios for scenarios in result["modes"].values())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+"""Offline stand-in for :mod:`yt_dlp`, used by the load-test benchmarks.
+
+Extraction returns a recorded info dict from ``FAKE_YTDLP_FIXTURES`` (the
+``.json`` or ``.json.gz`` fixture named like the last path segment of the URL, else
+``FAKE_YTDLP_DEFAULT_FIXTURE``) after sleeping ``FAKE_YTDLP_EXTRACT_MS``. The
+``__MEDIA__`` placeholder in its stream URLs is replaced with
+``FAKE_YTDLP_MEDIA_URL`` (see :mod:`benchmarks.media_server`), so downloads
+really fetch bytes over HTTP and write them to disk, reporting progress
+through the same hooks, ``--progress-template`` lines and ``.part`` files as
+yt-dlp. ``FAKE_YTDLP_MEDIA_BYTES`` overrides every format's size.
+
+Only the surface the app uses is implemented: ``YoutubeDL`` (``extract_info``,
+``process_ie_result``, ``download``, ``sanitize_info``), ``utils.DownloadError``
+and, via :func:`main`, the CLI options the app passes to the ``yt-dlp``
+executable in ``benchmarks/fakes``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+from urllib.parse import urlparse
+
+from . import utils
+from .utils import DownloadError
+
+__all__ = ["DownloadError", "YoutubeDL", "main", "utils"]
+
+_FIXTURES = Path(os.getenv("FAKE_YTDLP_FIXTURES", Path(__file__).resolve().parents[2] / "fixtures" / "info"))
+_DEFAULT_FIXTURE = os.getenv("FAKE_YTDLP_DEFAULT_FIXTURE", "video")
+_MEDIA_URL = os.getenv("FAKE_YTDLP_MEDIA_URL", "http://localhost:8766").rstrip("/")
+_MEDIA_BYTES = int(os.getenv("FAKE_YTDLP_MEDIA_BYTES", "0"))
+_EXTRACT_SECONDS = float(os.getenv("FAKE_YTDLP_EXTRACT_MS", "0")) / 1000
+_CHUNK_SIZE = 64 * 1024
+# Selector terms like "bestvideo[ext=mp4]", "best" or a format id
+_TERM_RE = re.compile(r"^(?P<name>[\w-]+)(?P<filters>(\[[^\]]+\])*)$")
+
+
+class _Template(dict):
+    def __missing__(self, key: str) -> str:
+        return "NA"
+
+
+def _read_fixture(name: str) -> str | None:
+    path = _FIXTURES / f"{name}.json"
+    if path.exists():
+        return path.read_text(encoding="utf-8")
+    if path.with_suffix(".json.gz").exists():
+        return gzip.decompress(path.with_suffix(".json.gz").read_bytes()).decode("utf-8")
+    return None
+
+
+def _load_info(url: str) -> Dict[str, Any]:
+    name = Path(urlparse(url).path).stem or _DEFAULT_FIXTURE
+    raw = _read_fixture(name) or _read_fixture(_DEFAULT_FIXTURE)
+    if raw is None:
+        raise DownloadError(f"ERROR: no fixture for {url} in {_FIXTURES}")
+    raw = raw.replace("__MEDIA__", _MEDIA_URL)
+    info = json.loads(raw)
+    if _EXTRACT_SECONDS:
+        time.sleep(_EXTRACT_SECONDS)
+    # One id per URL so distinct URLs never share output files
+    info["id"] = f"{info.get('id', name)}-{hashlib.sha1(url.encode()).hexdigest()[:8]}"
+    info.setdefault("webpage_url", url)
+    info["original_url"] = url
+    if _MEDIA_BYTES:
+        for fmt in info.get("formats") or []:
+            if "bytes=" in fmt.get("url", ""):
+                fmt["url"] = re.sub(r"bytes=\d+", f"bytes={_MEDIA_BYTES}", fmt["url"])
+                fmt["filesize"] = _MEDIA_BYTES
+    return info
+
+
+def _has_video(fmt: Dict[str, Any]) -> bool:
+    return fmt.get("vcodec", "none") != "none"
+
+
+def _has_audio(fmt: Dict[str, Any]) -> bool:
+    return fmt.get("acodec", "none") != "none"
+
+
+def _pick(formats: List[Dict[str, Any]], term: str) -> Dict[str, Any] | None:
+    match = _TERM_RE.match(term)
+    if not match:
+        return None
+    name = match.group("name")
+    candidates = [f for f in formats if f.get("protocol") != "mhtml"]
+    for key, value in re.findall(r"\[(\w+)=([^\]]+)\]", match.group("filters") or ""):
+        candidates = [f for f in candidates if str(f.get(key)) == value]
+    if name in {"best", "worst", "b", "w"}:
+        candidates = [f for f in candidates if _has_video(f) and _has_audio(f)]
+    elif name in {"bestvideo", "bv"}:
+        candidates = [f for f in candidates if _has_video(f) and not _has_audio(f)]
+    elif name in {"bestaudio", "ba"}:
+        candidates = [f for f in candidates if _has_audio(f) and not _has_video(f)]
+    else:
+        candidates = [f for f in candidates if f.get("format_id") == name]
+    if not candidates:
+        return None
+    ranked = sorted(candidates, key=lambda f: (f.get("height") or 0, f.get("tbr") or 0))
+    return ranked[0] if name in {"worst", "w"} else ranked[-1]
+
+
+def _select(info: Dict[str, Any], selector: str) -> List[Dict[str, Any]]:
+    """Return the formats chosen by a (simplified) yt-dlp format selector."""
+    formats = info.get("formats") or [info]
+    for alternative in selector.split("/"):
+        picked = [_pick(formats, term.strip()) for term in alternative.split("+")]
+        if all(picked):
+            return picked  # type: ignore[return-value]
+    raise DownloadError(f"ERROR: [{info.get('extractor', 'generic')}] {info.get('id')}: Requested format is not available")
+
+
+def _fetch(fmt: Dict[str, Any], path: Path, report: Callable[[Dict[str, Any]], None]) -> int:
+    request = urllib.request.Request(fmt["url"], headers=fmt.get("http_headers") or {})
+    started = time.monotonic()
+    downloaded = 0
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response, path.open("wb") as out:
+            total = int(response.headers.get("Content-Length") or 0) or None
+            while True:
+                chunk = response.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+                downloaded += len(chunk)
+                elapsed = max(time.monotonic() - started, 1e-6)
+                speed = downloaded / elapsed
+                report({
+                    "status": "downloading",
+                    "downloaded_bytes": downloaded,
+                    "total_bytes": total,
+                    "speed": speed,
+                    "eta": int((total - downloaded) / speed) if total else None,
+                    "elapsed": elapsed,
+                    "filename": str(path),
+                })
+    except OSError as exc:
+        raise DownloadError(f"ERROR: unable to download video data: {exc}") from exc
+    report({
+        "status": "finished",
+        "downloaded_bytes": downloaded,
+        "total_bytes": downloaded,
+        "elapsed": time.monotonic() - started,
+        "filename": str(path),
+    })
+    return downloaded
+
+
+def _output_path(template: Any, info: Dict[str, Any], ext: str) -> str:
+    if isinstance(template, dict):
+        template = template.get("default", "%(title)s [%(id)s].%(ext)s")
+    return (template or "%(title)s [%(id)s].%(ext)s") % _Template({**info, "ext": ext})
+
+
+def _download(
+    info: Dict[str, Any],
+    params: Dict[str, Any],
+    on_progress: Callable[[Dict[str, Any]], None],
+    on_postprocess: Callable[[Dict[str, Any]], None],
+) -> str:
+    """Fetch the selected format(s) of *info* and return the final file path."""
+    chosen = _select(info, params.get("format") or "best")
+    ext = "mp4" if len(chosen) > 1 else chosen[0].get("ext", "mp4")
+    final = _output_path(params.get("outtmpl"), info, ext)
+    if final == "-":
+        raise DownloadError("ERROR: writing to stdout is only supported by the CLI")
+    final_path = Path(final)
+    final_path.parent.mkdir(parents=True, exist_ok=True)
+    nopart = params.get("nopart", False)
+
+    parts: List[Path] = []
+    for fmt in chosen:
+        target = final_path if len(chosen) == 1 else final_path.with_suffix(f".f{fmt['format_id']}.{fmt.get('ext')}")
+        temp = target if nopart else target.with_name(target.name + ".part")
+        _fetch(fmt, temp, lambda d, fmt=fmt: on_progress({**d, "info_dict": {**info, **fmt}}))
+        if temp != target:
+            temp.replace(target)
+        parts.append(target)
+
+    if len(parts) > 1:
+        # "Merge" by concatenation: the bytes only need to land on disk
+        hook = {"postprocessor": "Merger", "info_dict": info}
+        on_postprocess({**hook, "status": "started"})
+        with final_path.open("wb") as out:
+            for part in parts:
+                with part.open("rb") as src:
+                    while chunk := src.read(1024 * 1024):
+                        out.write(chunk)
+                part.unlink()
+        on_postprocess({**hook, "status": "finished"})
+    return str(final_path)
+
+
+class YoutubeDL:
+    """The subset of ``yt_dlp.YoutubeDL`` used by the app."""
+
+    def __init__(self, params: Dict[str, Any] | None = None) -> None:
+        self.params = dict(params or {})
+
+    def __enter__(self) -> "YoutubeDL":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+    def _hooks(self, key: str) -> Callable[[Dict[str, Any]], None]:
+        def _call(d: Dict[str, Any]) -> None:
+            for hook in self.params.get(key) or []:
+                hook(d)
+
+        return _call
+
+    def extract_info(self, url: str, download: bool = True, **_: Any) -> Dict[str, Any]:
+        info = _load_info(url)
+        return self.process_ie_result(info, download=download)
+
+    def process_ie_result(self, ie_result: Dict[str, Any], download: bool = True, **_: Any) -> Dict[str, Any]:
+        if download:
+            ie_result["filepath"] = _download(
+                ie_result, self.params, self._hooks("progress_hooks"), self._hooks("postprocessor_hooks")
+            )
+        return ie_result
+
+    def download(self, url_list: List[str]) -> int:
+        for url in url_list:
+            self.extract_info(url, download=True)
+        return 0
+
+    @staticmethod
+    def sanitize_info(info: Dict[str, Any], remove_private_keys: bool = False) -> Dict[str, Any]:
+        return json.loads(json.dumps(info, default=str))
+
+
+# ---------------------------------------------------------------------------
+# Command line (``benchmarks/fakes/yt-dlp``)
+# ---------------------------------------------------------------------------
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="yt-dlp", add_help=False, allow_abbrev=False)
+    parser.add_argument("url", nargs="?")
+    parser.add_argument("-f", "--format", default="best")
+    parser.add_argument("-o", "--output")
+    parser.add_argument("-j", "--dump-json", action="store_true")
+    parser.add_argument("-J", "--dump-single-json", action="store_true")
+    parser.add_argument("--load-info-json")
+    parser.add_argument("--progress-template", action="append", default=[])
+    parser.add_argument("--progress", "--newline", action="store_true")
+    parser.add_argument("--no-part", action="store_true")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    return parser
+
+
+def _emit_progress(templates: List[str], kind: str) -> Callable[[Dict[str, Any]], None]:
+    template = next((t.split(":", 1)[1] for t in templates if t.startswith(f"{kind}:")), None)
+
+    def _emit(d: Dict[str, Any]) -> None:
+        if template is not None:
+            progress = {k: v for k, v in d.items() if k != "info_dict"}
+            print(template.replace("%(progress)j", json.dumps(progress)), flush=True)
+
+    return _emit
+
+
+def _stream(info: Dict[str, Any], selector: str) -> None:
+    fmt = _select(info, selector)[0]
+    try:
+        with urllib.request.urlopen(fmt["url"], timeout=60) as response:
+            while chunk := response.read(_CHUNK_SIZE):
+                sys.stdout.buffer.write(chunk)
+    except OSError as exc:
+        raise DownloadError(f"ERROR: unable to download video data: {exc}") from exc
+    sys.stdout.buffer.flush()
+
+
+def main(argv: List[str] | None = None) -> None:
+    # Unknown options (--no-mtime, --newline, --playlist-items, ...) are accepted and ignored
+    args, _ = _parser().parse_known_args(argv)
+    try:
+        if args.load_info_json:
+            info = json.loads(Path(args.load_info_json).read_text(encoding="utf-8"))
+        elif args.url:
+            info = _load_info(args.url)
+        else:
+            raise DownloadError("ERROR: You must provide at least one URL.")
+        if args.dump_json or args.dump_single_json:
+            print(json.dumps(info))
+        elif args.output == "-":
+            _stream(info, args.format)
+        else:
+            params = {"format": args.format, "outtmpl": args.output, "nopart": args.no_part}
+            _download(
+                info,
+                params,
+                _emit_progress(args.progress_template, "download"),
+                _emit_progress(args.progress_template, "postprocess"),
+            )
+    except DownloadError as exc:
+        print(str(exc), file=sys.stderr)
+        sys.exit(1)
+    sys.exit(0)
+
@@ -0,0 +1,5 @@
+"""Exceptions of the fake :mod:`yt_dlp` (see the package docstring)."""
+
+
+class DownloadError(Exception):
+    """Raised when extraction or download fails, like ``yt_dlp.utils.DownloadError``."""
@@ -0,0 +1,249 @@
+"""Regenerate the synthetic fixture corpus used by the hot-path benchmarks.
+
+Writes real-world-sized yt-dlp info dicts to ``info/`` and yt-dlp CLI output
+logs with ``--progress-template`` lines to ``progress/``, both gzipped.
+The shapes follow recorded yt-dlp output (field names, codecs, protocols,
+fragment lists, progress dict keys); the contents are generated from a fixed
+seed so the corpus is reproducible:
+
+* ``info/youtube_multiaudio`` – ~125 formats: DASH video in three codecs and
+  audio tracks in a dozen languages plus DRC variants,
+* ``info/dash_manifest`` – ~170 ``http_dash_segments`` representations with
+  long fragment lists,
+* ``info/hls_variants`` – HLS and progressive renditions with
+  ``1080p``-style resolutions and no ``height`` (one above the 2160p cap),
+* ``progress/http_download.log.gz`` – one large progressive download,
+* ``progress/dash_fragments.log.gz`` – fragment-by-fragment DASH video + audio
+  download followed by the merger.
+
+Usage (from the ``Xe-roux`` directory):
+
+    python -m benchmarks.fixtures.generate
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, List
+
+_HERE = Path(__file__).resolve().parent
+_MEDIA = "__MEDIA__/media"
+_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-us,en;q=0.5",
+    "Sec-Fetch-Mode": "navigate",
+}
+_LADDER = [(144, 256), (240, 426), (360, 640), (480, 854), (720, 1280), (1080, 1920), (1440, 2560), (2160, 3840), (4320, 7680)]
+_LANGUAGES = ["en", "es", "fr", "de", "it", "pt", "ru", "ja", "ko", "hi", "ar", "id"]
+
+
+def _write_gzip(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # mtime=0 keeps the archive byte-identical between runs
+    with gzip.GzipFile(path, "wb", mtime=0) as fh:
+        fh.write(data)
+
+
+def _write_info(name: str, info: Dict[str, Any]) -> None:
+    _write_gzip(_HERE / "info" / f"{name}.json.gz", json.dumps(info, separators=(",", ":")).encode())
+
+
+def _write_log(name: str, lines: List[str]) -> None:
+    _write_gzip(_HERE / "progress" / f"{name}.log.gz", ("\n".join(lines) + "\n").encode())
+
+
+def _base(video_id: str, title: str, extractor: str, duration: int) -> Dict[str, Any]:
+    return {
+        "id": video_id,
+        "title": title,
+        "thumbnail": f"https://i.example.com/{video_id}/maxresdefault.jpg",
+        "thumbnails": [{"url": f"https://i.example.com/{video_id}/{i}.jpg", "id": str(i), "preference": i - 40} for i in range(40)],
+        "duration": duration,
+        "webpage_url": f"__MEDIA__/watch/{video_id}",
+        "extractor": extractor.lower(),
+        "extractor_key": extractor,
+        "_type": "video",
+    }
+
+
+def _youtube_multiaudio(rng: random.Random) -> Dict[str, Any]:
+    duration = 5423
+    formats: List[Dict[str, Any]] = [
+        {"format_id": f"sb{i}", "format_note": "storyboard", "ext": "mhtml", "protocol": "mhtml", "acodec": "none",
+         "vcodec": "none", "url": f"{_MEDIA}/sb{i}.mhtml?bytes=4096", "fps": 0.01, "columns": 5, "rows": 5,
+         "fragments": [{"url": f"{_MEDIA}/sb{i}/M{n}.jpg", "duration": 250.0} for n in range(22)]}
+        for i in range(4)
+    ]
+    for language in _LANGUAGES:
+        for fid, codec, ext, abr in (("139", "mp4a.40.5", "m4a", 48.8), ("140", "mp4a.40.2", "m4a", 129.5),
+                                     ("249", "opus", "webm", 53.1), ("251", "opus", "webm", 135.3)):
+            for drc in ("", "-drc"):
+                abr_value = round(abr * rng.uniform(0.96, 1.04), 3)
+                formats.append({
+                    "format_id": f"{fid}-{language}{drc}", "format_note": f"{language}, {'DRC' if drc else 'medium'}",
+                    "ext": ext, "protocol": "https", "acodec": codec, "vcodec": "none", "abr": abr_value, "tbr": abr_value,
+                    "asr": 48000 if codec == "opus" else 44100, "audio_channels": 2, "language": language,
+                    "filesize": int(abr_value * 125 * duration), "resolution": "audio only", "container": f"{ext}_dash",
+                    "url": f"{_MEDIA}/yt-{fid}-{language}{drc}.{ext}?bytes={int(abr_value * 125 * duration)}",
+                    "http_headers": _HEADERS,
+                })
+    for height, width in _LADDER[:8]:
+        for codec, ext, factor in (("avc1.640028", "mp4", 1.0), ("vp09.00.40.08", "webm", 0.7), ("av01.0.08M.08", "mp4", 0.55)):
+            tbr = round(height * 3.9 * factor * rng.uniform(0.9, 1.1), 3)
+            formats.append({
+                "format_id": str(rng.randint(133, 699)), "format_note": f"{height}p", "ext": ext, "protocol": "https",
+                "acodec": "none", "vcodec": codec, "width": width, "height": height, "fps": 30, "tbr": tbr,
+                "filesize": int(tbr * 125 * duration), "resolution": f"{width}x{height}", "dynamic_range": "SDR",
+                "container": f"{ext}_dash", "url": f"{_MEDIA}/yt-{height}-{codec[:4]}.{ext}?bytes={int(tbr * 125 * duration)}",
+                "http_headers": _HEADERS,
+            })
+    formats.append({
+        "format_id": "18", "format_note": "360p", "ext": "mp4", "protocol": "https", "acodec": "mp4a.40.2",
+        "vcodec": "avc1.42001E", "width": 640, "height": 360, "fps": 30, "tbr": 578.7, "resolution": "640x360",
+        "filesize": int(578.7 * 125 * duration), "url": f"{_MEDIA}/yt-18.mp4?bytes={int(578.7 * 125 * duration)}",
+        "http_headers": _HEADERS,
+    })
+    info = _base("mUlt1AuD10x", "Documentary (12 audio languages)", "Youtube", duration)
+    return {**info, "formats": formats, "format_id": formats[-1]["format_id"], "ext": "mp4"}
+
+
+def _dash_manifest(rng: random.Random) -> Dict[str, Any]:
+    duration = 3600
+    segment = 4.0
+    manifest = f"{_MEDIA}/stream/manifest.mpd"
+    formats = []
+    for period in range(4):
+        for height, width in _LADDER:
+            for codec, ext in (("avc1.64002a", "mp4"), ("hvc1.2.4.L153", "mp4"), ("vp09.00.51.08", "webm")):
+                tbr = round(height * 4.2 * rng.uniform(0.8, 1.2), 3)
+                fid = f"p{period}-video={int(tbr * 1000)}-{codec[:4]}"
+                formats.append({
+                    "format_id": fid, "manifest_url": manifest, "ext": ext, "protocol": "http_dash_segments",
+                    "acodec": "none", "vcodec": codec, "width": width, "height": height, "fps": 25, "tbr": tbr,
+                    "container": f"{ext}_dash", "resolution": f"{width}x{height}", "dynamic_range": "SDR",
+                    "fragment_base_url": f"{_MEDIA}/stream/{fid}/",
+                    "fragments": [{"path": f"seg-{n}.m4s", "duration": segment} for n in range(int(duration / segment / 4))],
+                    "url": manifest, "http_headers": _HEADERS,
+                })
+        for language in _LANGUAGES[:4]:
+            for abr in (64, 96, 128, 192):
+                fid = f"p{period}-audio_{language}={abr * 1000}"
+                formats.append({
+                    "format_id": fid, "manifest_url": manifest, "ext": "m4a", "protocol": "http_dash_segments",
+                    "acodec": "mp4a.40.2", "vcodec": "none", "abr": float(abr), "tbr": float(abr), "asr": 48000,
+                    "language": language, "container": "m4a_dash", "resolution": "audio only",
+                    "fragment_base_url": f"{_MEDIA}/stream/{fid}/",
+                    "fragments": [{"path": f"seg-{n}.m4s", "duration": segment} for n in range(int(duration / segment / 4))],
+                    "url": manifest, "http_headers": _HEADERS,
+                })
+    info = _base("dash-live-archive", "Conference keynote (DASH archive)", "Generic", duration)
+    return {**info, "formats": formats, "format_id": formats[0]["format_id"], "ext": "mp4"}
+
+
+def _hls_variants(rng: random.Random) -> Dict[str, Any]:
+    duration = 1820
+    formats = []
+    for cdn in ("akfire_interconnect_quic", "fastly_skyfire", "fastly_skyfire_sep"):
+        for height, width in _LADDER[:8]:
+            tbr = round(height * 3.1 * rng.uniform(0.9, 1.1), 3)
+            # Renditions without a height only carry a "1080p"-style resolution
+            muxed = height <= 720
+            formats.append({
+                "format_id": f"hls-{cdn}-{height}p", "format_note": f"{height}p", "ext": "mp4",
+                "protocol": "m3u8_native", "acodec": "mp4a.40.2" if muxed else "none", "vcodec": "avc1.64001F",
+                "resolution": f"{height}p", "fps": 30, "tbr": tbr, "manifest_url": f"{_MEDIA}/{cdn}/master.m3u8",
+                "url": f"{_MEDIA}/{cdn}/{height}p/index.m3u8", "http_headers": _HEADERS,
+            })
+        for abr in (64, 128, 256):
+            formats.append({
+                "format_id": f"hls-{cdn}-audio-{abr}", "ext": "mp4", "protocol": "m3u8_native",
+                "acodec": "mp4a.40.2", "vcodec": "none", "abr": float(abr), "resolution": "audio only",
+                "url": f"{_MEDIA}/{cdn}/audio-{abr}/index.m3u8", "http_headers": _HEADERS,
+            })
+        for height, width in _LADDER[2:6] + _LADDER[8:]:
+            formats.append({
+                "format_id": f"http-{cdn}-{height}p", "ext": "mp4", "protocol": "https", "acodec": "mp4a.40.2",
+                "vcodec": "avc1.64001F", "width": width, "resolution": f"{height}p", "tbr": round(height * 2.9, 3),
+                "url": f"{_MEDIA}/{cdn}/{height}p.mp4?bytes={height * 40000}", "http_headers": _HEADERS,
+            })
+    for fid, ext in (("dash-audio-opus", "ogg"), ("original-flac", "flac"), ("mp3-320", "mp3"), ("aac-256", "aac")):
+        formats.append({"format_id": fid, "ext": ext, "protocol": "https", "acodec": ext, "vcodec": "none",
+                        "url": f"{_MEDIA}/{fid}.{ext}?bytes=9000000"})
+    info = _base("987654321", "Short film (HLS renditions)", "Vimeo", duration)
+    return {**info, "formats": formats, "format_id": formats[0]["format_id"], "ext": "mp4"}
+
+
+def _progress_line(d: Dict[str, Any]) -> str:
+    return "[clipx-progress] " + json.dumps(d)
+
+
+def _tick(status: str, downloaded: int, total: int | None, elapsed: float, filename: str, **extra: Any) -> Dict[str, Any]:
+    speed = downloaded / elapsed if elapsed else None
+    percent = downloaded / total * 100 if total else 0.0
+    return {
+        "status": status, "downloaded_bytes": downloaded, "total_bytes": total, "tmpfilename": f"{filename}.part",
+        "filename": filename, "eta": int((total - downloaded) / speed) if total and speed else None, "speed": speed,
+        "elapsed": elapsed, "ctx_id": None, "_eta_str": "00:12", "_speed_str": "5.21MiB/s",
+        "_percent_str": f"{percent:5.1f}%", "_total_bytes_str": "348.12MiB", "_elapsed_str": "00:01:07",
+        "_default_template": f"{percent:5.1f}% of 348.12MiB at 5.21MiB/s ETA 00:12", **extra,
+    }
+
+
+def _http_log(rng: random.Random) -> List[str]:
+    filename = "/tmp/0123456789abcdef0123456789abcdef.mp4"
+    total = 365_000_000
+    lines = [
+        "[generic] Extracting URL: https://example.com/video",
+        "[info] 0123456789abcdef: Downloading 1 format(s): 22",
+        f"[download] Destination: {filename}",
+    ]
+    downloaded, elapsed = 0, 0.0
+    while downloaded < total:
+        downloaded = min(total, downloaded + rng.randint(60_000, 200_000))
+        elapsed += rng.uniform(0.02, 0.04)
+        lines.append(_progress_line(_tick("downloading", downloaded, total, elapsed, filename)))
+    lines.append(_progress_line(_tick("finished", total, total, elapsed, filename)))
+    lines.append("[download] 100% of  348.10MiB in 00:01:07 at 5.19MiB/s")
+    return lines
+
+
+def _dash_log(rng: random.Random) -> List[str]:
+    base = "/tmp/0123456789abcdef0123456789abcdef"
+    lines = ["[youtube] Extracting URL: https://www.youtube.com/watch?v=abc", "[info] abc: Downloading 1 format(s): 137+140"]
+    for fid, ext, fragments in (("137", "mp4", 1400), ("140", "m4a", 700)):
+        filename = f"{base}.f{fid}.{ext}"
+        lines.append(f"[dashsegments] Total fragments: {fragments}")
+        lines.append(f"[download] Destination: {filename}")
+        downloaded, elapsed = 0, 0.0
+        for index in range(1, fragments + 1):
+            downloaded += rng.randint(150_000, 450_000)
+            elapsed += rng.uniform(0.05, 0.1)
+            estimate = int(downloaded / index * fragments)
+            tick = _tick("downloading", downloaded, None, elapsed, filename, total_bytes_estimate=estimate,
+                         fragment_index=index, fragment_count=fragments)
+            lines.append(_progress_line(tick))
+            if index % 50 == 0:
+                lines.append(f"[download] Got error: Read timed out. Retrying fragment {index} (1/10)...")
+        lines.append(_progress_line(_tick("finished", downloaded, downloaded, elapsed, filename)))
+    for status in ("started", "processing", "finished"):
+        lines.append(_progress_line({"status": status, "postprocessor": "Merger", "info_dict": {"id": "abc", "ext": "mp4"}}))
+    lines.append(f'[Merger] Merging formats into "{base}.mp4"')
+    lines.append(f"Deleting original file {base}.f137.mp4 (pass -k to keep)")
+    return lines
+
+
+def main() -> None:
+    rng = random.Random(20241017)
+    _write_info("youtube_multiaudio", _youtube_multiaudio(rng))
+    _write_info("dash_manifest", _dash_manifest(rng))
+    _write_info("hls_variants", _hls_variants(rng))
+    _write_log("http_download", _http_log(rng))
+    _write_log("dash_fragments", _dash_log(rng))
+
+
+if __name__ == "__main__":
+    main()
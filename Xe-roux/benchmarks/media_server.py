@@ -0,0 +1,146 @@
+"""Local HTTP server of synthetic media files for offline benchmarks.
+
+``GET /media/<name>?bytes=N`` returns *N* bytes of filler (byte ranges are
+supported), paced to ``--bandwidth-mbps`` per connection after waiting
+``--latency-ms`` before the response headers. ``GET /watch/<name>`` returns a
+tiny HTML page. Nothing is read from disk, so any size can be served.
+
+Standalone (from the ``Xe-roux`` directory):
+
+    python -m benchmarks.media_server --port 8766 --bandwidth-mbps 100 --latency-ms 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+_BLOCK = bytes(range(256)) * 256  # 64 KiB of filler
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "MediaServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002 - silence per-request logging
+        return
+
+    def do_HEAD(self) -> None:  # noqa: N802
+        self._respond(head=True)
+
+    def do_GET(self) -> None:  # noqa: N802
+        self._respond(head=False)
+
+    def _respond(self, head: bool) -> None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        parsed = urlparse(self.path)
+        if parsed.path.startswith("/watch/"):
+            body = f"<html><title>{parsed.path[7:]}</title></html>".encode()
+            self._headers(200, len(body), "text/html")
+            if not head:
+                self.wfile.write(body)
+            return
+        if not parsed.path.startswith("/media/"):
+            self._headers(404, 0, "text/plain")
+            return
+
+        size = int(parse_qs(parsed.query).get("bytes", ["1048576"])[0])
+        start, end = 0, size - 1
+        match = _RANGE_RE.match(self.headers.get("Range", ""))
+        if match and size:
+            first, last = match.groups()
+            if first:
+                start, end = int(first), min(int(last), size - 1) if last else size - 1
+            elif last:
+                start = max(0, size - int(last))
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        length = end - start + 1 if size else 0
+        self._headers(206 if match else 200, length, "video/mp4", f"bytes {start}-{end}/{size}" if match else None)
+        if not head:
+            self._send_paced(length)
+
+    def _headers(self, code: int, length: int, content_type: str, content_range: str | None = None) -> None:
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        self.end_headers()
+
+    def _send_paced(self, length: int) -> None:
+        rate = self.server.bandwidth
+        started = time.monotonic()
+        sent = 0
+        try:
+            while sent < length:
+                chunk = _BLOCK[: min(len(_BLOCK), length - sent)]
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                if rate:
+                    ahead = sent / rate - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        with self.server.stats_lock:
+            self.server.bytes_sent += sent
+
+
+class MediaServer(ThreadingHTTPServer):
+    """Threaded media server; :meth:`start` runs it in a background thread."""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, bandwidth_mbps: float = 0, latency_ms: float = 0) -> None:
+        super().__init__((host, port), _Handler)
+        self.bandwidth = bandwidth_mbps * 1_000_000 / 8  # bytes/s per connection, 0 = unlimited
+        self.latency = latency_ms / 1000
+        self.bytes_sent = 0
+        self.stats_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://localhost:{self.server_address[1]}"
+
+    def start(self) -> "MediaServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="media-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--bandwidth-mbps", type=float, default=0, help="per connection, 0 = unlimited")
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay before each response")
+    args = parser.parse_args()
+    server = MediaServer(args.host, args.port, args.bandwidth_mbps, args.latency_ms)
+    print(f"Serving synthetic media on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
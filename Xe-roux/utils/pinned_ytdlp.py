@@ -0,0 +1,31 @@
+"""Run the yt-dlp CLI with the API's validated DNS answers pinned.
+
+Usage: ``python utils/pinned_ytdlp.py '<pins JSON>' [yt-dlp arguments...]``,
+where the pins come from :func:`utils.validators.pins_for`. Every lookup in
+this process goes through the pin table and is filtered against the blocked
+networks (as in the extractor pool workers), so the subprocess connects to the
+addresses that were checked instead of resolving the hostname again.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+
+def main() -> None:
+    # Run by path: make the project root importable
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from utils import validators
+
+    validators.install_dns_pinning(strict=True)
+    validators.load_pins(json.loads(sys.argv[1]))
+
+    import yt_dlp  # type: ignore
+
+    yt_dlp.main(sys.argv[2:])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,72 @@
 """URL validation utilities for ClipX security.
 
 Raises HTTPException(400) for invalid or disallowed URLs.
+
+:func:`validate_url` checks the URL syntax and literal IP hosts.
+:func:`validate_url_async` additionally resolves the hostname (``aiodns`` when
+installed, otherwise the loop's ``getaddrinfo``) and rejects it if any A/AAAA
+record lies in a blocked network. Answers are cached for their DNS TTL (and
+failures for ``DNS_NEGATIVE_TTL``), so repeated previews and downloads of a
+host add no resolver latency.
+
+Validated addresses are *pinned*: once :func:`install_dns_pinning` has
+wrapped ``socket.getaddrinfo``, in-process yt-dlp connects to exactly the
+addresses that were checked instead of resolving the name again, which closes
+the DNS-rebinding window. Inside :func:`strict_resolution` any other hostname
+(redirect targets, CDN hosts) is filtered against the blocked networks too,
+including lookups from threads yt-dlp starts during the run (concurrent
+fragment downloads): threads inherit strict mode from the thread starting them.
+A thread pool created *before* the block and reused inside it is not covered,
+so yt-dlp must only be run from threads that create their own helpers.
+
+Where pins apply:
+
+* in-process yt-dlp (library downloads, Celery tasks) and the extractor pool
+  workers, which receive the pins via :func:`pins_for`/:func:`load_pins`;
+* yt-dlp CLI subprocesses (``YTDLP_ENGINE=cli`` extraction, stream-through
+  downloads), which run through ``utils/pinned_ytdlp.py`` with the pins on
+  the command line whenever the ``yt_dlp`` package is importable.
+
+Still unpinned (they resolve hostnames themselves):
+
+* the bare ``yt-dlp`` executable, used only when the ``yt_dlp`` package is not
+  importable (CLI fallbacks in :mod:`app.services.ytdlp` and the Celery worker);
+* external programs started by yt-dlp: ``aria2c`` (``DOWNLOAD_EXTERNAL_DOWNLOADER``
+  / the ``aria2c`` tuning profile) and ``ffmpeg`` when it fetches streams itself.
 """
 
 from __future__ import annotations
 
+import asyncio
+import bisect
+import contextlib
 import ipaddress
+import os
 import re
+import socket
+import threading
+import time
+import weakref
+from typing import Any, Dict, Final, Iterable, Iterator, List, Tuple
 from urllib.parse import urlparse
 
-from fastapi import HTTPException, status
+# Import aiodns with fallback
+try:
+    import aiodns  # type: ignore
+    AIODNS_AVAILABLE = True
+except ImportError:
+    AIODNS_AVAILABLE = False
+
+DNS_CACHE_TTL: Final[int] = int(os.getenv("DNS_CACHE_TTL", "60"))  # seconds, when the resolver gives no TTL
+DNS_CACHE_MIN_TTL: Final[int] = int(os.getenv("DNS_CACHE_MIN_TTL", "5"))
+DNS_CACHE_MAX_TTL: Final[int] = int(os.getenv("DNS_CACHE_MAX_TTL", "300"))
+DNS_NEGATIVE_TTL: Final[int] = int(os.getenv("DNS_NEGATIVE_TTL", "30"))
+DNS_CACHE_SIZE: Final[int] = int(os.getenv("DNS_CACHE_SIZE", "4096"))
+DNS_RESOLVE_TIMEOUT: Final[float] = float(os.getenv("DNS_RESOLVE_TIMEOUT", "3"))
+# Hostnames exempt from the resolved-address check (e.g. a local test server)
+SSRF_ALLOWED_HOSTS: Final = frozenset(
+    host.strip().lower() for host in os.getenv("SSRF_ALLOWED_HOSTS", "").split(",") if host.strip()
+)
 
 # Patterns for allowed schemes
 _ALLOWED_SCHEMES = {"http", "https"}
@@ -20,18 +77,51 @@ _private_networks = [
     ipaddress.ip_network("10.0.0.0/8"),
     ipaddress.ip_network("172.16.0.0/12"),
     ipaddress.ip_network("192.168.0.0/16"),
+    ipaddress.ip_network("100.64.0.0/10"),  # carrier-grade NAT
+    ipaddress.ip_network("fc00::/7"),  # unique local
 ]
 
 _reserved_networks = [
     ipaddress.ip_network("127.0.0.0/8"),  # loopback
     ipaddress.ip_network("0.0.0.0/8"),  # "this" network
     ipaddress.ip_network("169.254.0.0/16"),  # link-local
+    ipaddress.ip_network("192.0.0.0/24"),  # IETF protocol assignments
+    ipaddress.ip_network("198.18.0.0/15"),  # benchmarking
     ipaddress.ip_network("224.0.0.0/4"),  # multicast
     ipaddress.ip_network("240.0.0.0/4"),  # reserved
+    ipaddress.ip_network("::/128"),  # unspecified
+    ipaddress.ip_network("::1/128"),  # loopback
+    ipaddress.ip_network("100::/64"),  # discard
+    ipaddress.ip_network("2001:db8::/32"),  # documentation
+    ipaddress.ip_network("fe80::/10"),  # link-local
+    ipaddress.ip_network("fec0::/10"),  # site-local (deprecated)
+    ipaddress.ip_network("ff00::/8"),  # multicast
 ]
 
 _blocked_networks = _private_networks + _reserved_networks
 
+
+def _build_intervals(version: int) -> Tuple[List[int], List[int]]:
+    """Return sorted, merged ``(starts, ends)`` of the blocked networks of *version*."""
+    spans = sorted(
+        (int(net.network_address), int(net.broadcast_address)) for net in _blocked_networks if net.version == version
+    )
+    starts: List[int] = []
+    ends: List[int] = []
+    for start, end in spans:
+        if ends and start <= ends[-1] + 1:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+_intervals = {4: _build_intervals(4), 6: _build_intervals(6)}
+
+# IPv6 prefixes that embed an IPv4 address in their low 32 bits
+_NAT64_PREFIX = ipaddress.ip_network("64:ff9b::/96")
+
 _host_regex = re.compile(r"^[A-Za-z0-9.-]+$")
 
 
@@ -44,8 +134,24 @@ def _is_ip_address(host: str) -> bool:
 
 
 def _ip_in_blocked_ranges(ip_str: str) -> bool:
-    ip_obj = ipaddress.ip_address(ip_str)
-    return any(ip_obj in net for net in _blocked_networks)
+    ip_obj = ipaddress.ip_address(ip_str.split("%", 1)[0])  # drop an IPv6 zone id
+    if ip_obj.version == 6:
+        embedded = ip_obj.ipv4_mapped or ip_obj.sixtofour
+        if embedded is None and ip_obj in _NAT64_PREFIX:
+            embedded = ipaddress.IPv4Address(int(ip_obj) & 0xFFFFFFFF)
+        if embedded is not None:
+            ip_obj = embedded
+    starts, ends = _intervals[ip_obj.version]
+    value = int(ip_obj)
+    index = bisect.bisect_right(starts, value) - 1
+    return index >= 0 and value <= ends[index]
+
+
+def _bad_request(detail: str) -> Exception:
+    # Imported lazily: the yt-dlp launcher (utils.pinned_ytdlp) uses this module without FastAPI
+    from fastapi import HTTPException, status
+
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
 
 
 def validate_url(url: str) -> str:
@@ -53,29 +159,247 @@ def validate_url(url: str) -> str:
 
     Ensures scheme is http/https and host is not private or reserved.
     Returns the normalized URL string if valid, otherwise raises HTTP 400.
+    Hostnames are not resolved here; see :func:`validate_url_async`.
     """
 
     parsed = urlparse(url)
 
     # Check scheme
     if parsed.scheme.lower() not in _ALLOWED_SCHEMES:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="URL must start with http:// or https://",
-        )
+        raise _bad_request("URL must start with http:// or https://")
 
     # Validate host presence
     host = parsed.hostname
     if not host:
-        raise HTTPException(status_code=400, detail="URL missing host component")
+        raise _bad_request("URL missing host component")
 
-    # Simple host format validation
-    if not _host_regex.match(host):
-        raise HTTPException(status_code=400, detail="Invalid host format")
+    # Simple host format validation (IPv6 literals are checked as addresses below)
+    if not _host_regex.match(host) and not _is_ip_address(host):
+        raise _bad_request("Invalid host format")
 
     # If host is IP, block private/reserved ranges
     if _is_ip_address(host) and _ip_in_blocked_ranges(host):
-        raise HTTPException(status_code=400, detail="URL points to a disallowed IP range")
+        raise _bad_request("URL points to a disallowed IP range")
 
     # All good – return original (or reconstructed) URL
-    return url
\ No newline at end of file
+    return url
+
+
+# ---------------------------------------------------------------------------
+# Cached asynchronous resolution
+# ---------------------------------------------------------------------------
+class _ResolveCache:
+    """``host -> (expires_at, addresses)``; an empty tuple records a failed lookup.
+
+    The entries double as the pin table consulted by the ``getaddrinfo``
+    wrapper, which runs in worker threads, hence the lock.
+    """
+
+    def __init__(self, maxsize: int = DNS_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self._entries: Dict[str, Tuple[float, Tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str) -> Tuple[str, ...] | None:
+        with self._lock:
+            entry = self._entries.get(host)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, host: str, addresses: Tuple[str, ...], ttl: float) -> None:
+        with self._lock:
+            if len(self._entries) >= self.maxsize:
+                now = time.monotonic()
+                for key in [k for k, (expires_at, _) in self._entries.items() if expires_at < now]:
+                    del self._entries[key]
+                while len(self._entries) >= self.maxsize:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[host] = (time.monotonic() + ttl, addresses)
+
+    def export(self, host: str) -> Dict[str, Tuple[float, List[str]]]:
+        """Return the pin of *host* as ``{host: (seconds_left, addresses)}``."""
+        with self._lock:
+            entry = self._entries.get(host)
+        if not entry or not entry[1] or entry[0] < time.monotonic():
+            return {}
+        return {host: (entry[0] - time.monotonic(), list(entry[1]))}
+
+
+_cache = _ResolveCache()
+_inflight: Dict[str, "asyncio.Future[Tuple[str, ...]]"] = {}
+# aiodns resolvers are bound to the loop that created them
+_resolvers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+
+def _clamp_ttl(ttl: float | None) -> float:
+    return float(min(max(ttl if ttl is not None else DNS_CACHE_TTL, DNS_CACHE_MIN_TTL), DNS_CACHE_MAX_TTL))
+
+
+async def _query_aiodns(host: str) -> Tuple[Tuple[str, ...], float | None]:
+    loop = asyncio.get_running_loop()
+    resolver = _resolvers.get(loop)
+    if resolver is None:
+        resolver = _resolvers[loop] = aiodns.DNSResolver(loop=loop, timeout=DNS_RESOLVE_TIMEOUT)
+    records: List[Tuple[str, int]] = []
+    if hasattr(resolver, "query_dns"):  # aiodns >= 4
+        answers = await asyncio.gather(
+            resolver.query_dns(host, "A"), resolver.query_dns(host, "AAAA"), return_exceptions=True
+        )
+        for answer in answers:
+            if not isinstance(answer, BaseException):
+                # CNAME records in the chain carry no address
+                records += [(rr.data.addr, rr.ttl) for rr in answer.answer if hasattr(rr.data, "addr")]
+    else:
+        answers = await asyncio.gather(resolver.query(host, "A"), resolver.query(host, "AAAA"), return_exceptions=True)
+        for answer in answers:
+            if not isinstance(answer, BaseException):
+                records += [(record.host, record.ttl) for record in answer]
+    if not records:
+        return (), None
+    return tuple(dict.fromkeys(address for address, _ in records)), min(ttl for _, ttl in records)
+
+
+async def _query_getaddrinfo(host: str) -> Tuple[Tuple[str, ...], float | None]:
+    loop = asyncio.get_running_loop()
+    try:
+        infos = await asyncio.wait_for(
+            loop.getaddrinfo(host, None, type=socket.SOCK_STREAM), timeout=DNS_RESOLVE_TIMEOUT
+        )
+    except (OSError, asyncio.TimeoutError):
+        return (), None
+    return tuple(dict.fromkeys(info[4][0] for info in infos)), None
+
+
+async def _lookup(host: str) -> Tuple[str, ...]:
+    addresses, ttl = await (_query_aiodns(host) if AIODNS_AVAILABLE else _query_getaddrinfo(host))
+    _cache.set(host, addresses, _clamp_ttl(ttl) if addresses else DNS_NEGATIVE_TTL)
+    return addresses
+
+
+async def resolve_host(host: str) -> Tuple[str, ...]:
+    """Return the A/AAAA addresses of *host* (empty if it does not resolve).
+
+    Served from the TTL cache when possible; concurrent lookups of one host
+    share a single query.
+    """
+    host = host.lower()
+    cached = _cache.get(host)
+    if cached is not None:
+        return cached
+    future = _inflight.get(host)
+    if future is None:
+        future = asyncio.ensure_future(_lookup(host))
+        _inflight[host] = future
+        future.add_done_callback(lambda _: _inflight.pop(host, None))
+    return await asyncio.shield(future)
+
+
+async def validate_url_async(url: str) -> str:
+    """:func:`validate_url` plus a check of every address the hostname resolves to."""
+    url = validate_url(url)
+    host = (urlparse(url).hostname or "").lower()
+    if _is_ip_address(host) or host in SSRF_ALLOWED_HOSTS:
+        return url
+    addresses = await resolve_host(host)
+    if not addresses:
+        raise _bad_request("URL host could not be resolved")
+    if any(_ip_in_blocked_ranges(address) for address in addresses):
+        raise _bad_request("URL resolves to a disallowed IP range")
+    return url
+
+
+async def validate_urls_async(urls: Iterable[str]) -> List[str]:
+    """Validate several URLs concurrently; raises for the first invalid one."""
+    return list(await asyncio.gather(*(validate_url_async(url) for url in urls)))
+
+
+# ---------------------------------------------------------------------------
+# Pinning for in-process yt-dlp
+# ---------------------------------------------------------------------------
+_original_getaddrinfo = socket.getaddrinfo
+_strict = threading.local()
+# Set in processes that only run yt-dlp (extractor pool workers)
+_strict_process = False
+_original_thread_start = threading.Thread.start
+
+
+def pins_for(url: str) -> Dict[str, Tuple[float, List[str]]]:
+    """Return the pinned addresses of *url*'s host, to hand to another process."""
+    return _cache.export((urlparse(url).hostname or "").lower())
+
+
+def load_pins(pins: Dict[str, Tuple[float, List[str]]]) -> None:
+    """Adopt pins exported by :func:`pins_for` in another process."""
+    for host, (ttl, addresses) in pins.items():
+        _cache.set(host, tuple(addresses), ttl)
+
+
+@contextlib.contextmanager
+def strict_resolution() -> Iterator[None]:
+    """Filter blocked addresses out of every lookup made by this thread.
+
+    Threads started from inside the block (yt-dlp's fragment download pools,
+    for instance) inherit the filter for their whole lifetime once
+    :func:`install_dns_pinning` has run. Only threads that run yt-dlp should
+    use it: app-internal services such as Redis are usually on private addresses.
+    """
+    previous = getattr(_strict, "enabled", False)
+    _strict.enabled = True
+    try:
+        yield
+    finally:
+        _strict.enabled = previous
+
+
+def _pinned_getaddrinfo(host: Any, port: Any, family: int = 0, type: int = 0, proto: int = 0, flags: int = 0):
+    if not isinstance(host, (str, bytes)):
+        return _original_getaddrinfo(host, port, family, type, proto, flags)
+    name = (host.decode() if isinstance(host, bytes) else host).lower()
+    if name in SSRF_ALLOWED_HOSTS:
+        return _original_getaddrinfo(host, port, family, type, proto, flags)
+    results = []
+    if not _is_ip_address(name):
+        for address in _cache.get(name) or ():
+            try:
+                results += _original_getaddrinfo(address, port, family, type, proto, flags | socket.AI_NUMERICHOST)
+            except socket.gaierror:
+                continue  # address family excluded by *family*
+    if not results:
+        results = _original_getaddrinfo(host, port, family, type, proto, flags)
+    if _strict_process or getattr(_strict, "enabled", False):
+        results = [info for info in results if not _ip_in_blocked_ranges(info[4][0])]
+        if not results:
+            raise socket.gaierror(socket.EAI_NONAME, "Name resolves to a disallowed IP range")
+    return results
+
+
+def _inheriting_start(self: threading.Thread) -> None:
+    """``Thread.start`` that carries the starting thread's strict mode into the new thread."""
+    if getattr(_strict, "enabled", False):
+        run = self.run
+
+        def _strict_run() -> None:
+            _strict.enabled = True
+            run()
+
+        self.run = _strict_run  # type: ignore[method-assign]
+    _original_thread_start(self)
+
+
+def strict_covers_threads() -> bool:
+    """Return True when :func:`strict_resolution` also covers threads started inside it."""
+    return _strict_process or threading.Thread.start is _inheriting_start
+
+
+def install_dns_pinning(strict: bool = False) -> None:
+    """Route ``socket.getaddrinfo`` through the pin table (idempotent).
+
+    With *strict* every lookup in this process is filtered, as if the whole
+    process ran inside :func:`strict_resolution`. Otherwise threads started
+    inside :func:`strict_resolution` are made to inherit it.
+    """
+    global _strict_process
+    _strict_process = _strict_process or strict
+    socket.getaddrinfo = _pinned_getaddrinfo
+    threading.Thread.start = _inheriting_start  # type: ignore[method-assign]